@@ -11,39 +11,65 @@ for interacting with the chatbot.
 
 import os
 import sys
-from chatbot.nlp_processor import NLPProcessor
-from chatbot.rule_engine import RuleEngine
+from chatbot.metrics import RESPONSE_PATH_TOTAL
 from chatbot.ml_enhancer import MLEnhancer
-from chatbot.knowledge_base import KnowledgeBase
+from chatbot.services import get_shared_services
 from chatbot.user_profile import UserProfile
 
 
 class HealthCoachChatbot:
     """Main chatbot class that coordinates all components."""
     
-    def __init__(self, user_id="default_user"):
+    def __init__(self, user_id="default_user", services=None, profile_store=None):
         """Initialize the chatbot components.
         
+        The knowledge base, NLP processor, rule engine and ML enhancer are shared
+        by every chatbot in the process; only the user profile and conversation
+        context belong to this instance.
+        
         Args:
             user_id (str): Unique identifier for the user
+            services (SharedServices, optional): Shared components, defaults to the process-wide ones
+            profile_store (optional): Store the user profile is saved to after each interaction
         """
-        self.knowledge_base = KnowledgeBase()
-        self.nlp_processor = NLPProcessor()
-        self.rule_engine = RuleEngine(self.knowledge_base)
+        self.services = services or get_shared_services()
+        self.knowledge_base = self.services.knowledge_base
+        self.nlp_processor = self.services.nlp_processor
+        self.rule_engine = self.services.rule_engine
+        self.ml_enhancer = self.services.ml_enhancer
+        
+        # Per-user state
         self.user_profile = UserProfile(user_id)
-        self.ml_enhancer = MLEnhancer(user_profile=self.user_profile)
-        print("Health Coach initialized and ready to help!")
+        self.user_context = MLEnhancer.new_user_context()
+        self.profile_store = profile_store
         
-    def process_input(self, user_input, feedback=None):
+    def process_input(self, user_input, feedback=None, deadline=None):
         """Process user input and generate a response.
         
         Args:
             user_input (str): The user's query or message
             feedback (str, optional): User feedback on previous response
+            deadline (Deadline, optional): Latency budget for the ML enhancement steps
             
         Returns:
             str: The chatbot's response
         """
+        processed_input, rule_response, response = self.prepare(user_input, feedback)
+        if response is not None:
+            return response
+        return self.enhance(processed_input, rule_response, deadline)
+    
+    def prepare(self, user_input, feedback=None):
+        """Run the cheap part of process_input: NLP, rule matching and the profile update.
+        
+        Args:
+            user_input (str): The user's query or message
+            feedback (str, optional): User feedback on previous response
+            
+        Returns:
+            tuple: (processed_input, rule_response, response), where response is the final
+                answer for a strong rule match and None when enhance() must be called
+        """
         # Process the input text with NLP
         processed_input = self.nlp_processor.process(user_input)
         
@@ -51,20 +77,121 @@ class HealthCoachChatbot:
         rule_response = self.rule_engine.get_response(processed_input)
         
         # Update user profile with this interaction
-        topic = processed_input['intent']['type']
-        self.user_profile.update_interaction(topic, feedback)
+        self._record_interaction(processed_input, feedback)
         
         # If we have a strong rule match, return it
         if rule_response.get('confidence', 0) > 0.8:
-            return rule_response['response']
+            RESPONSE_PATH_TOTAL.inc(path='rule')
+            return processed_input, rule_response, rule_response['response']
+        
+        RESPONSE_PATH_TOTAL.inc(path='ml')
+        return processed_input, rule_response, None
+    
+    def enhance(self, processed_input, rule_response, deadline=None, user_context=None):
+        """Run the model-backed part of process_input for a weak rule match.
         
-        # Otherwise, enhance with ML recommendations
-        ml_response = self.ml_enhancer.enhance_response(
+        Args:
+            processed_input (dict): Output of prepare()
+            rule_response (dict): Output of prepare()
+            deadline (Deadline, optional): Latency budget; steps that would overrun it are skipped
+            user_context (dict, optional): Conversation context to update, defaults to this chatbot's;
+                pass a copy to decide afterwards whether to keep the update
+            
+        Returns:
+            str: The chatbot's response
+        """
+        # Enhance with ML recommendations
+        return self.ml_enhancer.enhance_response(
             processed_input, 
-            rule_response
+            rule_response,
+            user_profile=self.user_profile,
+            user_context=self.user_context if user_context is None else user_context,
+            deadline=deadline
         )
+    
+    def stream_input(self, user_input, feedback=None, deadline=None, user_context=None):
+        """Process user input, yielding the response in pieces as they become ready.
+        
+        The rule-based response is yielded first, before any model runs; for a weak
+        rule match the ML enhancer's replacements and personalization sentences
+        follow as each one is computed.
+        
+        Args:
+            user_input (str): The user's query or message
+            feedback (str, optional): User feedback on previous response
+            deadline (Deadline, optional): Latency budget for the ML enhancement steps
+            user_context (dict, optional): Conversation context to update, defaults to this chatbot's;
+                pass a copy to decide afterwards whether to keep the update
+        
+        Yields:
+            tuple: (kind, text) where kind is 'replace' (the text so far is replaced)
+                or 'append' (text is added to the end)
+        """
+        processed_input, rule_response, response = self.prepare(user_input, feedback)
+        if response is not None:
+            yield 'replace', response
+            return
+        
+        yield 'replace', rule_response['response']
+        yield from self.ml_enhancer.stream_response(
+            processed_input,
+            rule_response,
+            user_profile=self.user_profile,
+            user_context=self.user_context if user_context is None else user_context,
+            deadline=deadline
+        )
+    
+    def _record_interaction(self, processed_input, feedback=None):
+        """Update the user profile with an interaction and queue it for saving."""
+        topic = processed_input['intent']['type']
+        self.user_profile.update_interaction(topic, feedback)
+        if self.profile_store is not None:
+            self.profile_store.save(self.user_profile)
+    
+    @staticmethod
+    def process_batch(requests):
+        """Process many messages, possibly from many users, with batched model calls.
+        
+        NLP and rule matching run over all messages, then the low-confidence ones
+        go through the ML enhancer together so intent classification, question
+        answering and embedding encoding each take a single batched call. Every
+        response is personalized with its own chatbot's profile and context; a
+        chatbot may appear more than once, in which case its messages are recorded
+        in order.
+        
+        Args:
+            requests (list): (HealthCoachChatbot, user_input) pairs
+            
+        Returns:
+            list: The response to each request, in order
+        """
+        responses = [None] * len(requests)
+        
+        # Chatbots built on different services are batched separately
+        groups = {}
+        for i, (chatbot, _) in enumerate(requests):
+            groups.setdefault(id(chatbot.services), (chatbot.services, []))[1].append(i)
+        
+        for services, rows in groups.values():
+            processed_inputs = services.nlp_processor.process_many([requests[i][1] for i in rows])
+            rule_responses = services.rule_engine.get_responses(processed_inputs)
+            
+            ml_rows, ml_requests = [], []
+            for i, processed_input, rule_response in zip(rows, processed_inputs, rule_responses):
+                chatbot = requests[i][0]
+                chatbot._record_interaction(processed_input)
+                if rule_response.get('confidence', 0) > 0.8:
+                    RESPONSE_PATH_TOTAL.inc(path='rule')
+                    responses[i] = rule_response['response']
+                else:
+                    RESPONSE_PATH_TOTAL.inc(path='ml')
+                    ml_rows.append(i)
+                    ml_requests.append((processed_input, rule_response, chatbot.user_profile, chatbot.user_context))
+            
+            for i, response in zip(ml_rows, services.ml_enhancer.enhance_responses(ml_requests)):
+                responses[i] = response
         
-        return ml_response
+        return responses
     
     def run_interactive(self):
         """Run the chatbot in interactive mode on the command line."""
@@ -84,6 +211,7 @@ class HealthCoachChatbot:
 def main():
     """Main function to run the chatbot."""
     chatbot = HealthCoachChatbot()
+    print("Health Coach initialized and ready to help!")
     chatbot.run_interactive()
 
 
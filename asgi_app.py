@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Health Coach Chatbot - Async Web Interface
+
+This module serves the same routes as web_app.py from an ASGI application built
+with Quart. NLP, rule matching and profile updates run inline on the event loop;
+transformer inference runs in a bounded thread pool with a per-request timeout, so
+one process can hold many idle connections while only a controlled number of
+requests use the models at once. Session lookups, which may read SQLite, run in the
+default executor. A request whose inference times out gets the rule-based response,
+and the conversation context is only updated by inference that finished in time.
+The profile store, session cache and warmup are built by web_setup before serving,
+so importing this module has no side effects.
+
+Run it with an ASGI server, for example:
+
+    hypercorn asgi_app:app --bind 0.0.0.0:8080
+"""
+
+import asyncio
+import copy
+import functools
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, Response, render_template, request, jsonify, session
+
+from chatbot.metrics import metrics
+from web_setup import create_web_state, sse_event
+
+# Initialize Quart app
+app = Quart(__name__)
+app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24).hex())
+
+# Profile store, session cache and warmup, built by startup()
+state = None
+
+# Threads running model inference; this bounds how many requests use the models at once
+INFERENCE_WORKERS = int(os.environ.get('HEALTHCOACH_INFERENCE_WORKERS', 4))
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get('HEALTHCOACH_INFERENCE_TIMEOUT_SECONDS', 10))
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+
+INFERENCE_TIMEOUT_TOTAL = metrics.counter(
+    'healthcoach_inference_timeout_total', 'Requests answered with the rule response after an inference timeout')
+
+
+async def run_inference(func, *args, on_abandon=None):
+    """Run a blocking model call in the inference pool with the request timeout.
+
+    Args:
+        func (callable): Blocking function to run
+        *args: Arguments for the function
+        on_abandon (callable, optional): Called once an abandoned call has finished or
+            was dropped from the queue, to release what it was using
+
+    Returns:
+        The function's result
+
+    Raises:
+        asyncio.TimeoutError: If the call does not finish within the timeout
+    """
+    job = inference_executor.submit(func, *args)
+    future = asyncio.wrap_future(job)
+    # A running thread cannot be interrupted; shield it so a timeout only abandons the result
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), INFERENCE_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        # A job still waiting in the queue is dropped instead of running for nobody
+        job.cancel()
+        future.add_done_callback(functools.partial(_finish_abandoned, on_abandon))
+        raise
+
+
+def _finish_abandoned(on_abandon, future):
+    """Consume the outcome of an abandoned inference call, then run its cleanup."""
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Abandoned inference failed: {future.exception()!r}")
+    if on_abandon is not None:
+        on_abandon()
+
+
+async def get_chatbot(user_id):
+    """Get, rehydrate or create a user's chatbot without blocking the event loop on SQLite."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, state.user_chatbots.get, user_id)
+
+
+def sse_response(events):
+    """Wrap SSE strings, or an async generator of them, in an unbuffered text/event-stream response."""
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/')
+async def home():
+    """Render the home page."""
+    return await render_template('index.html')
+
+
+@app.route('/ask', methods=['POST'])
+async def ask():
+    """Process user query and return chatbot response."""
+    form = await request.form
+    user_input = form['user_input']
+    feedback = form.get('feedback', None)
+
+    if not user_input.strip():
+        return jsonify({'response': 'Please enter a question about health, nutrition, or fitness.'})
+
+    # Get or create user session ID
+    if 'user_id' not in session:
+        session['user_id'] = str(uuid.uuid4())
+
+    # Get, rehydrate or create the chatbot instance for this user
+    chatbot = await get_chatbot(session['user_id'])
+
+    # The NLP and rule path is cheap enough to run on the event loop
+    processed_input, rule_response, response = chatbot.prepare(user_input, feedback)
+    if response is None:
+        # Inference updates a copy of the context, kept only if it finishes in time
+        user_context = copy.deepcopy(chatbot.user_context)
+        try:
+            response = await run_inference(chatbot.enhance, processed_input, rule_response, None, user_context)
+            chatbot.user_context = user_context
+        except asyncio.TimeoutError:
+            INFERENCE_TIMEOUT_TOTAL.inc()
+            response = rule_response['response']
+
+    return jsonify({'response': response})
+
+
+@app.route('/ask/stream', methods=['POST'])
+async def ask_stream():
+    """Stream the chatbot response as Server-Sent Events.
+
+    The rule-based response is sent from the event loop without touching the
+    inference pool; each ML enhancement step then runs in the pool and is sent
+    as soon as it finishes. A step that times out ends the stream early, leaving
+    the client with the response built so far; the conversation context is only
+    updated when the stream runs to completion.
+    """
+    form = await request.form
+    user_input = form['user_input']
+    feedback = form.get('feedback', None)
+
+    if not user_input.strip():
+        return sse_response([
+            sse_event('replace', 'Please enter a question about health, nutrition, or fitness.'),
+            sse_event('done', '')
+        ])
+
+    if 'user_id' not in session:
+        session['user_id'] = str(uuid.uuid4())
+
+    chatbot = await get_chatbot(session['user_id'])
+
+    # The first piece only needs NLP and rule matching
+    user_context = copy.deepcopy(chatbot.user_context)
+    pieces = chatbot.stream_input(user_input, feedback, user_context=user_context)
+    first = next(pieces)
+
+    async def generate():
+        # An abandoned step still owns the generator; it is closed once that step finishes
+        in_flight = False
+        try:
+            yield sse_event(*first)
+            while True:
+                in_flight = True
+                try:
+                    piece = await run_inference(next, pieces, None, on_abandon=pieces.close)
+                except asyncio.TimeoutError:
+                    INFERENCE_TIMEOUT_TOTAL.inc()
+                    break
+                in_flight = False
+                if piece is None:
+                    chatbot.user_context = user_context
+                    break
+                yield sse_event(*piece)
+            yield sse_event('done', '')
+        finally:
+            if not in_flight:
+                pieces.close()
+
+    return sse_response(generate())
+
+
+@app.route('/about')
+async def about():
+    """Render the about page."""
+    return await render_template('about.html')
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Expose pipeline latency and cache metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/healthz')
+async def healthz():
+    """Liveness check: the event loop is up and answering requests."""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+async def readyz():
+    """Readiness check: 200 once the models are warm, 503 while warming or after a failed warmup."""
+    status = state.warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+
+@app.before_serving
+async def startup():
+    """Build the profile store, session cache and warmup before the first request."""
+    global state
+    state = create_web_state()
+
+
+@app.after_serving
+async def shutdown():
+    """Let running inference finish, then save the sessions before the process exits."""
+    inference_executor.shutdown(wait=True)
+    state.close()
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=8080)
@@ -7,7 +7,27 @@ Modules:
 - nlp_processor: Handles natural language processing
 - rule_engine: Manages rule-based responses
 - knowledge_base: Stores wellness information
+- nltk_resources: Resolves NLTK data locally on first use, without downloads
+- lexicon: Compiled keyword and entity vocabularies shared by all components
+- phrase_matcher: Aho-Corasick multi-word phrase matching
 - ml_enhancer: Provides ML-based response enhancements
+- admission: In-flight limit and load shedding in front of the models
+- deadline: Latency budgets that let enhancement steps be skipped under time pressure
+- warmup: Preloads and warms the models before a worker reports ready
+- model_backend: Model backend interface and selection by HEALTHCOACH_MODEL_BACKEND
+- onnx_models: Int8-quantized ONNX Runtime backend with the HFModels interface
+- stub_models: Deterministic model backend for tests and benchmarks, without downloads
+- model_server: Shares one copy of the models between worker processes over a Unix socket
+- embedding_index: Persisted embedding index for semantic search over the knowledge base
+- ann_index: IVF-flat approximate nearest neighbour search
+- embedding_cache: Disk-backed embedding cache shared across processes
+- intent_cascade: Tiered intent classification from keywords up to zero-shot NLI
+- batching: Micro-batches model calls from concurrent requests
+- model_registry: Shares one lazily loaded copy of each model per process
+- services: Builds the read-only components shared by all user sessions
+- session_cache: Bounded LRU/TTL cache of user sessions
+- profile_store: Persists user profiles for rehydration
+- metrics: Latency histograms and counters exported on /metrics
 """
 
 __version__ = '0.1.0'
\ No newline at end of file
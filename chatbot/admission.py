@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Admission Control Module
+
+This module bounds how many requests use the models at once. An AdmissionController
+admits up to max_in_flight callers; further callers wait in a bounded queue for at
+most a short timeout, and callers that find the queue full or time out are shed so
+they can be answered without the models instead of piling up behind them.
+Admissions, sheds, in-flight count and queue depth are exported on /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from chatbot.metrics import metrics
+
+ADMISSION_TOTAL = metrics.counter(
+    'healthcoach_admission_total', 'Admission decisions: admitted, shed_queue_full or shed_timeout',
+    ['controller', 'result'])
+ADMISSION_IN_FLIGHT = metrics.gauge(
+    'healthcoach_admission_in_flight', 'Callers currently admitted', ['controller'])
+ADMISSION_QUEUE_DEPTH = metrics.gauge(
+    'healthcoach_admission_queue_depth', 'Callers waiting for admission', ['controller'])
+
+
+class AdmissionController:
+    """Bounded in-flight limit with a bounded, short-lived wait queue."""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int = 0, queue_timeout_ms: float = 50.0):
+        """Initialize the controller.
+
+        Args:
+            name (str): Controller name used as the metrics label
+            max_in_flight (int): Callers allowed in at once
+            max_queue (int): Callers allowed to wait for a slot; further callers are shed at once
+            queue_timeout_ms (float): Longest time a queued caller waits before it is shed
+        """
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[str]:
+        """Take a slot, waiting in the queue if there is room.
+
+        Args:
+            timeout (float, optional): Longest wait in seconds, capped at the queue timeout
+
+        Returns:
+            str: None when admitted, otherwise the reason the caller was shed
+                ('shed_queue_full' or 'shed_timeout')
+        """
+        wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        with self._cond:
+            # Newcomers do not overtake callers that are already queued
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                return self._admit()
+            if self.waiting >= self.max_queue:
+                return self._shed('shed_queue_full')
+            if wait <= 0:
+                return self._shed('shed_timeout')
+
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, controller=self.name)
+            give_up = time.monotonic() + wait
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        return self._shed('shed_timeout')
+                    self._cond.wait(remaining)
+                return self._admit()
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, controller=self.name)
+                # A caller that timed out may have consumed the wakeup meant for a free slot
+                if self.waiting and self.in_flight < self.max_in_flight:
+                    self._cond.notify()
+
+    def release(self) -> None:
+        """Give back a slot taken by acquire and wake the next queued caller."""
+        with self._cond:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.set(self.in_flight, controller=self.name)
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, timeout: Optional[float] = None) -> Iterator[Optional[str]]:
+        """Hold a slot for the duration of a block.
+
+        Args:
+            timeout (float, optional): Longest wait in seconds, capped at the queue timeout
+
+        Yields:
+            str: None when admitted, otherwise the reason the caller was shed
+        """
+        shed = self.acquire(timeout)
+        try:
+            yield shed
+        finally:
+            if shed is None:
+                self.release()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the current load.
+
+        Returns:
+            dict: In-flight and queued caller counts with their limits
+        """
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue
+            }
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight, controller=self.name)
+        ADMISSION_TOTAL.inc(controller=self.name, result='admitted')
+        return None
+
+    def _shed(self, reason: str) -> str:
+        ADMISSION_TOTAL.inc(controller=self.name, result=reason)
+        return reason
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Approximate Nearest Neighbour Index Module
+
+This module provides an in-process IVF-flat index on NumPy for cosine similarity
+search over large advice corpora. Vectors are partitioned into clusters by spherical
+k-means; a query only scans the clusters whose centroids are closest to it. The
+number of clusters (nlist) and clusters probed per query (nprobe) trade recall for
+speed, and evaluate_recall measures that trade-off against exact search.
+"""
+
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first, via partial selection."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force cosine top-k over normalized vectors.
+
+    Args:
+        vectors (np.ndarray): Normalized vectors, one per row
+        query (np.ndarray): Normalized query vector
+        k (int): Number of results
+
+    Returns:
+        tuple: (row indices, scores), best first
+    """
+    scores = vectors @ query
+    top = _top_k(scores, k)
+    return top, scores[top]
+
+
+class IVFFlatIndex:
+    """Inverted-file index with exact (flat) scoring inside the probed clusters."""
+
+    def __init__(self, dim: int, nlist: int = 64, nprobe: int = 8,
+                 kmeans_iterations: int = 20, seed: int = 0):
+        """Initialize an empty, untrained index.
+
+        Args:
+            dim (int): Dimension of the vectors
+            nlist (int): Number of clusters; more clusters make queries faster but less exact
+            nprobe (int): Clusters scanned per query; more probes raise recall and cost
+            kmeans_iterations (int): Iterations of k-means when training
+            seed (int): Random seed for centroid initialization
+        """
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The stored normalized vectors, one per row, in insertion order."""
+        return self._vectors[:self._size]
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Learn cluster centroids with spherical k-means.
+
+        Vectors already in the index are reassigned to the new clusters.
+
+        Args:
+            vectors (np.ndarray): Training vectors, one per row
+        """
+        vectors = _normalize(vectors)
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot train an IVF index without vectors")
+        nlist = min(self.nlist, n)
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(n, nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            counts = np.bincount(assignments, minlength=nlist)
+            # Re-seed empty clusters with random vectors
+            empty = counts == 0
+            sums[empty] = vectors[rng.integers(0, n, empty.sum())]
+            centroids = _normalize(sums)
+
+        self.centroids = centroids.astype(np.float32)
+        self._rebuild_lists()
+
+    def _rebuild_lists(self) -> None:
+        """Assign every stored vector to its nearest centroid."""
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._list_arrays = [None] * len(self.centroids)
+        if self._size:
+            for row, cluster in enumerate(np.argmax(self.vectors @ self.centroids.T, axis=1)):
+                self._lists[cluster].append(row)
+
+    def add(self, vectors: np.ndarray) -> np.ndarray:
+        """Insert vectors; they are searchable immediately.
+
+        An untrained index keeps the vectors and answers queries exactly until
+        train() is called.
+
+        Args:
+            vectors (np.ndarray): Vectors to insert, one per row
+
+        Returns:
+            np.ndarray: Row indices assigned to the inserted vectors
+        """
+        vectors = _normalize(np.atleast_2d(vectors))
+        count = len(vectors)
+        if self._size + count > len(self._vectors):
+            capacity = max(self._size + count, 2 * len(self._vectors), 64)
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:self._size] = self.vectors
+            self._vectors = grown
+        rows = np.arange(self._size, self._size + count)
+        self._vectors[self._size:self._size + count] = vectors
+        self._size += count
+
+        if self.is_trained:
+            for row, cluster in zip(rows, np.argmax(vectors @ self.centroids.T, axis=1)):
+                self._lists[cluster].append(int(row))
+                self._list_arrays[cluster] = None
+        return rows
+
+    def _list_rows(self, cluster: int) -> np.ndarray:
+        """Row indices of one cluster as an array, cached until the cluster changes."""
+        rows = self._list_arrays[cluster]
+        if rows is None:
+            rows = self._list_arrays[cluster] = np.asarray(self._lists[cluster], dtype=np.int64)
+        return rows
+
+    def search(self, query: np.ndarray, k: int = 3,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the stored vectors most similar to a query.
+
+        Args:
+            query (np.ndarray): Query vector
+            k (int): Number of results
+            nprobe (int, optional): Clusters to scan, defaults to the index setting
+
+        Returns:
+            tuple: (row indices, cosine scores), best first
+        """
+        query = _normalize(query)
+        if not self.is_trained:
+            return exact_search(self.vectors, query, k)
+
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probed = _top_k(self.centroids @ query, nprobe)
+        candidates = np.concatenate([self._list_rows(cluster) for cluster in probed])
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+
+        scores = self._vectors[candidates] @ query
+        top = _top_k(scores, k)
+        return candidates[top], scores[top]
+
+    def evaluate_recall(self, queries: np.ndarray, k: int = 10,
+                        nprobe_values: Optional[Iterable[int]] = None) -> List[Dict]:
+        """Measure recall@k and query time against exact search.
+
+        Args:
+            queries (np.ndarray): Query vectors, one per row
+            k (int): Number of neighbours compared per query
+            nprobe_values (iterable, optional): Probe counts to evaluate, defaults to the current one
+
+        Returns:
+            list: One dict per nprobe with recall, mean query milliseconds and exact-search milliseconds
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        start = time.perf_counter()
+        truth = [set(exact_search(self.vectors, query, k)[0].tolist()) for query in queries]
+        exact_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+
+        results = []
+        for nprobe in nprobe_values or [self.nprobe]:
+            start = time.perf_counter()
+            found = [set(self.search(query, k, nprobe=nprobe)[0].tolist()) for query in queries]
+            query_ms = (time.perf_counter() - start) * 1000 / max(1, len(queries))
+            hits = sum(len(f & t) for f, t in zip(found, truth))
+            expected = sum(len(t) for t in truth)
+            results.append({
+                'nprobe': nprobe,
+                'recall': hits / expected if expected else 1.0,
+                'query_ms': query_ms,
+                'exact_query_ms': exact_ms
+            })
+        return results
+
+    def save(self, path: str, **metadata: str) -> None:
+        """Write the index to a local .npz file.
+
+        Args:
+            path (str): Destination file path
+            **metadata: Extra string values stored alongside the index
+        """
+        if not self.is_trained:
+            raise ValueError("Only trained IVF indexes can be saved")
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                params=np.array([self.dim, self.nlist, self.nprobe, self.kmeans_iterations, self.seed]),
+                centroids=self.centroids,
+                vectors=self.vectors,
+                **{f"meta_{key}": np.array(value) for key, value in metadata.items()}
+            )
+
+    @classmethod
+    def load(cls, path: str) -> Tuple['IVFFlatIndex', Dict[str, str]]:
+        """Read an index written by save().
+
+        Args:
+            path (str): Path of the .npz file
+
+        Returns:
+            tuple: (the index, metadata dict)
+        """
+        with np.load(path, allow_pickle=False) as data:
+            dim, nlist, nprobe, iterations, seed = (int(value) for value in data['params'])
+            index = cls(dim, nlist=nlist, nprobe=nprobe, kmeans_iterations=iterations, seed=seed)
+            index.centroids = data['centroids'].astype(np.float32)
+            vectors = data['vectors'].astype(np.float32)
+            metadata = {key[5:]: str(data[key]) for key in data.files if key.startswith('meta_')}
+        index._vectors = vectors
+        index._size = len(vectors)
+        index._rebuild_lists()
+        return index, metadata
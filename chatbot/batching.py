@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-Batching Module
+
+This module coalesces model calls from concurrent request threads. Callers submit
+items to a MicroBatcher and block on a future; a background thread collects items
+until the batch is full or the oldest item has waited max_wait_ms, runs one batched
+call, and hands each caller its own result. Batch sizes and queue waits are exported
+as histograms on /metrics.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from chatbot.metrics import metrics
+
+BATCH_SIZE = metrics.histogram(
+    'healthcoach_batch_size', 'Items per micro-batch', ['batcher'])
+BATCH_QUEUE_WAIT_SECONDS = metrics.histogram(
+    'healthcoach_batch_queue_wait_seconds', 'Time items wait in a micro-batch queue', ['batcher'])
+
+
+class MicroBatcher:
+    """Queues items from many threads and processes them in batches."""
+
+    def __init__(self, process_batch: Callable[[List[Any]], Sequence[Any]], name: str,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        """Initialize the batcher and start its worker thread.
+
+        Args:
+            process_batch (callable): Takes a list of items and returns one result per item, in order
+            name (str): Batcher name used as the metrics label
+            max_batch_size (int): Largest number of items processed together
+            max_wait_ms (float): Longest time the first item of a batch waits for more items
+        """
+        self.process_batch = process_batch
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[Optional[Tuple[Any, Future, float]]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"micro-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item.
+
+        Args:
+            item: Input for process_batch
+
+        Returns:
+            Future: Resolves to the item's result
+        """
+        if self._closed:
+            raise RuntimeError(f"Micro-batcher '{self.name}' is closed")
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def map(self, items: Sequence[Any]) -> List[Any]:
+        """Queue several items and wait for their results.
+
+        The items may be processed together with other callers' items.
+
+        Args:
+            items (list): Inputs for process_batch
+
+        Returns:
+            list: One result per item, in order
+        """
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Stop the worker thread after the queued items are processed."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    def _collect(self) -> Tuple[List[Tuple[Any, Future, float]], bool]:
+        """Block for the first item, then gather more until the batch is full or the wait expires."""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            BATCH_SIZE.observe(len(batch), batcher=self.name)
+            for _, _, enqueued in batch:
+                BATCH_QUEUE_WAIT_SECONDS.observe(started - enqueued, batcher=self.name)
+
+            # Skip items whose callers have gone away
+            live = [(item, future) for item, future, _ in batch if future.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                results = self.process_batch([item for item, _ in live])
+                if len(results) != len(live):
+                    raise RuntimeError(f"Micro-batcher '{self.name}' got {len(results)} results for {len(live)} items")
+            except BaseException as exc:
+                for _, future in live:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(live, results):
+                future.set_result(result)
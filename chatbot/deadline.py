@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deadline Module
+
+This module provides the latency budget used to degrade ML enhancement gracefully.
+A Deadline is created when a request starts; each enhancement step asks its
+StepCost whether the remaining budget covers the step's expected duration and is
+skipped when it does not, so a slow model call cannot push a response past its budget.
+
+Step costs are time-decayed moving averages that leave out runs overlapping a model
+load or index build, and a skipped step is still run now and then as a probe, so one
+slow run cannot lock a step out for good. Warmup runs inside unbudgeted(), which
+disables the default budget and keeps its timings out of the estimates.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from chatbot.metrics import metrics
+
+STEP_PROBE_TOTAL = metrics.counter(
+    'healthcoach_step_probe_total', 'Steps run over the latency budget to refresh their cost estimate', ['step'])
+
+_local = threading.local()
+_cold_start_lock = threading.Lock()
+_cold_start_generation = 0
+_cold_starts_active = 0
+
+
+@contextmanager
+def unbudgeted():
+    """Run the enclosed calls in this thread without a default budget or cost samples.
+
+    Used for warmup, whose first-inference timings say nothing about steady-state cost.
+    """
+    previous = getattr(_local, 'unbudgeted', False)
+    _local.unbudgeted = True
+    try:
+        yield
+    finally:
+        _local.unbudgeted = previous
+
+
+def budgeted() -> bool:
+    """Check whether calls in this thread use latency budgets, i.e. are not inside unbudgeted()."""
+    return not getattr(_local, 'unbudgeted', False)
+
+
+@contextmanager
+def cold_start():
+    """Mark the enclosed block as one-off startup work, such as a model load or index build.
+
+    Step runs that overlap it are not sampled, since they include time a warm process never spends.
+    """
+    global _cold_start_generation, _cold_starts_active
+    with _cold_start_lock:
+        _cold_start_generation += 1
+        _cold_starts_active += 1
+    try:
+        yield
+    finally:
+        with _cold_start_lock:
+            _cold_start_generation += 1
+            _cold_starts_active -= 1
+
+
+class Deadline:
+    """A point in time by which a response must be ready."""
+
+    def __init__(self, seconds: float):
+        """Start a deadline that expires after the given budget.
+
+        Args:
+            seconds (float): Latency budget in seconds, counted from now
+        """
+        self.budget = seconds
+        self.expires_at = time.perf_counter() + seconds
+
+    @classmethod
+    def from_ms(cls, milliseconds: Optional[float]) -> Optional["Deadline"]:
+        """Create a deadline from a budget in milliseconds.
+
+        Args:
+            milliseconds (float, optional): Latency budget; None or 0 means unlimited
+
+        Returns:
+            Deadline: The deadline, or None for an unlimited budget
+        """
+        if not milliseconds or milliseconds <= 0:
+            return None
+        return cls(milliseconds / 1000.0)
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.perf_counter())
+
+    def expired(self) -> bool:
+        """Check whether the deadline has passed."""
+        return time.perf_counter() >= self.expires_at
+
+    def allows(self, expected_seconds: float) -> bool:
+        """Check whether a step expected to take the given time fits in the remaining budget.
+
+        Args:
+            expected_seconds (float): Typical duration of the step
+
+        Returns:
+            bool: True if the step is expected to finish before the deadline
+        """
+        return self.remaining() > expected_seconds
+
+
+class StepCost:
+    """Expected duration of one step, deciding whether it fits a deadline.
+
+    Each sampled run is folded into an exponentially weighted moving average, and
+    the estimate halves for every half_life_seconds without a new sample. A step
+    the budget keeps skipping is run anyway after probe_every skips, and the probe's
+    duration replaces the estimate, so it follows the model's current speed rather
+    than its slowest moment.
+    """
+
+    def __init__(self, name: str, alpha: float = 0.2, half_life_seconds: float = 30.0,
+                 probe_every: int = 20):
+        """Initialize an estimate with no samples; the step always runs until it has one.
+
+        Args:
+            name (str): Step name used in metrics
+            alpha (float): Weight of a new sample in the moving average
+            half_life_seconds (float): Time after which an estimate without new samples halves
+            probe_every (int): Skips after which the step runs anyway as a probe
+        """
+        self.name = name
+        self.alpha = alpha
+        self.half_life_seconds = half_life_seconds
+        self.probe_every = probe_every
+        self._value: Optional[float] = None
+        self._updated = 0.0
+        self._skips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _decayed(self, now: float) -> float:
+        if self._value is None:
+            return 0.0
+        return self._value * 0.5 ** ((now - self._updated) / self.half_life_seconds)
+
+    def estimate(self) -> float:
+        """Expected seconds per item of the step, 0 before it has been sampled."""
+        with self._lock:
+            return self._decayed(time.monotonic())
+
+    def allows(self, deadline: Optional[Deadline], count: int = 1) -> bool:
+        """Decide whether to run the step for count items.
+
+        Args:
+            deadline (Deadline, optional): Latency budget, or None for no limit
+            count (int): Items the step would process
+
+        Returns:
+            bool: True if the step fits the remaining budget or is due for a probe
+        """
+        if deadline is None or deadline.allows(self.estimate() * count):
+            return True
+        with self._lock:
+            self._skips += 1
+            if self._skips < self.probe_every:
+                return False
+            self._skips = 0
+            self._probing = True
+        STEP_PROBE_TOTAL.inc(step=self.name)
+        return True
+
+    def observe(self, seconds: float) -> None:
+        """Fold one per-item duration into the estimate."""
+        now = time.monotonic()
+        with self._lock:
+            if self._value is None or self._probing:
+                self._value = seconds
+            else:
+                current = self._decayed(now)
+                self._value = current + self.alpha * (seconds - current)
+            self._updated = now
+            self._skips = 0
+            self._probing = False
+
+    @contextmanager
+    def measure(self, count: int = 1):
+        """Time the enclosed run of the step over count items and sample it.
+
+        Runs inside unbudgeted() or overlapping a cold_start() block are not sampled.
+        """
+        with _cold_start_lock:
+            generation = _cold_start_generation
+            cold = _cold_starts_active > 0
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        with _cold_start_lock:
+            cold = cold or _cold_start_generation != generation
+        if not cold and budgeted() and count > 0:
+            self.observe(elapsed / count)
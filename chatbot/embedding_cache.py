@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Embedding Cache Module
+
+This module caches sentence embeddings by content so repeated user queries skip the
+transformer entirely. An in-memory LRU sits in front of an append-only, memory-mapped
+file of fixed-size records keyed by a hash of (model name, normalized text). Several
+worker processes can read the file concurrently and append to it under a file lock.
+When the file reaches its entry limit it is compacted under the same lock: the newest
+records are rewritten to a fresh file that replaces it, and every process rebuilds its
+row index from the new file on its next lookup.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from chatbot.metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialized within this process
+    fcntl = None
+
+EMBEDDING_CACHE_TOTAL = metrics.counter(
+    'healthcoach_embedding_cache_total', 'Embedding cache lookups by result', ['result'])
+EMBEDDING_CACHE_COMPACTIONS_TOTAL = metrics.counter(
+    'healthcoach_embedding_cache_compactions_total', 'Embedding cache files compacted at the entry limit')
+
+KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache shared by every worker process."""
+
+    def __init__(self, directory: str, model_name: str, memory_entries: int = 10000,
+                 max_disk_entries: Optional[int] = None):
+        """Initialize the cache.
+
+        Args:
+            directory (str): Directory holding the cache files, created on the first write
+            model_name (str): Embedding model the cached vectors come from
+            memory_entries (int): Maximum number of embeddings kept in the in-memory LRU
+            max_disk_entries (int, optional): Records the file may hold before it is compacted to
+                the newest half, defaults to HEALTHCOACH_EMBEDDING_CACHE_MAX_ENTRIES or 100000
+        """
+        self.directory = directory
+        self.model_name = model_name
+        self.memory_entries = memory_entries
+        if max_disk_entries is None:
+            max_disk_entries = int(os.environ.get('HEALTHCOACH_EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+        self.max_disk_entries = max(max_disk_entries, 1)
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
+        self.data_path = os.path.join(directory, f"{slug}.f32")
+        self.meta_path = os.path.join(directory, f"{slug}.json")
+
+        self.dim: Optional[int] = None
+        self._dtype = None
+        self._memory: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._index: Dict[bytes, int] = {}
+        self._map = None
+        self._rows = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.Lock()
+
+        # Lookup statistics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.compactions = 0
+
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                self._set_dim(json.load(f)['dim'])
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text so trivially different queries share an entry."""
+        return " ".join(text.lower().split())
+
+    def _key(self, text: str) -> bytes:
+        """Content hash of the model name and normalized text."""
+        payload = f"{self.model_name}\0{self.normalize_text(text)}".encode('utf-8')
+        return hashlib.blake2b(payload, digest_size=KEY_BYTES).digest()
+
+    def _set_dim(self, dim: int) -> None:
+        self.dim = int(dim)
+        self._dtype = np.dtype([('key', f'V{KEY_BYTES}'), ('vec', '<f4', (self.dim,))])
+
+    def _refresh(self) -> None:
+        """Map records appended since the last refresh, including other processes' writes.
+
+        The row index only ever describes the current file, so it holds at most
+        max_disk_entries keys; a compacted file is indexed again from its first row.
+        """
+        if self._dtype is None:
+            return
+        try:
+            f = open(self.data_path, 'rb')
+        except FileNotFoundError:
+            return
+        # Size and mapping come from the same open file, which a compaction cannot shrink
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_ino != self._inode:
+                self._index.clear()
+                self._map = None
+                self._rows = 0
+                self._inode = stat.st_ino
+            rows = stat.st_size // self._dtype.itemsize
+            if rows <= self._rows:
+                return
+            self._map = np.memmap(f, dtype=self._dtype, mode='r', shape=(rows,))
+        for offset, key in enumerate(self._map['key'][self._rows:rows]):
+            self._index[key.tobytes()] = self._rows + offset
+        self._rows = rows
+
+    def _remember(self, key: bytes, vector: np.ndarray) -> None:
+        """Put a vector in the in-memory LRU; must be called with the lock held."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for several texts.
+
+        Args:
+            texts (list): Input texts
+
+        Returns:
+            list: Cached embedding per text, or None where the text is not cached
+        """
+        keys = [self._key(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            refreshed = False
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    EMBEDDING_CACHE_TOTAL.inc(result='memory_hit')
+                    results[i] = vector
+                    continue
+
+                if key not in self._index and not refreshed:
+                    self._refresh()
+                    refreshed = True
+                row = self._index.get(key)
+                if row is None:
+                    self.misses += 1
+                    EMBEDDING_CACHE_TOTAL.inc(result='miss')
+                    continue
+
+                vector = np.array(self._map['vec'][row])
+                self._remember(key, vector)
+                self.disk_hits += 1
+                EMBEDDING_CACHE_TOTAL.inc(result='disk_hit')
+                results[i] = vector
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: np.ndarray) -> None:
+        """Store embeddings for several texts in memory and on disk.
+
+        Args:
+            texts (list): Input texts
+            vectors (np.ndarray): Their embeddings, one row per text
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(texts) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self._set_dim(vectors.shape[1])
+                os.makedirs(self.directory, exist_ok=True)
+                tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'model_name': self.model_name, 'dim': self.dim}, f)
+                os.replace(tmp_path, self.meta_path)
+
+            new_records = {}
+            for text, vector in zip(texts, vectors):
+                key = self._key(text)
+                self._remember(key, vector)
+                if key not in self._index:
+                    new_records[key] = vector
+            if not new_records:
+                return
+
+            records = np.empty(len(new_records), dtype=self._dtype)
+            records['key'] = [np.void(key) for key in new_records]
+            records['vec'] = np.stack(list(new_records.values()))
+            with self._locked_file() as f:
+                rows = os.fstat(f.fileno()).st_size // self._dtype.itemsize
+                if rows + len(records) > self.max_disk_entries:
+                    self._compact(rows, records)
+                else:
+                    f.write(records.tobytes())
+                    f.flush()
+            self._refresh()
+
+    @contextmanager
+    def _locked_file(self):
+        """Open the data file for appending and hold its file lock.
+
+        A process waiting for the lock may find the file was replaced by a compaction
+        meanwhile, so the lock is only trusted once it is held on the current file.
+
+        Yields:
+            file: The data file, opened for appending
+        """
+        while True:
+            f = open(self.data_path, 'ab')
+            if fcntl is None:
+                break
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.data_path).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+        try:
+            yield f
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+    def _compact(self, rows: int, records: np.ndarray) -> None:
+        """Replace the data file with its newest records plus new ones; call with the file lock held.
+
+        Args:
+            rows (int): Records currently in the file
+            records (np.ndarray): New records to add
+        """
+        existing = np.fromfile(self.data_path, dtype=self._dtype, count=rows)
+        combined = np.concatenate([existing, records])
+        # Keep the newest copy of each key, up to half the limit (all new records if more)
+        keep = max(self.max_disk_entries // 2, min(len(records), self.max_disk_entries))
+        seen = set()
+        kept = []
+        for row in range(len(combined) - 1, -1, -1):
+            key = combined['key'][row].tobytes()
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(row)
+            if len(kept) == keep:
+                break
+        tmp_path = f"{self.data_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(combined[kept[::-1]].tobytes())
+        os.replace(tmp_path, self.data_path)
+        self.compactions += 1
+        EMBEDDING_CACHE_COMPACTIONS_TOTAL.inc()
+
+    def stats(self) -> Dict:
+        """Get cache statistics.
+
+        Returns:
+            dict: Memory and disk hit counts, misses, hit rate, entry counts and compactions
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'disk_entries': self._rows,
+            'compactions': self.compactions
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Embedding Index Module
+
+This module maintains a precomputed embedding index over every advice string in the
+knowledge base. Normalized embeddings are stored as a memory-mappable .npy file with
+a JSON manifest keyed by a hash of the knowledge base text and the embedding model,
+so the index is only rebuilt when the content changes. Queries then cost a single
+encode plus a partial top-k selection, either exact or through an IVF-flat
+approximate nearest neighbour index for large corpora.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chatbot.ann_index import IVFFlatIndex, exact_search
+from chatbot.deadline import cold_start
+
+
+class KnowledgeIndex:
+    """Semantic top-k search over the knowledge base advice."""
+
+    EMBEDDINGS_FILE = 'kb_embeddings.npy'
+    MANIFEST_FILE = 'kb_manifest.json'
+    ANN_FILE = 'kb_ivf.npz'
+
+    def __init__(self, hf_models, knowledge_base, index_dir: Optional[str] = None,
+                 backend: str = 'exact', nlist: Optional[int] = None, nprobe: int = 8):
+        """Initialize the index; it is loaded or built on first use.
+
+        Args:
+            hf_models (HFModels): Models used to encode advice and queries
+            knowledge_base (KnowledgeBase): Source of the advice strings
+            index_dir (str, optional): Directory for the index files, defaults to <cache_dir>/kb_index
+            backend (str): 'exact' for brute-force search or 'ivf' for approximate search
+            nlist (int, optional): IVF cluster count, defaults to about sqrt of the corpus size
+            nprobe (int): IVF clusters scanned per query
+        """
+        if backend not in ('exact', 'ivf'):
+            raise ValueError(f"Unknown index backend: {backend}")
+        self.hf_models = hf_models
+        self.knowledge_base = knowledge_base
+        self.index_dir = index_dir or os.path.join(hf_models.cache_dir, 'kb_index')
+        self.backend = backend
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ann: Optional[IVFFlatIndex] = None
+
+        # (topic, subcategory, advice) for each row of the embedding matrix
+        self.entries: List[Tuple[str, str, str]] = list(knowledge_base.iter_advice())
+        self.topics = {topic for topic, _, _ in self.entries}
+        self.content_hash = self._content_hash()
+
+        self.embeddings: Optional[np.ndarray] = None
+        self._topic_rows: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def _content_hash(self) -> str:
+        """Hash the embedding model fingerprint and every indexed entry."""
+        digest = hashlib.sha256(self.hf_models.embedding_fingerprint.encode('utf-8'))
+        for entry in self.entries:
+            digest.update(b'\0' + '\x1f'.join(entry).encode('utf-8'))
+        return digest.hexdigest()
+
+    @property
+    def embeddings_path(self) -> str:
+        return os.path.join(self.index_dir, self.EMBEDDINGS_FILE)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.index_dir, self.MANIFEST_FILE)
+
+    @property
+    def ann_path(self) -> str:
+        return os.path.join(self.index_dir, self.ANN_FILE)
+
+    def _read_manifest(self) -> Optional[Dict]:
+        """Read the manifest, or return None if it is missing or unreadable."""
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def is_current(self) -> bool:
+        """Check whether the index on disk matches the current knowledge base.
+
+        Returns:
+            bool: True if the stored index can be used without rebuilding
+        """
+        manifest = self._read_manifest()
+        return (manifest is not None and manifest.get('content_hash') == self.content_hash
+                and os.path.exists(self.embeddings_path))
+
+    def build(self) -> None:
+        """Encode every advice string and write the index files."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        embeddings = self.hf_models.get_normalized_embeddings([advice for _, _, advice in self.entries])
+
+        # Write to temporary files first so readers never see a partial index
+        tmp_suffix = f".{os.getpid()}.tmp"
+        with open(self.embeddings_path + tmp_suffix, 'wb') as f:
+            np.save(f, embeddings.astype(np.float32))
+        manifest = {
+            'content_hash': self.content_hash,
+            'model_name': self.hf_models.embedding_fingerprint,
+            'count': len(self.entries),
+            'dim': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            'entries': [list(entry) for entry in self.entries]
+        }
+        with open(self.manifest_path + tmp_suffix, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(self.embeddings_path + tmp_suffix, self.embeddings_path)
+        os.replace(self.manifest_path + tmp_suffix, self.manifest_path)
+
+    def load(self) -> None:
+        """Memory-map the index, rebuilding it first if the knowledge base changed."""
+        if self.embeddings is not None:
+            return
+        with self._lock, cold_start():
+            if self.embeddings is not None:
+                return
+            if not self.is_current():
+                self.build()
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+
+            topics = np.array([topic for topic, _, _ in self.entries])
+            self._topic_rows = {topic: np.flatnonzero(topics == topic) for topic in set(topics)}
+            if self.backend == 'ivf':
+                self.ann = self._load_ann(embeddings)
+            self.embeddings = embeddings
+
+    def _load_ann(self, embeddings: np.ndarray) -> IVFFlatIndex:
+        """Load the IVF index for the current content, training and saving it if needed."""
+        if os.path.exists(self.ann_path):
+            ann, metadata = IVFFlatIndex.load(self.ann_path)
+            if metadata.get('content_hash') == self.content_hash:
+                ann.nprobe = self.nprobe
+                return ann
+
+        nlist = self.nlist or max(1, int(np.sqrt(len(embeddings))))
+        ann = IVFFlatIndex(embeddings.shape[1], nlist=nlist, nprobe=self.nprobe)
+        ann.train(embeddings)
+        ann.add(embeddings)
+        tmp_path = f"{self.ann_path}.{os.getpid()}.tmp"
+        ann.save(tmp_path, content_hash=self.content_hash)
+        os.replace(tmp_path, self.ann_path)
+        return ann
+
+    def evaluate_recall(self, queries: List[str], top_k: int = 3,
+                        nprobe_values: Optional[List[int]] = None) -> List[Dict]:
+        """Compare the IVF backend against exact search on sample queries.
+
+        Args:
+            queries (list): Representative query texts
+            top_k (int): Number of neighbours compared per query
+            nprobe_values (list, optional): Probe counts to evaluate
+
+        Returns:
+            list: One dict per nprobe with recall and query milliseconds, see IVFFlatIndex.evaluate_recall
+        """
+        self.load()
+        if self.ann is None:
+            raise ValueError("Recall evaluation needs the 'ivf' backend")
+        vectors = self.hf_models.get_normalized_embeddings(list(queries))
+        return self.ann.evaluate_recall(vectors, k=top_k, nprobe_values=nprobe_values)
+
+    def add_advice(self, topic: str, subcategory: str, advice: str) -> None:
+        """Insert a new advice string into the loaded index without rebuilding it.
+
+        The addition lives in memory; add it to the knowledge base as well to keep
+        it across restarts.
+
+        Args:
+            topic (str): Topic of the advice (nutrition, fitness, sleep, stress)
+            subcategory (str): Subcategory within the topic
+            advice (str): The advice text
+        """
+        self.load()
+        vector = self.hf_models.get_normalized_embeddings([advice])
+        with self._lock:
+            # Swap in new containers rather than mutating them, so searches keep a consistent snapshot
+            row = len(self.entries)
+            topic_rows = dict(self._topic_rows)
+            topic_rows[topic] = np.append(topic_rows.get(topic, np.empty(0, dtype=np.int64)), row)
+            self.entries = self.entries + [(topic, subcategory, advice)]
+            self.topics = self.topics | {topic}
+            self._topic_rows = topic_rows
+            self.embeddings = np.vstack([self.embeddings, vector])
+            if self.ann is not None:
+                self.ann.add(vector)
+
+    def search(self, query: str, top_k: int = 3, topic: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Find the advice most similar to a query.
+
+        Args:
+            query (str): The query text
+            top_k (int): Number of top matches to return
+            topic (str, optional): Restrict results to one topic (nutrition, fitness, sleep, stress)
+
+        Returns:
+            list: List of (advice, score) tuples for the top matches, best first
+        """
+        self.load()
+        return self.search_vector(self.hf_models.get_normalized_embeddings(query), top_k, topic)
+
+    def search_many(self, queries: List[str], top_k: int = 3,
+                    topics: Optional[List[Optional[str]]] = None) -> List[List[Tuple[str, float]]]:
+        """Find the advice most similar to each of several queries with a single encode call.
+
+        Args:
+            queries (list): The query texts
+            top_k (int): Number of top matches to return per query
+            topics (list, optional): Topic filter for each query, None entries search every topic
+
+        Returns:
+            list: For each query, a list of (advice, score) tuples, best first
+        """
+        self.load()
+        if not queries:
+            return []
+        vectors = self.hf_models.get_normalized_embeddings(list(queries))
+        topics = topics or [None] * len(queries)
+        return [self.search_vector(vector, top_k, topic) for vector, topic in zip(vectors, topics)]
+
+    def search_vector(self, vector: np.ndarray, top_k: int = 3,
+                      topic: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Find the advice most similar to an already-encoded, normalized query.
+
+        Args:
+            vector (np.ndarray): Normalized query embedding
+            top_k (int): Number of top matches to return
+            topic (str, optional): Restrict results to one topic
+
+        Returns:
+            list: List of (advice, score) tuples for the top matches, best first
+        """
+        self.load()
+        # Snapshot the index so a concurrent add_advice cannot change it mid-search
+        with self._lock:
+            entries, embeddings, topic_rows = self.entries, self.embeddings, self._topic_rows
+            rows = topic_rows.get(topic) if topic else None
+            ann_hits = None
+            if self.ann is not None and not (topic and rows is None):
+                # Over-fetch when filtering by topic, then fall back to exact search if too few remain
+                fetch = top_k if rows is None else min(len(entries), top_k * 8)
+                ann_hits = self.ann.search(vector, fetch)
+        if topic and rows is None:
+            return []
+
+        if ann_hits is not None:
+            indices, scores = ann_hits
+            matches = [(entries[i][2], float(score)) for i, score in zip(indices, scores)
+                       if topic is None or entries[i][0] == topic][:top_k]
+            if len(matches) >= min(top_k, len(rows) if rows is not None else len(entries)):
+                return matches
+
+        if rows is None:
+            indices, scores = exact_search(embeddings, vector, top_k)
+        else:
+            positions, scores = exact_search(embeddings[rows], vector, top_k)
+            indices = rows[positions]
+        return [(entries[i][2], float(score)) for i, score in zip(indices, scores)]
@@ -6,75 +6,251 @@ Hugging Face Models Module
 
 This module integrates Hugging Face transformer models into the Health Coach chatbot
 to enhance natural language understanding and response generation capabilities.
+
+torch, transformers and sentence_transformers are imported on first use rather
+than with this module, so rule-only answers never pay for loading them. In client
+mode the models run in a shared model server process instead (see model_server).
 """
 
 import os
-import torch
-from typing import Dict, List, Tuple, Union, Optional
-from transformers import (
-    AutoModelForQuestionAnswering,
-    AutoModelForSequenceClassification,
-    AutoTokenizer,
-    pipeline
-)
-from sentence_transformers import SentenceTransformer
+import numpy as np
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union, Optional
+
+from chatbot.batching import MicroBatcher
+from chatbot.embedding_cache import EmbeddingCache
+from chatbot.metrics import STAGE_SECONDS
+from chatbot.model_backend import ModelBackendBase, default_cache_dir
+from chatbot.model_registry import ModelKey, ModelRegistry, get_model_registry
+from chatbot.model_server import ModelServerClient
 
-class HFModels:
+if TYPE_CHECKING:
+    import torch
+
+class HFModels(ModelBackendBase):
     """Manages Hugging Face models for the Health Coach chatbot."""
     
-    def __init__(self, cache_dir: Optional[str] = None):
+    def __init__(self, cache_dir: Optional[str] = None, registry: Optional[ModelRegistry] = None,
+                 dtype: str = "float32", use_embedding_cache: bool = True,
+                 embedding_cache_dir: Optional[str] = None, micro_batch_wait_ms: Optional[float] = None,
+                 micro_batch_size: Optional[int] = None, model_server: Optional[str] = None):
         """Initialize the Hugging Face models.
         
+        Models are not owned by this instance: they are loaded lazily into the
+        process-wide model registry and shared with every other HFModels. In client
+        mode they are not loaded in this process at all; model calls are sent to the
+        model server, which batches them with other workers' calls, while the embedding
+        cache and intent prototypes still work locally.
+        
         Args:
-            cache_dir (str, optional): Directory to cache downloaded models
+            cache_dir (str, optional): Directory to cache downloaded models, defaults to
+                HEALTHCOACH_CACHE_DIR or models/
+            registry (ModelRegistry, optional): Registry to load models into
+            dtype (str): Torch dtype name to load the models with
+            use_embedding_cache (bool): Whether to reuse embeddings of previously seen texts
+            embedding_cache_dir (str, optional): Directory of the embedding cache shared by
+                worker processes, defaults to <cache_dir>/embedding_cache
+            micro_batch_wait_ms (float, optional): Longest time a model call waits to be batched with
+                calls from other threads; defaults to HEALTHCOACH_MICRO_BATCH_WAIT_MS, 0 disables batching.
+                Ignored in client mode, where the model server does the batching
+            micro_batch_size (int, optional): Largest micro-batch, defaults to HEALTHCOACH_MICRO_BATCH_SIZE or 32
+            model_server (str, optional): Unix socket of a model server to send model calls to,
+                defaults to HEALTHCOACH_MODEL_SERVER; empty runs the models in this process
         """
-        self.cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
-        os.makedirs(self.cache_dir, exist_ok=True)
+        super().__init__()
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.registry = registry or get_model_registry()
+        self.dtype = dtype
         
         # Model names
         self.qa_model_name = "deepset/roberta-base-squad2"
         self.intent_model_name = "facebook/bart-large-mnli"
         self.embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
         
-        # Initialize models as None (lazy loading)
-        self.qa_pipeline = None
-        self.intent_classifier = None
-        self.sentence_transformer = None
+        # Device configuration, detected on first use since it needs torch
+        self._device: Optional[str] = None
         
-        # Device configuration
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {self.device}")
+        # Client mode: run the models in a shared model server process
+        if model_server is None:
+            model_server = os.environ.get('HEALTHCOACH_MODEL_SERVER', '')
+        self.model_client: Optional[ModelServerClient] = ModelServerClient(model_server) if model_server else None
+        
+        # Content-addressed embedding cache, see _encode
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if use_embedding_cache:
+            self.embedding_cache = EmbeddingCache(
+                embedding_cache_dir or os.path.join(self.cache_dir, 'embedding_cache'),
+                self.embedding_fingerprint
+            )
+        
+        # Micro-batchers coalescing concurrent model calls, keyed by model
+        if micro_batch_wait_ms is None:
+            micro_batch_wait_ms = float(os.environ.get('HEALTHCOACH_MICRO_BATCH_WAIT_MS', 0))
+        if micro_batch_size is None:
+            micro_batch_size = int(os.environ.get('HEALTHCOACH_MICRO_BATCH_SIZE', 32))
+        self._batchers: Dict[str, MicroBatcher] = {}
+        # In client mode the server batches across workers; waiting here as well only adds latency
+        if micro_batch_wait_ms > 0 and self.model_client is None:
+            for name, run in (('qa', self._run_qa), ('intent', self._run_intent),
+                              ('embedding', self._run_embedding)):
+                self._batchers[name] = MicroBatcher(run, name, max_batch_size=micro_batch_size,
+                                                    max_wait_ms=micro_batch_wait_ms)
+    
+    @property
+    def device(self) -> str:
+        """Device the models run on: "cuda" when torch sees a GPU, otherwise "cpu"."""
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Using device: {self._device}")
+        return self._device
+    
+    @device.setter
+    def device(self, device: str):
+        self._device = device
+    
+    @property
+    def embedding_fingerprint(self) -> str:
+        """Identifies the vectors this instance produces; embedding caches and indexes are keyed by it."""
+        return self.embedding_model_name
+    
+    @property
+    def qa_key(self) -> ModelKey:
+        """Registry key of the question-answering model."""
+        return ModelKey(self.qa_model_name, "question-answering", self.device, self.dtype)
+    
+    @property
+    def intent_key(self) -> ModelKey:
+        """Registry key of the intent classification model."""
+        return ModelKey(self.intent_model_name, "zero-shot-classification", self.device, self.dtype)
+    
+    @property
+    def embedding_key(self) -> ModelKey:
+        """Registry key of the sentence embedding model."""
+        return ModelKey(self.embedding_model_name, "sentence-embedding", self.device, self.dtype)
+    
+    @property
+    def qa_pipeline(self):
+        """The shared question-answering pipeline, or None if it is not loaded."""
+        return self.registry.get(self.qa_key)
+    
+    @property
+    def intent_classifier(self):
+        """The shared zero-shot classification pipeline, or None if it is not loaded."""
+        return self.registry.get(self.intent_key)
+    
+    @property
+    def sentence_transformer(self):
+        """The shared sentence embedding model, or None if it is not loaded."""
+        return self.registry.get(self.embedding_key)
+    
+    def _build_pipeline(self, task: str, model_name: str):
+        """Build a transformers pipeline for this instance's device and dtype."""
+        import torch
+        from transformers import pipeline
+        return pipeline(
+            task,
+            model=model_name,
+            tokenizer=model_name,
+            device=0 if self.device == "cuda" else -1,
+            torch_dtype=getattr(torch, self.dtype)
+        )
+    
+    def _build_qa_model(self):
+        """Build the question-answering pipeline."""
+        print(f"Loading QA model: {self.qa_model_name}")
+        return self._build_pipeline("question-answering", self.qa_model_name)
+    
+    def _build_intent_model(self):
+        """Build the zero-shot intent classification pipeline."""
+        print(f"Loading intent classification model: {self.intent_model_name}")
+        return self._build_pipeline("zero-shot-classification", self.intent_model_name)
+    
+    def _build_embedding_model(self):
+        """Build the sentence embedding model."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        print(f"Loading sentence embedding model: {self.embedding_model_name}")
+        model = SentenceTransformer(self.embedding_model_name, cache_folder=self.cache_dir)
+        if self.device == "cuda":
+            model = model.to(torch.device("cuda"))
+        if self.dtype != "float32":
+            model = model.to(getattr(torch, self.dtype))
+        return model
     
     def load_qa_model(self):
         """Load the question-answering model."""
-        if self.qa_pipeline is None:
-            print(f"Loading QA model: {self.qa_model_name}")
-            self.qa_pipeline = pipeline(
-                "question-answering",
-                model=self.qa_model_name,
-                tokenizer=self.qa_model_name,
-                device=0 if self.device == "cuda" else -1
-            )
+        return self.registry.load(self.qa_key, self._build_qa_model)
     
     def load_intent_model(self):
         """Load the intent classification model."""
-        if self.intent_classifier is None:
-            print(f"Loading intent classification model: {self.intent_model_name}")
-            self.intent_classifier = pipeline(
-                "zero-shot-classification",
-                model=self.intent_model_name,
-                tokenizer=self.intent_model_name,
-                device=0 if self.device == "cuda" else -1
-            )
+        return self.registry.load(self.intent_key, self._build_intent_model)
     
     def load_embedding_model(self):
         """Load the sentence embedding model."""
-        if self.sentence_transformer is None:
-            print(f"Loading sentence embedding model: {self.embedding_model_name}")
-            self.sentence_transformer = SentenceTransformer(self.embedding_model_name, cache_folder=self.cache_dir)
-            if self.device == "cuda":
-                self.sentence_transformer = self.sentence_transformer.to(torch.device("cuda"))
+        return self.registry.load(self.embedding_key, self._build_embedding_model)
     
+    def preload(self) -> None:
+        """Load all three models now instead of on first use.
+        
+        In client mode, check instead that the model server is up and produces the
+        embeddings this instance's caches are keyed by.
+        """
+        if self.model_client is not None:
+            server_fingerprint = self.model_client.ping()['embedding_fingerprint']
+            if server_fingerprint != self.embedding_fingerprint:
+                raise ValueError(f"Model server embeds with {server_fingerprint}, "
+                                 f"expected {self.embedding_fingerprint}")
+            return
+        self.load_intent_model()
+        self.load_qa_model()
+        self.load_embedding_model()
+    
+    def _dispatch(self, name: str, items: List, run) -> List:
+        """Run model inputs through the named micro-batcher, or directly when batching is off.
+        
+        Inputs that already fill a batch skip the queue.
+        """
+        batcher = self._batchers.get(name)
+        if batcher is None or len(items) >= batcher.max_batch_size:
+            return run(items)
+        return batcher.map(items)
+    
+    def _run_qa(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """Answer (question, context) pairs in one pipeline call."""
+        if self.model_client is not None:
+            return self.model_client.answer_questions(items)
+        with self.registry.lease(self.qa_key, self._build_qa_model) as qa_pipeline:
+            results = qa_pipeline(question=[question for question, _ in items],
+                                  context=[context for _, context in items])
+        # The pipeline unwraps single-item batches
+        return [results] if isinstance(results, dict) else list(results)
+    
+    def _run_intent(self, items: List[Tuple[str, Tuple[str, ...]]]) -> List[Dict]:
+        """Classify (text, candidate labels) pairs, one pipeline call per distinct label set."""
+        if self.model_client is not None:
+            return self.model_client.classify_intents(items)
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, (_, labels) in enumerate(items):
+            groups.setdefault(labels, []).append(i)
+        results: List[Optional[Dict]] = [None] * len(items)
+        with self.registry.lease(self.intent_key, self._build_intent_model) as intent_classifier:
+            for labels, rows in groups.items():
+                outputs = intent_classifier([items[i][0] for i in rows], list(labels))
+                if isinstance(outputs, dict):
+                    outputs = [outputs]
+                for i, output in zip(rows, outputs):
+                    results[i] = output
+        return results
+    
+    def _run_embedding(self, texts: List[str]) -> List[np.ndarray]:
+        """Encode texts to raw float32 embeddings in one model call."""
+        if self.model_client is not None:
+            return list(self.model_client.encode(texts))
+        with self.registry.lease(self.embedding_key, self._build_embedding_model) as sentence_transformer:
+            embeddings = sentence_transformer.encode(list(texts), convert_to_numpy=True)
+        return list(np.asarray(embeddings, dtype=np.float32))
+    
+    @STAGE_SECONDS.timed(stage='hf_answer_question')
     def answer_question(self, question: str, context: str) -> Dict:
         """Answer a question based on the provided context.
         
@@ -85,9 +261,24 @@ class HFModels:
         Returns:
             dict: Answer with score and span information
         """
-        self.load_qa_model()
-        return self.qa_pipeline(question=question, context=context)
+        return self._dispatch('qa', [(question, context)], self._run_qa)[0]
     
+    @STAGE_SECONDS.timed(stage='hf_answer_question_batch')
+    def answer_question_batch(self, questions: List[str], contexts: List[str]) -> List[Dict]:
+        """Answer several questions in a single pipeline call.
+        
+        Args:
+            questions (list): The questions to answer
+            contexts (list): The context for each question
+            
+        Returns:
+            list: Answer with score and span information for each question
+        """
+        if not questions:
+            return []
+        return self._dispatch('qa', list(zip(questions, contexts)), self._run_qa)
+    
+    @STAGE_SECONDS.timed(stage='hf_classify_intent')
     def classify_intent(self, text: str, candidate_labels: List[str]) -> Dict:
         """Classify the intent of the input text.
         
@@ -98,45 +289,58 @@ class HFModels:
         Returns:
             dict: Classification results with labels and scores
         """
-        self.load_intent_model()
-        return self.intent_classifier(text, candidate_labels)
+        return self._dispatch('intent', [(text, tuple(candidate_labels))], self._run_intent)[0]
     
-    def get_embeddings(self, texts: Union[str, List[str]]) -> torch.Tensor:
-        """Generate embeddings for the input text(s).
+    @STAGE_SECONDS.timed(stage='hf_classify_intent_batch')
+    def classify_intent_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Classify the intent of several texts in a single pipeline call.
         
         Args:
-            texts (str or list): Input text or list of texts
+            texts (list): The input texts to classify
+            candidate_labels (list): List of possible intent labels
             
         Returns:
-            torch.Tensor: Embeddings for the input text(s)
+            list: Classification results with labels and scores for each text
         """
-        self.load_embedding_model()
-        return self.sentence_transformer.encode(texts, convert_to_tensor=True)
+        if not texts:
+            return []
+        labels = tuple(candidate_labels)
+        return self._dispatch('intent', [(text, labels) for text in texts], self._run_intent)
     
-    def find_best_matches(self, query: str, candidates: List[str], top_k: int = 3) -> List[Tuple[str, float]]:
-        """Find the best matching candidates for a query using semantic similarity.
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to raw float32 embeddings, only running the model on cache misses.
         
         Args:
-            query (str): The query text
-            candidates (list): List of candidate texts to match against
-            top_k (int): Number of top matches to return
+            texts (list): Input texts
             
         Returns:
-            list: List of (candidate, score) tuples for the top matches
+            np.ndarray: Embeddings, one row per text
         """
-        self.load_embedding_model()
-        
-        # Generate embeddings
-        query_embedding = self.sentence_transformer.encode(query, convert_to_tensor=True)
-        candidate_embeddings = self.sentence_transformer.encode(candidates, convert_to_tensor=True)
-        
-        # Calculate cosine similarities
-        cos_scores = torch.nn.functional.cosine_similarity(query_embedding.unsqueeze(0), candidate_embeddings)
-        
-        # Get top-k matches
-        top_results = []
-        top_indices = torch.argsort(cos_scores, descending=True)[:top_k]
-        for idx in top_indices:
-            top_results.append((candidates[idx], cos_scores[idx].item()))
+        cached = self.embedding_cache.get_many(texts) if self.embedding_cache else [None] * len(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            fresh = np.stack(self._dispatch('embedding', missing_texts, self._run_embedding))
+            if self.embedding_cache:
+                self.embedding_cache.put_many(missing_texts, fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        if not cached:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(cached).astype(np.float32, copy=False)
+    
+    @STAGE_SECONDS.timed(stage='hf_get_embeddings')
+    def get_embeddings(self, texts: Union[str, List[str]]) -> 'torch.Tensor':
+        """Generate embeddings for the input text(s).
         
-        return top_results
\ No newline at end of file
+        Args:
+            texts (str or list): Input text or list of texts
+            
+        Returns:
+            torch.Tensor: Embeddings for the input text(s)
+        """
+        import torch
+        embeddings = self._encode([texts] if isinstance(texts, str) else list(texts))
+        if isinstance(texts, str):
+            embeddings = embeddings[0]
+        return torch.from_numpy(embeddings).to(self.device)
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Intent Cascade Module
+
+This module classifies user intents with a cascade of increasingly expensive tiers:
+keyword scoring from the NLP processor, a small scikit-learn model, an embedding
+prototype classifier and finally the zero-shot bart-large-mnli model. Each tier only
+answers when its top label leads the runner-up by a configurable margin, so the
+large model runs only for queries that every cheaper tier is unsure about.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from chatbot.deadline import StepCost, cold_start
+from chatbot.metrics import metrics
+
+INTENT_TIER_TOTAL = metrics.counter(
+    'healthcoach_intent_tier_total', 'Intent classifications by the cascade tier that answered', ['tier'])
+ZERO_SHOT_ITEM_SECONDS = metrics.histogram(
+    'healthcoach_zero_shot_item_seconds', 'Zero-shot classification time per input in seconds')
+
+# Example utterances for each intent, used to train the cheaper tiers
+INTENT_EXAMPLES = {
+    'nutrition': [
+        "what should I eat for more energy",
+        "how much protein should I eat",
+        "what are good sources of protein",
+        "is my diet healthy",
+        "what foods have the most vitamins",
+        "how many calories should I have per day",
+        "healthy meal ideas for lunch",
+        "which meats are highest in protein",
+        "should I cut carbs to lose weight",
+        "how much water should I drink"
+    ],
+    'fitness': [
+        "give me a quick workout for my lunch break",
+        "how often should I exercise",
+        "what is a good cardio routine",
+        "how do I build muscle",
+        "best exercises for strength training",
+        "how can I start running",
+        "what should I do at the gym",
+        "how do I improve my flexibility",
+        "is yoga a good workout",
+        "how long should I rest between sets"
+    ],
+    'sleep': [
+        "how can I improve my sleep",
+        "I can't fall asleep at night",
+        "why am I always tired",
+        "how many hours of sleep do I need",
+        "I keep waking up during the night",
+        "tips for better rest",
+        "is napping during the day bad",
+        "how do I fix my sleep schedule",
+        "I have trouble sleeping",
+        "what helps with insomnia"
+    ],
+    'stress': [
+        "how can I manage stress",
+        "I feel anxious all the time",
+        "how do I calm down",
+        "tips for reducing anxiety",
+        "I feel overwhelmed at work",
+        "how do I start meditating",
+        "ways to relax after a long day",
+        "how can I stop worrying so much",
+        "breathing exercises for tension",
+        "what is mindfulness"
+    ],
+    'general': [
+        "how can I be healthier",
+        "give me a wellness tip",
+        "what is a healthy lifestyle",
+        "I want to improve my wellbeing",
+        "any health advice for me",
+        "how do I stay healthy",
+        "what are some good habits",
+        "help me feel better overall",
+        "suggest something for my health",
+        "recommendations for a balanced life"
+    ]
+}
+
+
+def _ranked(scores: Dict[str, float]) -> Dict:
+    """Turn a label-to-score mapping into classify_intent's labels/scores shape."""
+    ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return {'labels': [label for label, _ in ordered], 'scores': [score for _, score in ordered]}
+
+
+class KeywordTier:
+    """Tier 1: keyword counts already computed by NLPProcessor.extract_intent."""
+
+    name = 'keyword'
+
+    def classify(self, text: str, processed_input: Dict, candidate_labels: List[str]) -> Optional[Dict]:
+        keyword_scores = processed_input['intent'].get('scores') or {}
+        token_count = max(1, len(processed_input.get('processed_tokens', [])))
+        return _ranked({label: min(1.0, keyword_scores.get(label, 0) / token_count)
+                        for label in candidate_labels})
+
+    def classify_batch(self, texts: List[str], processed_inputs: List[Dict],
+                       candidate_labels: List[str]) -> List[Optional[Dict]]:
+        return [self.classify(text, processed_input, candidate_labels)
+                for text, processed_input in zip(texts, processed_inputs)]
+
+
+class SklearnTier:
+    """Tier 2: TF-IDF features with a logistic regression model.
+
+    The model is trained once, on first use, from the intent examples and keywords.
+    """
+
+    name = 'sklearn'
+
+    def __init__(self, examples: Dict[str, List[str]], keywords: Optional[Dict[str, List[str]]] = None):
+        self.examples = examples
+        self.keywords = keywords or {}
+        self._model = None
+        self._unavailable = False
+        self._lock = threading.Lock()
+
+    def _train(self):
+        """Fit the classifier; returns None when scikit-learn is not installed."""
+        try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.pipeline import make_pipeline
+        except ImportError:
+            return None
+
+        texts, labels = [], []
+        for label in sorted(set(self.examples) | set(self.keywords)):
+            for text in [*self.examples.get(label, []), *self.keywords.get(label, [])]:
+                texts.append(text)
+                labels.append(label)
+
+        model = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+            LogisticRegression(C=10.0, max_iter=1000)
+        )
+        model.fit(texts, labels)
+        return model
+
+    def classify(self, text: str, processed_input: Dict, candidate_labels: List[str]) -> Optional[Dict]:
+        return self.classify_batch([text], [processed_input], candidate_labels)[0]
+
+    def classify_batch(self, texts: List[str], processed_inputs: List[Dict],
+                       candidate_labels: List[str]) -> List[Optional[Dict]]:
+        if self._model is None:
+            with self._lock:
+                if self._model is None and not self._unavailable:
+                    self._model = self._train()
+                    self._unavailable = self._model is None
+        if self._model is None or not texts:
+            return [None] * len(texts)
+
+        results = []
+        for probabilities in self._model.predict_proba(list(texts)):
+            scores = dict(zip(self._model.classes_, probabilities))
+            results.append(_ranked({label: float(scores.get(label, 0.0)) for label in candidate_labels}))
+        return results
+
+
+class EmbeddingPrototypeTier:
+    """Tier 3: cosine similarity to per-intent centroids of example embeddings.
+
+    Uses HFModels.classify_intent_prototypes; the centroids are built on first use.
+    """
+
+    name = 'embedding'
+
+    def __init__(self, hf_models, examples: Dict[str, List[str]]):
+        self.hf_models = hf_models
+        self.examples = examples
+        self._lock = threading.Lock()
+
+    def _ensure_prototypes(self) -> None:
+        if self.hf_models.prototype_centroids is None:
+            with self._lock:
+                if self.hf_models.prototype_centroids is None:
+                    with cold_start():
+                        self.hf_models.build_intent_prototypes(self.examples)
+
+    def classify(self, text: str, processed_input: Dict, candidate_labels: List[str]) -> Optional[Dict]:
+        self._ensure_prototypes()
+        result = self.hf_models.classify_intent_prototypes(text, candidate_labels)
+        return {'labels': result['labels'], 'scores': result['scores']}
+
+    def classify_batch(self, texts: List[str], processed_inputs: List[Dict],
+                       candidate_labels: List[str]) -> List[Optional[Dict]]:
+        self._ensure_prototypes()
+        results = self.hf_models.classify_intent_prototypes_batch(texts, candidate_labels)
+        return [{'labels': result['labels'], 'scores': result['scores']} for result in results]
+
+
+class IntentCascade:
+    """Runs intent tiers from cheapest to most expensive until one is confident."""
+
+    def __init__(self, hf_models, keywords: Optional[Dict[str, List[str]]] = None,
+                 examples: Optional[Dict[str, List[str]]] = None, margin: float = 0.3,
+                 tier_margins: Optional[Dict[str, float]] = None):
+        """Initialize the cascade.
+
+        Args:
+            hf_models (HFModels): Models used by the embedding and zero-shot tiers
+            keywords (dict, optional): Intent keywords used as extra training data
+            examples (dict, optional): Example utterances per intent
+            margin (float): Minimum lead of the top label over the runner-up for a tier to answer
+            tier_margins (dict, optional): Per-tier margin overrides keyed by tier name
+        """
+        self.hf_models = hf_models
+        examples = examples or INTENT_EXAMPLES
+        self.margin = margin
+        self.tier_margins = tier_margins or {}
+        self.tiers = [
+            KeywordTier(),
+            SklearnTier(examples, keywords),
+            EmbeddingPrototypeTier(hf_models, examples)
+        ]
+        # Expected zero-shot seconds per input, deciding whether a batch fits the deadline
+        self.zero_shot_cost = StepCost('zero_shot')
+
+    def _is_confident(self, tier_name: str, result: Dict) -> bool:
+        """Check whether a tier's top label leads by at least the margin."""
+        scores = result['scores']
+        if not scores or scores[0] <= 0:
+            return False
+        runner_up = scores[1] if len(scores) > 1 else 0.0
+        return scores[0] - runner_up >= self.tier_margins.get(tier_name, self.margin)
+
+    def classify(self, processed_input: Dict, candidate_labels: List[str]) -> Dict:
+        """Classify the intent of a processed input.
+
+        Args:
+            processed_input (dict): Processed user input with intent and entities
+            candidate_labels (list): List of possible intent labels
+
+        Returns:
+            dict: Classification results with labels, scores and the answering tier
+        """
+        text = processed_input['original_text']
+        for tier in self.tiers:
+            result = tier.classify(text, processed_input, candidate_labels)
+            if result is not None and self._is_confident(tier.name, result):
+                INTENT_TIER_TOTAL.inc(tier=tier.name)
+                return {**result, 'tier': tier.name}
+
+        result = self.hf_models.classify_intent(text, candidate_labels)
+        INTENT_TIER_TOTAL.inc(tier='zero_shot')
+        return {'labels': result['labels'], 'scores': result['scores'], 'tier': 'zero_shot'}
+
+    def classify_batch(self, processed_inputs: List[Dict], candidate_labels: List[str],
+                       deadline=None) -> List[Dict]:
+        """Classify the intents of several processed inputs.
+
+        Each tier runs once over the inputs that no cheaper tier was confident about,
+        and the remainder goes to the zero-shot model in a single pipeline call.
+
+        Args:
+            processed_inputs (list): Processed user inputs with intent and entities
+            candidate_labels (list): List of possible intent labels
+            deadline (Deadline, optional): Latency budget; if it cannot cover the expected
+                per-input zero-shot time for every remaining input, those inputs get the last
+                cheaper tier's answer, marked 'degraded', instead of a zero-shot call
+
+        Returns:
+            list: Classification results with labels, scores and the answering tier, in input order
+        """
+        texts = [processed_input['original_text'] for processed_input in processed_inputs]
+        results: List[Optional[Dict]] = [None] * len(processed_inputs)
+        unsure: List[Optional[Dict]] = [None] * len(processed_inputs)
+        pending = list(range(len(processed_inputs)))
+        for tier in self.tiers:
+            if not pending:
+                break
+            tier_results = tier.classify_batch([texts[i] for i in pending],
+                                               [processed_inputs[i] for i in pending], candidate_labels)
+            unresolved = []
+            for i, result in zip(pending, tier_results):
+                if result is not None and self._is_confident(tier.name, result):
+                    INTENT_TIER_TOTAL.inc(tier=tier.name)
+                    results[i] = {**result, 'tier': tier.name}
+                else:
+                    if result is not None and result['scores']:
+                        unsure[i] = {**result, 'tier': tier.name}
+                    unresolved.append(i)
+            pending = unresolved
+
+        if not pending:
+            return results
+
+        if not self.zero_shot_cost.allows(deadline, len(pending)):
+            # The keyword tier always scores every label, so a fallback answer exists
+            for i in pending:
+                INTENT_TIER_TOTAL.inc(tier='degraded')
+                results[i] = {**unsure[i], 'degraded': True}
+            return results
+
+        start = time.perf_counter()
+        with self.zero_shot_cost.measure(len(pending)):
+            zero_shot = self.hf_models.classify_intent_batch([texts[i] for i in pending], candidate_labels)
+        ZERO_SHOT_ITEM_SECONDS.observe((time.perf_counter() - start) / len(pending))
+        for i, result in zip(pending, zero_shot):
+            INTENT_TIER_TOTAL.inc(tier='zero_shot')
+            results[i] = {'labels': result['labels'], 'scores': result['scores'], 'tier': 'zero_shot'}
+        return results
@@ -10,11 +10,19 @@ It contains structured information about nutrition, fitness, sleep, and stress m
 
 import random
 
+from chatbot.lexicon import get_lexicon
+
 class KnowledgeBase:
     """Stores and provides access to wellness information."""
     
-    def __init__(self):
-        """Initialize the knowledge base with wellness information."""
+    def __init__(self, lexicon=None):
+        """Initialize the knowledge base with wellness information.
+        
+        Args:
+            lexicon (Lexicon, optional): Compiled subcategory vocabularies, defaults to the shared one
+        """
+        self.lexicon = lexicon or get_lexicon()
+        
         # Nutrition advice by category
         self.nutrition_advice = {
             'general': [
@@ -206,6 +214,23 @@ class KnowledgeBase:
             ]
         }
     
+    def iter_advice(self):
+        """Iterate over every advice string in the knowledge base.
+        
+        Yields:
+            tuple: (topic, subcategory, advice) for each advice string
+        """
+        categories = [
+            ('nutrition', self.nutrition_advice),
+            ('fitness', self.fitness_advice),
+            ('sleep', self.sleep_advice),
+            ('stress', self.stress_advice)
+        ]
+        for topic, advice_category in categories:
+            for subcategory, advice_list in advice_category.items():
+                for advice in advice_list:
+                    yield topic, subcategory, advice
+    
     def get_advice(self, intent_type, entities):
         """Get relevant advice based on intent and entities.
         
@@ -235,58 +260,8 @@ class KnowledgeBase:
             ]
             return random.choice(general_advice)
         
-        # Try to match specific subcategories based on entities
-        subcategory = 'general'  # Default to general advice
-        
-        # Check for food items that might indicate specific nutrition needs
-        if intent_type == 'nutrition' and entities['food_items']:
-            if 'protein' in entities['food_items']:
-                subcategory = 'protein'
-            elif 'meat' in entities['food_items'] or any(item in ['beef', 'chicken', 'pork', 'fish'] for item in entities['food_items']):
-                subcategory = 'meat'
-            elif any(item in ['water', 'drink', 'hydration', 'fluid'] for item in entities['food_items']):
-                subcategory = 'hydration'
-            elif any(item in ['vitamin', 'mineral', 'nutrient'] for item in entities['food_items']):
-                subcategory = 'micronutrients'
-            elif any(item in ['carb', 'protein', 'fat', 'macros'] for item in entities['food_items']):
-                subcategory = 'macronutrients'
-            elif any(item in ['keto', 'paleo', 'mediterranean', 'vegan', 'vegetarian', 'diet'] for item in entities['food_items']):
-                subcategory = 'diets'
-            elif any(item in ['meal', 'plan', 'prep', 'schedule'] for item in entities['food_items']):
-                subcategory = 'meal_planning'
-        
-        # Check for activities that might indicate specific fitness needs
-        if intent_type == 'fitness' and entities['activities']:
-            if any(item in ['run', 'jog', 'swim', 'bike', 'cardio'] for item in entities['activities']):
-                subcategory = 'cardio'
-            elif any(item in ['lift', 'muscle', 'strength', 'weight'] for item in entities['activities']):
-                subcategory = 'strength'
-            elif any(item in ['hiit', 'interval', 'intense'] for item in entities['activities']):
-                subcategory = 'hiit'
-            elif any(item in ['functional', 'everyday', 'daily', 'movement'] for item in entities['activities']):
-                subcategory = 'functional_fitness'
-            elif any(item in ['quick', 'short', 'fast', 'busy'] for item in entities['activities']):
-                subcategory = 'quick_workouts'
-            elif any(item in ['stretch', 'flexible', 'yoga', 'mobility'] for item in entities['activities']):
-                subcategory = 'flexibility'
-            elif any(item in ['recover', 'rest', 'sore', 'massage'] for item in entities['activities']):
-                subcategory = 'recovery'
-            elif any(item in ['progress', 'improve', 'advance', 'goal'] for item in entities['activities']):
-                subcategory = 'progression'
-        
-        # Check for health conditions that might indicate specific needs
-        if intent_type == 'sleep' and entities['health_conditions']:
-            if 'insomnia' in entities['health_conditions'] or any(item in ['trouble sleeping', 'can\'t sleep', 'difficulty falling asleep'] for item in entities['health_conditions']):
-                subcategory = 'insomnia'
-            elif any(item in ['bedroom', 'mattress', 'pillow', 'noise', 'light'] for item in entities['health_conditions']):
-                subcategory = 'environment'
-        
-        # Check for specific stress management needs
-        if intent_type == 'stress' and entities['health_conditions']:
-            if any(item in ['anxiety', 'overwhelm', 'tension', 'panic', 'worry'] for item in entities['health_conditions']):
-                subcategory = 'techniques'
-            elif any(item in ['routine', 'habit', 'daily', 'lifestyle'] for item in entities['health_conditions']):
-                subcategory = 'lifestyle'
+        # Try to match specific subcategories based on entities (see chatbot/data/lexicon.json)
+        subcategory = self.lexicon.subcategory(intent_type, entities) or 'general'
         
         # Get advice from the appropriate subcategory if it exists, otherwise use general
         if subcategory in advice_category:
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lexicon Module
+
+This module loads the intent keywords, entity vocabularies and knowledge base
+subcategory terms from chatbot/data/lexicon.json and compiles them into hash
+indexes. Intent scores and entities are then extracted in a single pass over the
+tokens, and multi-word phrases are found in the raw text by an Aho-Corasick
+phrase matcher and recorded under their canonical term, so a symptom phrase such
+as "can't sleep" reaches the response templates as "insomnia". One immutable instance is shared by the NLP processor, ML enhancer
+and knowledge base of every session in the process.
+"""
+
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from chatbot.phrase_matcher import PhraseMatch, PhraseMatcher
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(__file__), 'data', 'lexicon.json')
+
+
+class Lexicon:
+    """Compiled, read-only keyword and entity vocabularies."""
+
+    def __init__(self, data: Dict):
+        """Compile a lexicon from its parsed data.
+
+        Args:
+            data (dict): Lexicon data with 'intents', 'entities' and 'subcategories' sections, and
+                an optional 'canonical' section mapping entity phrases to the term recorded for them
+        """
+        self.intent_keywords: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {intent: tuple(words) for intent, words in data['intents'].items()})
+        self.entity_terms: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {entity_type: tuple(words) for entity_type, words in data['entities'].items()})
+        self.intents = tuple(self.intent_keywords)
+        self.entity_types = tuple(self.entity_terms)
+
+        # entity type -> phrase -> term recorded in the entities instead of the phrase
+        self.canonical_terms: Mapping[str, Mapping[str, str]] = MappingProxyType(
+            {entity_type: MappingProxyType(dict(terms)) for entity_type, terms in data.get('canonical', {}).items()})
+
+        # token -> (intents it counts towards, entity types it belongs to)
+        index: Dict[str, Tuple[List[str], List[str]]] = {}
+        for intent, words in self.intent_keywords.items():
+            for word in dict.fromkeys(words):
+                index.setdefault(word, ([], []))[0].append(intent)
+        for entity_type, words in self.entity_terms.items():
+            for word in dict.fromkeys(words):
+                index.setdefault(word, ([], []))[1].append(entity_type)
+        self._index: Mapping[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = MappingProxyType(
+            {word: (tuple(intents), tuple(types)) for word, (intents, types) in index.items()})
+
+        # Every entity term, so multi-word phrases are found in a single scan of the text
+        self.phrase_matcher = PhraseMatcher()
+        for entity_type, words in self.entity_terms.items():
+            for word in words:
+                self.phrase_matcher.add(word, entity_type)
+        self.phrase_matcher.compile()
+
+        # topic -> (entity type, subcategory names in priority order, term -> best rank)
+        subcategories = {}
+        for topic, spec in data.get('subcategories', {}).items():
+            names = tuple(spec['rules'])
+            ranks: Dict[str, int] = {}
+            for rank, name in enumerate(names):
+                for term in spec['rules'][name]:
+                    ranks.setdefault(term, rank)
+            subcategories[topic] = (spec['entity_type'], names, MappingProxyType(ranks))
+        self._subcategories = MappingProxyType(subcategories)
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_LEXICON_PATH) -> 'Lexicon':
+        """Load and compile a lexicon from a JSON file.
+
+        Args:
+            path (str): Path of the lexicon file
+
+        Returns:
+            Lexicon: The compiled lexicon
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def analyze(self, tokens: List[str]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+        """Count intent keywords and collect entities in one pass over the tokens.
+
+        Args:
+            tokens (list): Preprocessed tokens from user input
+
+        Returns:
+            tuple: (keyword count per intent, entity tokens per entity type)
+        """
+        intent_scores = dict.fromkeys(self.intents, 0)
+        entities: Dict[str, List[str]] = {entity_type: [] for entity_type in self.entity_types}
+        index = self._index
+        for token in tokens:
+            match = index.get(token)
+            if match is None:
+                continue
+            for intent in match[0]:
+                intent_scores[intent] += 1
+            for entity_type in match[1]:
+                entities[entity_type].append(token)
+        return intent_scores, entities
+
+    def find_phrases(self, text: str) -> List[PhraseMatch]:
+        """Find every single- and multi-word entity term in raw text.
+
+        Args:
+            text (str): Raw user text
+
+        Returns:
+            list: PhraseMatch hits with offsets into the normalized text and entity types as labels
+        """
+        return self.phrase_matcher.find_all(text)
+
+    def add_phrase_entities(self, text: str, entities: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        """Add multi-word entity phrases found in raw text to token-level entities.
+
+        Single words are left to analyze(), which sees lemmatized tokens. Phrases with
+        a canonical term, such as "trouble sleeping" for insomnia, are recorded as that
+        term, since response templates insert entities into sentences.
+
+        Args:
+            text (str): Raw user text
+            entities (dict): Entities extracted from the tokens, updated in place
+
+        Returns:
+            dict: The updated entities
+        """
+        for match in self.find_phrases(text):
+            if ' ' not in match.phrase:
+                continue
+            for entity_type in match.labels:
+                term = self.canonical_terms.get(entity_type, {}).get(match.phrase, match.phrase)
+                if term not in entities[entity_type]:
+                    entities[entity_type].append(term)
+        return entities
+
+    def subcategory(self, topic: str, entities: Dict[str, List[str]]) -> Optional[str]:
+        """Pick the knowledge base subcategory suggested by the extracted entities.
+
+        Args:
+            topic (str): Advice topic (nutrition, fitness, sleep, stress)
+            entities (dict): Extracted entities from user input
+
+        Returns:
+            str: The highest-priority matching subcategory, or None if nothing matches
+        """
+        spec = self._subcategories.get(topic)
+        if spec is None:
+            return None
+        entity_type, names, ranks = spec
+        best = None
+        for item in entities.get(entity_type, ()):
+            rank = ranks.get(item)
+            if rank is not None and (best is None or rank < best):
+                best = rank
+        return names[best] if best is not None else None
+
+
+# Process-wide instance, loaded on first use
+_lexicon: Optional[Lexicon] = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon() -> Lexicon:
+    """Return the process-wide lexicon, loading it on first call.
+
+    The file can be overridden with the HEALTHCOACH_LEXICON_PATH environment variable.
+
+    Returns:
+        Lexicon: The shared lexicon
+    """
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                _lexicon = Lexicon.from_file(os.environ.get('HEALTHCOACH_LEXICON_PATH', DEFAULT_LEXICON_PATH))
+    return _lexicon
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Metrics Module
+
+This module provides lightweight in-process metrics for the Health Coach chatbot:
+counters, gauges and latency histograms, rendered in the Prometheus text format.
+Latency histograms report p50/p95/p99 over a sliding window of recent observations.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(labelnames: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    """Format a label set as {name="value",...}."""
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class holding the name, help text and label names of a metric."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict) -> LabelValues:
+        """Order label values by the metric's label names."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        """Render the metric as Prometheus text lines."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increase the counter.
+
+        Args:
+            amount (float): Amount to add
+            **labels: Label values of the series to increase
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Get the current value of a series."""
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge.
+
+        Args:
+            value (float): New value
+            **labels: Label values of the series to set
+        """
+        with self._lock:
+            self._values[self._label_values(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increase the gauge (use a negative amount to decrease it)."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        """Get the current value of a series."""
+        return self._values.get(self._label_values(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class _Series:
+    """Observations of one histogram label set."""
+
+    __slots__ = ('count', 'total', 'window')
+
+    def __init__(self, window_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=window_size)
+
+
+class Histogram(_Metric):
+    """Latency distribution exported with p50/p95/p99 quantiles.
+
+    Quantiles are computed over the most recent observations of each series and
+    exported in the Prometheus summary format together with _sum and _count.
+    """
+
+    metric_type = "summary"
+    quantiles = (0.5, 0.95, 0.99)
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 window_size: int = 1024):
+        super().__init__(name, documentation, labelnames)
+        self.window_size = window_size
+        self._series: Dict[LabelValues, _Series] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record one observation.
+
+        Args:
+            value (float): The observed value, in seconds for latencies
+            **labels: Label values of the series to record into
+        """
+        key = self._label_values(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self.window_size)
+            series.count += 1
+            series.total += value
+            series.window.append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Time the enclosed block and record its duration."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels) -> Callable:
+        """Decorator recording the duration of every call to a function."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def percentiles(self, **labels) -> Dict[float, float]:
+        """Get the current quantiles of a series.
+
+        Returns:
+            dict: Quantile to value, empty if nothing was observed
+        """
+        with self._lock:
+            series = self._series.get(self._label_values(labels))
+            window = sorted(series.window) if series else []
+        return self._quantiles(window)
+
+    def _quantiles(self, window: List[float]) -> Dict[float, float]:
+        """Nearest-rank quantiles of a sorted window."""
+        if not window:
+            return {}
+        return {q: window[min(len(window) - 1, int(q * len(window)))] for q in self.quantiles}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, s.count, s.total, sorted(s.window)) for key, s in self._series.items()]
+        lines = []
+        for key, count, total, window in items:
+            for q, value in self._quantiles(window).items():
+                labels = _format_labels(self.labelnames, key, f'quantile="{q}"')
+                lines.append(f"{self.name}{labels} {value}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on the /metrics endpoint."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        """Get or create a gauge."""
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  window_size: int = 1024) -> Histogram:
+        """Get or create a latency histogram."""
+        return self._get_or_create(Histogram, name, documentation, labelnames, window_size=window_size)
+
+    def register_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback run before rendering, e.g. to refresh gauges.
+
+        Args:
+            collector (callable): Function updating metrics from external state
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics text
+        """
+        for collector in self._collectors:
+            collector()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics registry
+metrics = MetricsRegistry()
+
+# Pipeline metrics shared by the chatbot modules
+STAGE_SECONDS = metrics.histogram(
+    'healthcoach_stage_seconds', 'Latency of each chatbot pipeline stage in seconds', ['stage'])
+RESPONSE_PATH_TOTAL = metrics.counter(
+    'healthcoach_responses_total', 'Responses by path: rule fast path or ML enhancement', ['path'])
+MODEL_LOAD_SECONDS = metrics.histogram(
+    'healthcoach_model_load_seconds', 'Time spent loading each model in seconds', ['model', 'task'])
@@ -12,39 +12,95 @@ Integrates with Hugging Face models for advanced NLP capabilities.
 import random
 import os
 from collections import Counter
+from contextlib import contextmanager
 from typing import Dict, Optional, List, Union
 
-# Import the HFModels class
-from chatbot.hf_models import HFModels
+from chatbot.admission import AdmissionController
+from chatbot.deadline import Deadline, StepCost, budgeted
+from chatbot.embedding_index import KnowledgeIndex
+from chatbot.intent_cascade import IntentCascade
+from chatbot.lexicon import get_lexicon
+from chatbot.metrics import STAGE_SECONDS, metrics
+from chatbot.model_backend import create_model_backend
+
+ENHANCE_STEP_SECONDS = metrics.histogram(
+    'healthcoach_enhance_step_seconds', 'Latency of each ML enhancement step in seconds', ['step'])
+ENHANCE_STEP_SKIPPED_TOTAL = metrics.counter(
+    'healthcoach_enhance_step_skipped_total', 'Enhancement steps skipped because the latency budget ran out',
+    ['step'])
+
+# Enhancement steps that use the models and are skipped for shed requests
+MODEL_STEPS = ('classify', 'answer', 'retrieve')
+
 
 class MLEnhancer:
     """Enhances chatbot responses using machine learning techniques."""
     
-    def __init__(self, user_profile=None):
+    def __init__(self, user_profile=None, hf_models=None, intent_margin=0.3,
+                 knowledge_base=None, rule_engine=None, lexicon=None, latency_budget_ms=None,
+                 admission=None, knowledge_index_backend=None):
         """Initialize the ML enhancer with necessary resources.
         
+        A single enhancer can be shared by many sessions: pass each session's
+        profile and context to enhance_response instead of binding them here.
+        
         Args:
-            user_profile (UserProfile, optional): User profile for personalization
+            user_profile (UserProfile, optional): Default user profile for personalization
+            hf_models (ModelBackend, optional): Shared model backend to use, defaults to the one
+                named by HEALTHCOACH_MODEL_BACKEND
+            intent_margin (float): Lead over the runner-up an intent tier needs to skip the zero-shot model
+            knowledge_base (KnowledgeBase, optional): Knowledge base to index for semantic retrieval
+            rule_engine (RuleEngine, optional): Rule engine whose templates wrap retrieved advice
+            lexicon (Lexicon, optional): Compiled keyword vocabularies, defaults to the shared one
+            latency_budget_ms (float, optional): Default budget for each enhancement call; 0 disables it,
+                defaults to HEALTHCOACH_LATENCY_BUDGET_MS
+            admission (AdmissionController, optional): Limit on requests using the models at once,
+                defaults to one configured by HEALTHCOACH_ML_MAX_IN_FLIGHT (0 leaves it unlimited)
+            knowledge_index_backend (str, optional): 'exact' or 'ivf' search over the knowledge base,
+                defaults to HEALTHCOACH_KNOWLEDGE_INDEX_BACKEND or 'exact'
         """
         # Store user profile if provided
         self.user_profile = user_profile
         
-        # Initialize Hugging Face models
-        self.hf_models = HFModels()
-        
-        # Health and wellness related keywords for intent recognition (copied from NLPProcessor)
-        self.intent_keywords = {
-            'nutrition': ['eat', 'food', 'diet', 'nutrition', 'meal', 'protein', 'carb', 'fat',
-                         'vitamin', 'mineral', 'calorie', 'vegetable', 'fruit', 'meat', 'meats', 'dairy'],
-            'fitness': ['exercise', 'workout', 'fitness', 'gym', 'cardio', 'strength', 'weight',
-                       'run', 'jog', 'swim', 'bike', 'yoga', 'stretch', 'muscle', 'train'],
-            'sleep': ['sleep', 'rest', 'insomnia', 'nap', 'tired', 'fatigue', 'bed', 'wake',
-                     'dream', 'snore', 'night'],
-            'stress': ['stress', 'anxiety', 'relax', 'calm', 'meditation', 'mindfulness',
-                      'worry', 'tension', 'pressure', 'overwhelm'],
-            'general': ['health', 'wellness', 'wellbeing', 'advice', 'tip', 'suggestion',
-                       'recommendation', 'improve', 'better', 'help']
-        }
+        # Initialize the model backend unless a shared instance was provided
+        self.hf_models = hf_models or create_model_backend()
+        
+        # Health and wellness keywords shared with NLPProcessor
+        self.lexicon = lexicon or get_lexicon()
+        self.intent_keywords = self.lexicon.intent_keywords
+        
+        # Precomputed embedding index over the knowledge base for semantic retrieval
+        self.rule_engine = rule_engine
+        if knowledge_index_backend is None:
+            knowledge_index_backend = os.environ.get('HEALTHCOACH_KNOWLEDGE_INDEX_BACKEND', 'exact')
+        self.knowledge_index = None
+        if knowledge_base:
+            self.knowledge_index = KnowledgeIndex(
+                self.hf_models, knowledge_base, backend=knowledge_index_backend,
+                nprobe=int(os.environ.get('HEALTHCOACH_KNOWLEDGE_INDEX_NPROBE', 8))
+            )
+        self.semantic_match_threshold = 0.5
+        
+        # Enhancement steps that would overrun this budget are skipped
+        if latency_budget_ms is None:
+            latency_budget_ms = float(os.environ.get('HEALTHCOACH_LATENCY_BUDGET_MS', 0))
+        self.latency_budget_ms = latency_budget_ms
+        self.step_costs = {name: StepCost(name) for name in MODEL_STEPS + ('personalize',)}
+        
+        # Requests beyond the in-flight limit wait briefly, then get the rule response
+        if admission is None:
+            max_in_flight = int(os.environ.get('HEALTHCOACH_ML_MAX_IN_FLIGHT', 0))
+            if max_in_flight > 0:
+                admission = AdmissionController(
+                    'ml_enhancer', max_in_flight,
+                    max_queue=int(os.environ.get('HEALTHCOACH_ML_MAX_QUEUE', max_in_flight)),
+                    queue_timeout_ms=float(os.environ.get('HEALTHCOACH_ML_QUEUE_TIMEOUT_MS', 50))
+                )
+        self.admission = admission
+        
+        # Tiered intent classifier; the zero-shot model is the last resort
+        self.intent_cascade = IntentCascade(self.hf_models, keywords=self.intent_keywords,
+                                            margin=intent_margin)
         
         # Personalization factors for different user profiles
         self.personalization_factors = {
@@ -98,73 +154,252 @@ class MLEnhancer:
         }
         
         # Simple user context memory (would be expanded in a real implementation)
-        self.user_context = {
+        self.user_context = self.new_user_context()
+    
+    @staticmethod
+    def new_user_context():
+        """Create an empty per-user conversation context.
+        
+        Returns:
+            dict: Conversation context used for personalization
+        """
+        return {
             'interaction_count': 0,
             'mentioned_topics': Counter(),
             'inferred_level': 'beginner',  # Default starting point
             'recent_concerns': []
         }
     
-    def update_user_context(self, processed_input):
+    def update_user_context(self, processed_input, user_context=None):
         """Update the user context based on the current interaction.
         
         Args:
             processed_input (dict): Processed user input with intent and entities
+            user_context (dict, optional): Context to update, defaults to this enhancer's own
         """
+        if user_context is None:
+            user_context = self.user_context
+        
         # Increment interaction count
-        self.user_context['interaction_count'] += 1
+        user_context['interaction_count'] += 1
         
         # Track mentioned topics
         intent_type = processed_input['intent']['type']
         if intent_type != 'unknown':
-            self.user_context['mentioned_topics'][intent_type] += 1
+            user_context['mentioned_topics'][intent_type] += 1
         
         # Track recent concerns from health conditions
         if processed_input['entities']['health_conditions']:
-            self.user_context['recent_concerns'] = processed_input['entities']['health_conditions']
+            user_context['recent_concerns'] = processed_input['entities']['health_conditions']
         
         # Infer user level based on interaction patterns (simplified)
-        if self.user_context['interaction_count'] > 10:
-            self.user_context['inferred_level'] = 'intermediate'
-        if self.user_context['interaction_count'] > 25:
-            self.user_context['inferred_level'] = 'advanced'
+        if user_context['interaction_count'] > 10:
+            user_context['inferred_level'] = 'intermediate'
+        if user_context['interaction_count'] > 25:
+            user_context['inferred_level'] = 'advanced'
     
-    def enhance_response(self, processed_input, rule_response):
+    @STAGE_SECONDS.timed(stage='ml_enhance')
+    def enhance_response(self, processed_input, rule_response, user_profile=None, user_context=None,
+                         deadline=None):
         """Enhance a rule-based response using ML techniques.
         
+        With a deadline, each enhancement step only runs while the remaining budget
+        covers its expected duration (see StepCost). Skipped steps are listed in
+        processed_input['skipped_steps'], and the response keeps whatever the steps
+        that did run produced, down to the plain rule response.
+        
         Args:
             processed_input (dict): Processed user input with intent and entities
             rule_response (dict): Response from the rule engine
-            
+            user_profile (UserProfile, optional): Profile of the user being answered
+            user_context (dict, optional): Conversation context of the user being answered
+            deadline (Deadline, optional): Latency budget, defaults to one of latency_budget_ms
+        
         Returns:
             str: Enhanced response text
         """
-        # Update user context with current interaction
-        self.update_user_context(processed_input)
+        return self._enhance_many([(processed_input, rule_response, user_profile, user_context)], deadline)[0]
+    
+    @STAGE_SECONDS.timed(stage='ml_enhance_many')
+    def enhance_responses(self, requests, deadline=None):
+        """Enhance several rule-based responses, batching the model calls.
+        
+        Intent classification, question answering and knowledge base retrieval each
+        run once over the whole batch; personalization still uses each request's
+        own profile and context.
+        
+        Args:
+            requests (list): (processed_input, rule_response, user_profile, user_context) tuples;
+                profile and context may be None to use this enhancer's defaults
+            deadline (Deadline, optional): Latency budget shared by the whole batch
+        
+        Returns:
+            list: Enhanced response text for each request, in order
+        """
+        return self._enhance_many(requests, deadline)
+    
+    def stream_response(self, processed_input, rule_response, user_profile=None, user_context=None,
+                        deadline=None):
+        """Enhance a rule-based response step by step, yielding each change as it is made.
+        
+        The steps are the same as enhance_response, so joining the yielded pieces
+        gives the same text. A 'replace' piece is yielded when question answering
+        or semantic retrieval replaces the rule response, and an 'append' piece for
+        each personalization sentence.
+        
+        Args:
+            processed_input (dict): Processed user input with intent and entities
+            rule_response (dict): Response from the rule engine
+            user_profile (UserProfile, optional): Profile of the user being answered
+            user_context (dict, optional): Conversation context of the user being answered
+            deadline (Deadline, optional): Latency budget, defaults to one of latency_budget_ms
+        
+        Yields:
+            tuple: (kind, text) where kind is 'replace' or 'append'
+        """
+        with STAGE_SECONDS.time(stage='ml_enhance_stream'):
+            deadline = deadline or self._default_deadline()
+            requests = self._prepare_requests([(processed_input, rule_response, user_profile, user_context)])
+            response_texts = [rule_response['response']]
+            intent_types = [rule_response['intent_type']]
+            # The model steps run eagerly and their replacements are yielded only once the
+            # admission slot is released, so a slow reader never holds a slot
+            replacements = []
+            with self._admitted(requests, deadline) as admitted:
+                if admitted:
+                    self._run_step('classify', deadline, requests, self._classify_intents,
+                                   requests, intent_types, deadline)
+                    for name, step in (('answer', self._answer_questions), ('retrieve', self._retrieve)):
+                        previous = response_texts[0]
+                        self._run_step(name, deadline, requests, step, requests, response_texts, intent_types)
+                        if response_texts[0] != previous:
+                            replacements.append(response_texts[0])
+            for replacement in replacements:
+                yield 'replace', replacement
+            
+            _, _, user_profile, user_context = requests[0]
+            segments = []
+            self._run_step('personalize', deadline, requests, lambda: segments.extend(
+                self._personalization_segments(intent_types[0], processed_input, user_profile, user_context)))
+            for segment in segments + self._disclaimer_segments(rule_response):
+                yield 'append', segment
+    
+    def _enhance_many(self, requests, deadline=None):
+        """Run the enhancement steps over a list of requests."""
+        deadline = deadline or self._default_deadline()
+        requests = self._prepare_requests(requests)
         
         # Get the base response text
-        response_text = rule_response['response']
-        intent_type = rule_response['intent_type']
+        response_texts = [rule_response['response'] for _, rule_response, _, _ in requests]
+        intent_types = [rule_response['intent_type'] for _, rule_response, _, _ in requests]
+        with self._admitted(requests, deadline) as admitted:
+            if admitted:
+                self._run_step('classify', deadline, requests, self._classify_intents,
+                               requests, intent_types, deadline)
+                self._run_step('answer', deadline, requests, self._answer_questions,
+                               requests, response_texts, intent_types)
+                self._run_step('retrieve', deadline, requests, self._retrieve,
+                               requests, response_texts, intent_types)
+        self._run_step('personalize', deadline, requests, self._personalize_all, requests, response_texts, intent_types)
+        
+        return [response_text + "".join(self._disclaimer_segments(rule_response))
+                for response_text, (_, rule_response, _, _) in zip(response_texts, requests)]
+    
+    def _prepare_requests(self, requests):
+        """Fill in the default profile and context, then record each interaction in its context."""
+        requests = [(processed_input, rule_response,
+                     self.user_profile if user_profile is None else user_profile,
+                     self.user_context if user_context is None else user_context)
+                    for processed_input, rule_response, user_profile, user_context in requests]
+        
+        # Update user context with current interaction
+        for processed_input, _, _, user_context in requests:
+            processed_input['skipped_steps'] = []
+            self.update_user_context(processed_input, user_context)
+        return requests
+    
+    @contextmanager
+    def _admitted(self, requests, deadline):
+        """Hold an admission slot for the model steps.
+        
+        Shed requests are marked with processed_input['shed'] set to the reason and
+        the model steps listed in skipped_steps; personalization still applies.
+        
+        Yields:
+            bool: True if the requests may use the models
+        """
+        if self.admission is None:
+            yield True
+            return
+        timeout = deadline.remaining() if deadline is not None else None
+        with self.admission.admit(timeout) as shed:
+            if shed is not None:
+                for processed_input, _, _, _ in requests:
+                    processed_input['shed'] = shed
+                    processed_input['skipped_steps'].extend(MODEL_STEPS)
+            yield shed is None
+    
+    def _default_deadline(self):
+        """Deadline for a call that brings none: latency_budget_ms, or none while warming up."""
+        return Deadline.from_ms(self.latency_budget_ms) if budgeted() else None
+    
+    def _run_step(self, name, deadline, requests, step, *args):
+        """Run one enhancement step if the deadline allows it, recording a skip otherwise.
+        
+        Args:
+            name (str): Step name used in metrics and skipped_steps
+            deadline (Deadline): Latency budget, or None for no limit
+            requests (list): Requests the step works on
+            step (callable): The step, called with args
         
-        # Use Hugging Face models for better intent classification
+        Returns:
+            bool: True if the step ran
+        """
+        cost = self.step_costs[name]
+        if not cost.allows(deadline):
+            for processed_input, _, _, _ in requests:
+                processed_input['skipped_steps'].append(name)
+            ENHANCE_STEP_SKIPPED_TOTAL.inc(len(requests), step=name)
+            return False
+        with ENHANCE_STEP_SECONDS.time(step=name), cost.measure():
+            step(*args)
+        return True
+    
+    def _classify_intents(self, requests, intent_types, deadline=None):
+        """Reclassify each request's intent, updating the intent type to personalize for."""
+        # Escalate to the zero-shot model only when cheaper tiers are unsure and the budget allows it
         candidate_labels = list(self.intent_keywords.keys())
-        hf_intent_result = self.hf_models.classify_intent(processed_input['original_text'], candidate_labels)
+        intent_results = self.intent_cascade.classify_batch(
+            [processed_input for processed_input, _, _, _ in requests], candidate_labels,
+            deadline=deadline)
+        for i, ((processed_input, rule_response, _, _), intent_result) in enumerate(zip(requests, intent_results)):
+            processed_input['intent_tier'] = intent_result['tier']
+            if intent_result.get('degraded'):
+                processed_input['skipped_steps'].append('zero_shot')
+                ENHANCE_STEP_SKIPPED_TOTAL.inc(step='zero_shot')
         
-        # If HF model is more confident about a different intent, use that instead
-        if hf_intent_result['scores'][0] > rule_response.get('confidence', 0):
-            intent_type = hf_intent_result['labels'][0]
-            
-        # If we have relevant context, use the QA model to enhance the response
-        if rule_response.get('context'):
-            qa_result = self.hf_models.answer_question(
-                question=processed_input['original_text'],
-                context=rule_response['context']
+            # If the classifier is more confident about a different intent, use that instead
+            if intent_result['scores'][0] > rule_response.get('confidence', 0):
+                intent_types[i] = intent_result['labels'][0]
+    
+    def _answer_questions(self, requests, response_texts, intent_types):
+        """Replace response texts with confident QA answers where the rule gave a context."""
+        qa_rows = [i for i, (_, rule_response, _, _) in enumerate(requests) if rule_response.get('context')]
+        if qa_rows:
+            qa_results = self.hf_models.answer_question_batch(
+                [requests[i][0]['original_text'] for i in qa_rows],
+                [requests[i][1]['context'] for i in qa_rows]
             )
-            if qa_result['score'] > 0.7:  # Only use if confident
-                response_text = qa_result['answer']
-        
-        # Use semantic search to find best matching responses if confidence is low
-        if rule_response.get('confidence', 0) < 0.6:
+            for i, qa_result in zip(qa_rows, qa_results):
+                if qa_result['score'] > 0.7:  # Only use if confident
+                    response_texts[i] = qa_result['answer']
+    
+    def _retrieve(self, requests, response_texts, intent_types):
+        """Replace low-confidence response texts with the best semantic match."""
+        search_rows = []
+        for i, (processed_input, rule_response, _, _) in enumerate(requests):
+            if rule_response.get('confidence', 0) >= 0.6:
+                continue
             candidates = rule_response.get('alternative_responses', [])
             if candidates:
                 best_matches = self.hf_models.find_best_matches(
@@ -172,11 +407,36 @@ class MLEnhancer:
                     candidates=candidates
                 )
                 if best_matches and best_matches[0][1] > 0.7:  # If good match found
-                    response_text = best_matches[0][0]
+                    response_texts[i] = best_matches[0][0]
+            elif self.knowledge_index is not None:
+                search_rows.append(i)
+        if search_rows:
+            # Search the precomputed knowledge base index: one encode call for the batch
+            topics = [intent_types[i] if intent_types[i] in self.knowledge_index.topics else None
+                      for i in search_rows]
+            all_matches = self.knowledge_index.search_many(
+                [requests[i][0]['original_text'] for i in search_rows], top_k=1, topics=topics)
+            for i, best_matches in zip(search_rows, all_matches):
+                if best_matches and best_matches[0][1] > self.semantic_match_threshold:
+                    advice = best_matches[0][0]
+                    if self.rule_engine is not None:
+                        response_texts[i] = self.rule_engine.format_advice(intent_types[i], advice)
+                    else:
+                        response_texts[i] = advice[0].upper() + advice[1:] + "."
+    
+    def _personalize_all(self, requests, response_texts, intent_types):
+        """Add each request's personalization sentences to its response text."""
+        for i, (processed_input, _, user_profile, user_context) in enumerate(requests):
+            response_texts[i] += "".join(self._personalization_segments(
+                intent_types[i], processed_input, user_profile, user_context))
+    
+    def _personalization_segments(self, intent_type, processed_input, user_profile, user_context):
+        """Profile and context sentences for one response, as a list of suffixes."""
+        segments = []
         
         # Get personalization context from user profile if available
-        if self.user_profile:
-            personalization_context = self.user_profile.get_personalization_context()
+        if user_profile:
+            personalization_context = user_profile.get_personalization_context()
             user_level = personalization_context['fitness_level']
             dietary_restrictions = personalization_context['dietary_restrictions']
             health_goals = personalization_context['current_goals']
@@ -184,7 +444,7 @@ class MLEnhancer:
             frequent_topics = personalization_context['frequent_topics']
         else:
             # Fall back to inferred level if no user profile
-            user_level = self.user_context['inferred_level']
+            user_level = user_context['inferred_level']
             dietary_restrictions = []
             health_goals = []
             interaction_level = 'new'
@@ -193,7 +453,7 @@ class MLEnhancer:
         # Add personalization based on user level
         if intent_type in self.personalization_factors[user_level]:
             personalization = self.personalization_factors[user_level][intent_type]
-            response_text += f" As you continue your wellness journey, {personalization}."
+            segments.append(f" As you continue your wellness journey, {personalization}.")
         
         # Add context enhancement if applicable
         entities = processed_input['entities']
@@ -203,7 +463,7 @@ class MLEnhancer:
             restriction = random.choice(dietary_restrictions)
             if restriction in self.dietary_modifiers:
                 modifier = self.dietary_modifiers[restriction]
-                response_text += f" For your {restriction} diet, consider {modifier}."
+                segments.append(f" For your {restriction} diet, consider {modifier}.")
         
         # Time-sensitive enhancement
         if entities['time_periods'] and random.random() < 0.7:  # 70% chance to apply
@@ -217,7 +477,7 @@ class MLEnhancer:
             need = needs_map.get(time_period, 'support')
             
             enhancer = random.choice(self.context_enhancers['time_sensitive'])
-            response_text += " " + enhancer.format(time_period=time_period, need=need)
+            segments.append(" " + enhancer.format(time_period=time_period, need=need))
         
         # Condition-specific enhancement
         if entities['health_conditions'] and random.random() < 0.8:  # 80% chance to apply
@@ -232,16 +492,19 @@ class MLEnhancer:
             adaptation = adaptations.get(condition, 'listen to your body')
             
             enhancer = random.choice(self.context_enhancers['condition_specific'])
-            response_text += " " + enhancer.format(condition=condition, adaptation=adaptation)
+            segments.append(" " + enhancer.format(condition=condition, adaptation=adaptation))
         
         # Goal-oriented enhancement
         if health_goals and random.random() < 0.75:  # 75% chance to apply
             goal = random.choice(health_goals)
             enhancer = random.choice(self.context_enhancers['goal_oriented'])
-            response_text += " " + enhancer.format(goal=goal)
+            segments.append(" " + enhancer.format(goal=goal))
         
-        # Add a disclaimer for low-confidence responses
+        return segments
+    
+    @staticmethod
+    def _disclaimer_segments(rule_response):
+        """Disclaimer for low-confidence responses; added even when personalization is skipped."""
         if rule_response.get('confidence', 0) < 0.4:
-            response_text += "\n\nNote: This is general advice. For personalized guidance, consider consulting with a healthcare professional."
-        
-        return response_text
\ No newline at end of file
+            return ["\n\nNote: This is general advice. For personalized guidance, consider consulting with a healthcare professional."]
+        return []
\ No newline at end of file
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Model Backend Module
+
+This module defines the interface the chatbot uses for its models and picks the
+implementation from configuration. HEALTHCOACH_MODEL_BACKEND selects one of:
+
+- torch: Hugging Face PyTorch pipelines (HFModels), the default
+- onnx: the same models quantized to int8 and served by ONNX Runtime (ONNXModels)
+- stub: deterministic hashing embeddings and keyword classification (StubModels),
+  with no model downloads and no torch, for benchmarks, load tests and CI
+
+Backends are imported only when selected, so the stub runs where torch and
+transformers are not installed. ModelBackendBase holds the intent prototype and
+semantic matching logic every backend shares on top of its own text encoder.
+
+Downloaded models, the knowledge base index and the embedding cache live under
+HEALTHCOACH_CACHE_DIR, by default the models/ directory of the checkout.
+"""
+
+import importlib
+import os
+import threading
+from typing import Dict, List, Optional, Protocol, Tuple, Union, runtime_checkable
+
+import numpy as np
+
+from chatbot.metrics import STAGE_SECONDS
+
+# Backend name -> "module:class"
+BACKENDS = {
+    'torch': 'chatbot.hf_models:HFModels',
+    'onnx': 'chatbot.onnx_models:ONNXModels',
+    'stub': 'chatbot.stub_models:StubModels'
+}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+
+def default_cache_dir() -> str:
+    """Get the model cache directory, from HEALTHCOACH_CACHE_DIR or DEFAULT_CACHE_DIR.
+
+    The directory is not created here; each cache creates it when it first writes.
+    """
+    return os.environ.get('HEALTHCOACH_CACHE_DIR') or DEFAULT_CACHE_DIR
+
+
+@runtime_checkable
+class ModelBackend(Protocol):
+    """Model operations used by the ML enhancer, intent cascade and knowledge index."""
+
+    cache_dir: str
+    embedding_model_name: str
+    prototype_centroids: Optional[np.ndarray]
+
+    @property
+    def embedding_fingerprint(self) -> str:
+        """Identifies the vectors the backend produces; caches and indexes are keyed by it."""
+
+    def preload(self) -> None:
+        """Load every model now instead of on first use."""
+
+    def answer_question(self, question: str, context: str) -> Dict:
+        """Answer a question from a context; returns answer, score, start and end."""
+
+    def answer_question_batch(self, questions: List[str], contexts: List[str]) -> List[Dict]:
+        """Answer several questions, one context each."""
+
+    def classify_intent(self, text: str, candidate_labels: List[str]) -> Dict:
+        """Rank the candidate labels; returns sequence, labels and scores, best first."""
+
+    def classify_intent_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Rank the candidate labels for several texts."""
+
+    def build_intent_prototypes(self, examples: Dict[str, List[str]]) -> None:
+        """Compute one centroid per intent from example utterances."""
+
+    def classify_intent_prototypes(self, text: str, candidate_labels: List[str]) -> Dict:
+        """Rank the candidate labels by similarity to the intent centroids."""
+
+    def classify_intent_prototypes_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Rank the candidate labels for several texts by similarity to the intent centroids."""
+
+    def get_embeddings(self, texts: Union[str, List[str]]):
+        """Embed text(s) in the backend's native array type."""
+
+    def get_normalized_embeddings(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Embed text(s) as unit-length float32 NumPy rows."""
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed texts as raw float32 NumPy rows, as the embedding model produces them."""
+
+    def find_best_matches(self, query: str, candidates: List[str], top_k: int = 3) -> List[Tuple[str, float]]:
+        """Return the candidates most similar to the query with their cosine scores."""
+
+
+def create_model_backend(name: Optional[str] = None, **kwargs) -> ModelBackend:
+    """Create the configured model backend.
+
+    Args:
+        name (str, optional): Backend name, defaults to HEALTHCOACH_MODEL_BACKEND or 'torch'
+        **kwargs: Options passed to the backend's constructor
+
+    Returns:
+        ModelBackend: The backend instance
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = name or os.environ.get('HEALTHCOACH_MODEL_BACKEND', 'torch')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown model backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    module_name, class_name = BACKENDS[name].split(':')
+    return getattr(importlib.import_module(module_name), class_name)(**kwargs)
+
+
+class ModelBackendBase:
+    """Intent prototypes and semantic matching shared by every backend.
+
+    Subclasses implement _encode, returning raw float32 embeddings for a list of texts.
+    """
+
+    def __init__(self):
+        # Cached intent prototype centroids (see build_intent_prototypes)
+        self.prototype_labels: Optional[List[str]] = None
+        self.prototype_centroids: Optional[np.ndarray] = None
+        self.prototype_temperature = 0.1
+        self._prototype_lock = threading.Lock()
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to raw float32 embeddings, one row per text."""
+        raise NotImplementedError
+
+    def preload(self) -> None:
+        """Load every model now instead of on first use; backends without models have nothing to do."""
+
+    def build_intent_prototypes(self, examples: Dict[str, List[str]]) -> None:
+        """Encode example utterances once and cache one normalized centroid per intent.
+
+        Args:
+            examples (dict): Example utterances keyed by intent label
+        """
+        labels = list(examples)
+        texts = [text for label in labels for text in examples[label]]
+        embeddings = self.get_normalized_embeddings(texts)
+
+        centroids = []
+        start = 0
+        for label in labels:
+            end = start + len(examples[label])
+            centroid = embeddings[start:end].mean(axis=0)
+            centroids.append(centroid / (np.linalg.norm(centroid) + 1e-12))
+            start = end
+
+        with self._prototype_lock:
+            self.prototype_labels = labels
+            self.prototype_centroids = np.stack(centroids).astype(np.float32)
+
+    @STAGE_SECONDS.timed(stage='hf_classify_intent_prototypes')
+    def classify_intent_prototypes(self, text: str, candidate_labels: List[str]) -> Dict:
+        """Classify the intent of the input text against cached intent centroids.
+
+        Costs one small sentence encode and a matrix-vector product, so it is much
+        cheaper than zero-shot NLI. Call build_intent_prototypes first.
+
+        Args:
+            text (str): The input text to classify
+            candidate_labels (list): List of possible intent labels
+
+        Returns:
+            dict: Classification results with labels and scores, like classify_intent
+        """
+        return self._classify_prototypes([text], candidate_labels)[0]
+
+    @STAGE_SECONDS.timed(stage='hf_classify_intent_prototypes_batch')
+    def classify_intent_prototypes_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Classify the intent of several texts against cached intent centroids.
+
+        All texts are encoded in one call and scored with one matrix product.
+
+        Args:
+            texts (list): The input texts to classify
+            candidate_labels (list): List of possible intent labels
+
+        Returns:
+            list: Classification results with labels and scores for each text
+        """
+        return self._classify_prototypes(list(texts), candidate_labels)
+
+    def _classify_prototypes(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Score texts against the intent centroids with a softmax over cosine similarities."""
+        with self._prototype_lock:
+            labels, centroids = self.prototype_labels, self.prototype_centroids
+        if centroids is None:
+            raise RuntimeError("Intent prototypes have not been built; call build_intent_prototypes first")
+
+        rows = [labels.index(label) for label in candidate_labels if label in labels]
+        known_labels = [labels[row] for row in rows]
+        if not rows or not texts:
+            return [{'sequence': text, 'labels': list(candidate_labels), 'scores': [0.0] * len(candidate_labels)}
+                    for text in texts]
+        queries = self.get_normalized_embeddings(texts)
+        similarities = queries @ centroids[rows].T
+
+        # Softmax over the similarities gives scores comparable to zero-shot output
+        logits = similarities / self.prototype_temperature
+        weights = np.exp(logits - logits.max(axis=1, keepdims=True))
+        scores = weights / weights.sum(axis=1, keepdims=True)
+
+        results = []
+        for text, text_scores in zip(texts, scores):
+            order = np.argsort(-text_scores)
+            ranked_labels = [known_labels[i] for i in order]
+            ranked_scores = [float(text_scores[i]) for i in order]
+
+            # Labels without prototypes cannot be matched
+            for label in candidate_labels:
+                if label not in ranked_labels:
+                    ranked_labels.append(label)
+                    ranked_scores.append(0.0)
+            results.append({'sequence': text, 'labels': ranked_labels, 'scores': ranked_scores})
+        return results
+
+    @STAGE_SECONDS.timed(stage='hf_get_normalized_embeddings')
+    def get_normalized_embeddings(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Generate unit-length embeddings as a NumPy array.
+
+        Args:
+            texts (str or list): Input text or list of texts
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per text (1-D for a single string)
+        """
+        embeddings = self._encode([texts] if isinstance(texts, str) else list(texts))
+        if embeddings.size:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if isinstance(texts, str) else embeddings
+
+    @STAGE_SECONDS.timed(stage='hf_encode')
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to raw float32 embeddings without normalizing them.
+
+        Args:
+            texts (list): Input texts
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per text
+        """
+        return self._encode(list(texts))
+
+    @STAGE_SECONDS.timed(stage='hf_find_best_matches')
+    def find_best_matches(self, query: str, candidates: List[str], top_k: int = 3) -> List[Tuple[str, float]]:
+        """Find the best matching candidates for a query using semantic similarity.
+
+        Args:
+            query (str): The query text
+            candidates (list): List of candidate texts to match against
+            top_k (int): Number of top matches to return
+
+        Returns:
+            list: List of (candidate, score) tuples for the top matches
+        """
+        if not candidates:
+            return []
+
+        # Generate embeddings; repeated candidates and queries come from the cache
+        embeddings = self.get_normalized_embeddings([query] + list(candidates))
+
+        # Calculate cosine similarities
+        cos_scores = embeddings[1:] @ embeddings[0]
+
+        # Get top-k matches without sorting every score
+        k = min(top_k, len(candidates))
+        top_indices = np.argpartition(-cos_scores, k - 1)[:k]
+        top_indices = top_indices[np.argsort(-cos_scores[top_indices])]
+        return [(candidates[idx], float(cos_scores[idx])) for idx in top_indices]
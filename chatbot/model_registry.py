@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Model Registry Module
+
+This module keeps one copy of every loaded model per process. Models are keyed by
+(model name, task, device, dtype), loaded lazily under a lock on first use and
+handed out through reference-counted leases so idle models can be unloaded safely.
+"""
+
+import gc
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from chatbot.deadline import cold_start
+from chatbot.metrics import MODEL_LOAD_SECONDS
+
+
+class ModelKey(NamedTuple):
+    """Identifies a loaded model in the registry."""
+    model_name: str
+    task: str
+    device: str
+    dtype: str
+
+
+class _RegistryEntry:
+    """A registry slot holding one model and its usage bookkeeping."""
+
+    def __init__(self):
+        self.model = None
+        self.ref_count = 0
+        self.last_used = time.monotonic()
+        self.load_seconds = 0.0
+        self.load_lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Process-wide registry handing out shared model instances."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._entries: Dict[ModelKey, _RegistryEntry] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._reaper_stop = threading.Event()
+
+    def _entry(self, key: ModelKey) -> _RegistryEntry:
+        """Get or create the entry for a key."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _RegistryEntry()
+                self._entries[key] = entry
+            return entry
+
+    def load(self, key: ModelKey, loader: Callable[[], Any]) -> Any:
+        """Load a model if it is not loaded yet and return it.
+
+        Concurrent callers asking for the same key wait for a single load.
+
+        Args:
+            key (ModelKey): Registry key of the model
+            loader (callable): Function building the model when it is missing
+
+        Returns:
+            object: The shared model instance
+        """
+        entry = self._entry(key)
+        if entry.model is None:
+            with entry.load_lock:
+                if entry.model is None:
+                    start = time.perf_counter()
+                    with cold_start():
+                        entry.model = loader()
+                    entry.load_seconds = time.perf_counter() - start
+                    MODEL_LOAD_SECONDS.observe(entry.load_seconds, model=key.model_name, task=key.task)
+        entry.last_used = time.monotonic()
+        return entry.model
+
+    @contextmanager
+    def lease(self, key: ModelKey, loader: Callable[[], Any]):
+        """Borrow a model for the duration of a call.
+
+        A leased model is never unloaded while the lease is held.
+
+        Args:
+            key (ModelKey): Registry key of the model
+            loader (callable): Function building the model when it is missing
+
+        Yields:
+            object: The shared model instance
+        """
+        entry = self._entry(key)
+        with self._lock:
+            entry.ref_count += 1
+        try:
+            yield self.load(key, loader)
+        finally:
+            with self._lock:
+                entry.ref_count -= 1
+                entry.last_used = time.monotonic()
+
+    def get(self, key: ModelKey) -> Optional[Any]:
+        """Return a model if it is currently loaded.
+
+        Args:
+            key (ModelKey): Registry key of the model
+
+        Returns:
+            object: The model, or None when it is not loaded
+        """
+        entry = self._entries.get(key)
+        return entry.model if entry else None
+
+    def unload(self, key: ModelKey) -> bool:
+        """Unload a model unless it is currently leased.
+
+        Args:
+            key (ModelKey): Registry key of the model
+
+        Returns:
+            bool: True if the model was unloaded
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.model is None or entry.ref_count > 0:
+                return False
+            entry.model = None
+        gc.collect()
+        return True
+
+    def unload_idle(self, max_idle_seconds: float) -> List[ModelKey]:
+        """Unload every model that has not been used for a while.
+
+        Args:
+            max_idle_seconds (float): Idle time after which a model is unloaded
+
+        Returns:
+            list: Keys of the unloaded models
+        """
+        now = time.monotonic()
+        unloaded = []
+        with self._lock:
+            for key, entry in self._entries.items():
+                if (entry.model is not None and entry.ref_count == 0
+                        and now - entry.last_used >= max_idle_seconds):
+                    entry.model = None
+                    unloaded.append(key)
+        if unloaded:
+            gc.collect()
+        return unloaded
+
+    def start_idle_reaper(self, max_idle_seconds: float, interval: float = 60.0) -> None:
+        """Periodically unload idle models in a background thread.
+
+        Args:
+            max_idle_seconds (float): Idle time after which a model is unloaded
+            interval (float): Seconds between idle checks
+        """
+        if self._reaper is not None:
+            return
+        self._reaper_stop.clear()
+
+        def reap():
+            while not self._reaper_stop.wait(interval):
+                self.unload_idle(max_idle_seconds)
+
+        self._reaper = threading.Thread(target=reap, name="model-idle-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_idle_reaper(self) -> None:
+        """Stop the background idle reaper if it is running."""
+        if self._reaper is not None:
+            self._reaper_stop.set()
+            self._reaper.join()
+            self._reaper = None
+
+    def stats(self) -> Dict[ModelKey, Dict]:
+        """Summarize the registry contents.
+
+        Returns:
+            dict: Per-key load state, reference count, idle time and load duration
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    'loaded': entry.model is not None,
+                    'ref_count': entry.ref_count,
+                    'idle_seconds': now - entry.last_used,
+                    'load_seconds': entry.load_seconds
+                }
+                for key, entry in self._entries.items()
+            }
+
+
+# Process-wide registry shared by every HFModels instance
+model_registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Return the process-wide model registry.
+
+    Returns:
+        ModelRegistry: The shared registry
+    """
+    return model_registry
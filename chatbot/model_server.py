@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Model Server Module
+
+This module runs the models in one process shared by every web worker on a host.
+A ModelServer owns a model backend and answers intent classification, question
+answering and embedding requests over a Unix domain socket; HFModels in client
+mode (HEALTHCOACH_MODEL_SERVER) sends its model calls there instead of loading the
+models itself. Memory then no longer grows with the worker count, and the server's
+micro-batcher batches concurrent calls from all workers together.
+
+Each message is a frame: a header packing a one-byte opcode (or status in replies),
+the length of a UTF-8 JSON body and the length of a binary body, followed by both
+bodies. Texts and results travel as JSON; embeddings travel as raw little-endian
+float32 rows, so the largest payloads are never text-encoded.
+
+Start the server with:
+
+    python -m chatbot.model_server --socket /run/healthcoach/models.sock
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from chatbot.metrics import metrics
+
+# Opcode or status (1 byte), JSON body length and binary body length (4 bytes each)
+HEADER = struct.Struct('>BII')
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+OP_PING = 0
+OP_CLASSIFY_INTENT = 1
+OP_ANSWER_QUESTION = 2
+OP_EMBED = 3
+OP_NAMES = {OP_PING: 'ping', OP_CLASSIFY_INTENT: 'classify_intent',
+            OP_ANSWER_QUESTION: 'answer_question', OP_EMBED: 'embed'}
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MODEL_CLIENT_REQUEST_SECONDS = metrics.histogram(
+    'healthcoach_model_client_request_seconds', 'Round-trip time of model server requests in seconds', ['op'])
+MODEL_CLIENT_ERRORS_TOTAL = metrics.counter(
+    'healthcoach_model_client_errors_total', 'Model server requests that failed', ['op'])
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server reports that a request failed."""
+
+
+def _json_default(value):
+    """Convert NumPy scalars in model outputs to plain Python numbers."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def send_frame(sock: socket.socket, code: int, body=None, blob: bytes = b'') -> None:
+    """Write one frame.
+
+    Args:
+        sock (socket.socket): Connected socket
+        code (int): Opcode of a request or status of a reply
+        body (optional): JSON-serializable body
+        blob (bytes): Binary body
+    """
+    data = json.dumps(body, default=_json_default, separators=(',', ':')).encode('utf-8') if body is not None else b''
+    sock.sendall(HEADER.pack(code, len(data), len(blob)) + data + blob)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed in the middle of a frame")
+        received += count
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket) -> Optional[Tuple[int, object, bytes]]:
+    """Read one frame.
+
+    Args:
+        sock (socket.socket): Connected socket
+
+    Returns:
+        tuple: (code, body, blob), or None if the peer closed the connection between frames
+
+    Raises:
+        ConnectionError: If the connection closes mid-frame or a body exceeds MAX_BODY_BYTES
+    """
+    first = sock.recv(1)
+    if not first:
+        return None
+    code, data_size, blob_size = HEADER.unpack(first + _recv_exact(sock, HEADER.size - 1))
+    if data_size > MAX_BODY_BYTES or blob_size > MAX_BODY_BYTES:
+        raise ConnectionError(f"Frame too large: {data_size} + {blob_size} bytes")
+    data = _recv_exact(sock, data_size) if data_size else b''
+    blob = _recv_exact(sock, blob_size) if blob_size else b''
+    return code, json.loads(data) if data else None, blob
+
+
+class ModelServer:
+    """Serves a model backend's calls to other processes over a Unix domain socket."""
+
+    def __init__(self, models, socket_path: str, mode: int = 0o600):
+        """Initialize the server; call serve_forever to start answering.
+
+        Args:
+            models (ModelBackend): Backend that runs the models; it must not itself be a client
+            socket_path (str): Path of the Unix domain socket to listen on
+            mode (int): Permissions of the socket file
+        """
+        self.models = models
+        self.socket_path = socket_path
+        self.mode = mode
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    def handle(self, op: int, body, blob: bytes) -> Tuple[object, bytes]:
+        """Run one request against the models.
+
+        Args:
+            op (int): Request opcode
+            body: Decoded JSON body
+            blob (bytes): Binary body
+
+        Returns:
+            tuple: (JSON body, binary body) of the reply
+        """
+        if op == OP_PING:
+            return {'embedding_fingerprint': self.models.embedding_fingerprint, 'pid': os.getpid()}, b''
+        if op == OP_CLASSIFY_INTENT:
+            # Group texts by label set, as the zero-shot pipeline takes one label set per call
+            groups: Dict[Tuple[str, ...], List[int]] = {}
+            for i, (_, labels) in enumerate(body['items']):
+                groups.setdefault(tuple(labels), []).append(i)
+            results: List[Optional[Dict]] = [None] * len(body['items'])
+            for labels, rows in groups.items():
+                outputs = self.models.classify_intent_batch([body['items'][i][0] for i in rows], list(labels))
+                for i, output in zip(rows, outputs):
+                    results[i] = output
+            return results, b''
+        if op == OP_ANSWER_QUESTION:
+            items = body['items']
+            return self.models.answer_question_batch([q for q, _ in items], [c for _, c in items]), b''
+        if op == OP_EMBED:
+            embeddings = np.ascontiguousarray(self.models.encode(body['texts']), dtype='<f4')
+            return {'shape': list(embeddings.shape)}, embeddings.tobytes()
+        raise ValueError(f"Unknown opcode {op}")
+
+    def serve_forever(self) -> None:
+        """Listen on the socket and answer requests until shutdown is called."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        model_server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # Clients keep a connection open and send one request at a time
+                while True:
+                    try:
+                        frame = recv_frame(self.request)
+                    except ConnectionError:
+                        return
+                    if frame is None:
+                        return
+                    op, body, blob = frame
+                    try:
+                        reply, reply_blob = model_server.handle(op, body, blob)
+                    except Exception as exc:
+                        send_frame(self.request, STATUS_ERROR, {'error': f"{type(exc).__name__}: {exc}"})
+                    else:
+                        send_frame(self.request, STATUS_OK, reply, reply_blob)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        os.chmod(self.socket_path, self.mode)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self) -> None:
+        """Stop serve_forever; call from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class ModelServerClient:
+    """Sends model calls to a ModelServer, over one connection per calling thread."""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        """Initialize the client; connections are opened on first use.
+
+        Args:
+            socket_path (str): Path of the server's Unix domain socket
+            timeout (float, optional): Seconds to wait for a reply, defaults to
+                HEALTHCOACH_MODEL_SERVER_TIMEOUT_SECONDS or 30
+        """
+        self.socket_path = socket_path
+        if timeout is None:
+            timeout = float(os.environ.get('HEALTHCOACH_MODEL_SERVER_TIMEOUT_SECONDS', 30))
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    def request(self, op: int, body=None, blob: bytes = b'') -> Tuple[object, bytes]:
+        """Send a request and wait for its reply.
+
+        A request on a connection the server has since closed is retried once on a
+        new connection; requests are read-only, so repeating them is safe.
+
+        Args:
+            op (int): Request opcode
+            body (optional): JSON-serializable body
+            blob (bytes): Binary body
+
+        Returns:
+            tuple: (JSON body, binary body) of the reply
+
+        Raises:
+            ModelServerError: If the server failed to run the request
+            OSError: If the server cannot be reached or does not reply in time
+        """
+        name = OP_NAMES.get(op, str(op))
+        with MODEL_CLIENT_REQUEST_SECONDS.time(op=name):
+            for attempt in range(2):
+                sock = getattr(self._local, 'sock', None)
+                reused = sock is not None
+                try:
+                    if sock is None:
+                        sock = self._local.sock = self._connect()
+                    send_frame(sock, op, body, blob)
+                    frame = recv_frame(sock)
+                    if frame is None:
+                        raise ConnectionResetError("Model server closed the connection")
+                    break
+                except ConnectionError:
+                    self._close()
+                    if not reused or attempt:
+                        MODEL_CLIENT_ERRORS_TOTAL.inc(op=name)
+                        raise
+                except OSError:
+                    # A timed-out reply may still arrive, so the connection cannot be reused
+                    self._close()
+                    MODEL_CLIENT_ERRORS_TOTAL.inc(op=name)
+                    raise
+
+        status, reply, reply_blob = frame
+        if status != STATUS_OK:
+            MODEL_CLIENT_ERRORS_TOTAL.inc(op=name)
+            raise ModelServerError(f"Model server failed to {name}: {reply['error']}")
+        return reply, reply_blob
+
+    def ping(self) -> Dict:
+        """Check the server is up.
+
+        Returns:
+            dict: The server's embedding fingerprint and process id
+        """
+        return self.request(OP_PING)[0]
+
+    def classify_intents(self, items: List[Tuple[str, Tuple[str, ...]]]) -> List[Dict]:
+        """Classify (text, candidate labels) pairs."""
+        return self.request(OP_CLASSIFY_INTENT, {'items': [[text, list(labels)] for text, labels in items]})[0]
+
+    def answer_questions(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """Answer (question, context) pairs."""
+        return self.request(OP_ANSWER_QUESTION, {'items': [list(item) for item in items]})[0]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts to raw float32 embeddings, one row per text."""
+        reply, blob = self.request(OP_EMBED, {'texts': list(texts)})
+        return np.frombuffer(blob, dtype='<f4').reshape(reply['shape']).astype(np.float32, copy=False)
+
+
+def main(argv: List[str]) -> int:
+    """Run a model server until SIGINT or SIGTERM."""
+    from chatbot.model_backend import create_model_backend
+
+    parser = argparse.ArgumentParser(description="Serve the Health Coach models over a Unix domain socket")
+    parser.add_argument('--socket', default=os.environ.get('HEALTHCOACH_MODEL_SERVER', 'healthcoach-models.sock'),
+                        help='socket path, defaults to HEALTHCOACH_MODEL_SERVER')
+    parser.add_argument('--backend', default=None, help='model backend, defaults to HEALTHCOACH_MODEL_BACKEND')
+    parser.add_argument('--batch-wait-ms', type=float,
+                        default=float(os.environ.get('HEALTHCOACH_MICRO_BATCH_WAIT_MS', 5)),
+                        help='longest wait to batch calls from different workers; 0 disables batching')
+    parser.add_argument('--mode', default='600', help='octal permissions of the socket file')
+    parser.add_argument('--no-preload', action='store_true', help='load models on first request')
+    args = parser.parse_args(argv)
+
+    # model_server='' keeps the backend local even when HEALTHCOACH_MODEL_SERVER is set
+    models = create_model_backend(args.backend, model_server='', micro_batch_wait_ms=args.batch_wait_ms)
+    if not args.no_preload:
+        models.preload()
+
+    server = ModelServer(models, args.socket, mode=int(args.mode, 8))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Serving {type(models).__name__} on {args.socket}")
+    server.serve_forever()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
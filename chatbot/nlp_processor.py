@@ -10,46 +10,61 @@ It processes user input to extract intents and entities.
 
 import re
 import string
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
+from functools import lru_cache
 
-# Download required NLTK resources
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
-    nltk.download('wordnet')
+from chatbot import nltk_resources
+from chatbot.lexicon import get_lexicon
+from chatbot.metrics import STAGE_SECONDS
+
+_PUNCTUATION_RE = re.compile(f'[{re.escape(string.punctuation)}]')
+
+# Text of only word characters and whitespace, which the fast tokenizer handles exactly
+_PLAIN_TEXT_RE = re.compile(r'[\w\s]*')
+
+# Words that NLTK's Treebank tokenizer splits even without punctuation
+_TREEBANK_SPLITS_RE = re.compile(
+    r'\b(can)(not)\b|\b(gim)(me)\b|\b(gon)(na)\b|\b(got)(ta)\b|\b(lem)(me)\b|\b(wan)(na)(?=\s|$)'
+)
+
+
+def fast_tokenize(text):
+    """Tokenize lowercased, punctuation-free text like word_tokenize, without Punkt.
+    
+    Args:
+        text (str): Text containing only word characters and whitespace
+        
+    Returns:
+        list: Tokens identical to word_tokenize's for such text
+    """
+    text = _TREEBANK_SPLITS_RE.sub(lambda match: ' '.join(part for part in match.groups() if part), text)
+    return text.split()
 
 class NLPProcessor:
     """Handles natural language processing for the chatbot."""
     
-    def __init__(self):
-        """Initialize the NLP processor with necessary resources."""
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = set(stopwords.words('english'))
-        
-        # Health and wellness related keywords for intent recognition
-        self.intent_keywords = {
-            'nutrition': ['eat', 'food', 'diet', 'nutrition', 'meal', 'protein', 'carb', 'fat',
-                         'vitamin', 'mineral', 'calorie', 'vegetable', 'fruit', 'meat', 'meats', 'dairy'],
-            'fitness': ['exercise', 'workout', 'fitness', 'gym', 'cardio', 'strength', 'weight',
-                       'run', 'jog', 'swim', 'bike', 'yoga', 'stretch', 'muscle', 'train'],
-            'sleep': ['sleep', 'rest', 'insomnia', 'nap', 'tired', 'fatigue', 'bed', 'wake',
-                     'dream', 'snore', 'night'],
-            'stress': ['stress', 'anxiety', 'relax', 'calm', 'meditation', 'mindfulness',
-                      'worry', 'tension', 'pressure', 'overwhelm'],
-            'general': ['health', 'wellness', 'wellbeing', 'advice', 'tip', 'suggestion',
-                       'recommendation', 'improve', 'better', 'help']
-        }
+    def __init__(self, lexicon=None, fast_tokenizer=True, lemma_cache_size=10000):
+        """Initialize the NLP processor with necessary resources.
+        
+        Args:
+            lexicon (Lexicon, optional): Compiled keyword and entity vocabularies, defaults to the shared one
+            fast_tokenizer (bool): Use the regex tokenizer for plain text instead of NLTK's word_tokenize
+            lemma_cache_size (int): Number of lemmas memoized across requests, 0 to disable
+        """
+        # NLTK data is resolved locally on first use (see chatbot/nltk_resources.py)
+        self.lemmatizer = nltk_resources.get_lemmatizer()
+        self.stop_words = nltk_resources.get_stopwords('english')
+        self.fast_tokenizer = fast_tokenizer
+        
+        # Lemmas repeat heavily across users, so memoize them in a bounded LRU
+        self._lemmatize = (lru_cache(maxsize=lemma_cache_size)(self.lemmatizer.lemmatize)
+                           if lemma_cache_size else self.lemmatizer.lemmatize)
+        
+        # Health and wellness keywords and entity vocabularies (see chatbot/data/lexicon.json)
+        self.lexicon = lexicon or get_lexicon()
+        self.intent_keywords = self.lexicon.intent_keywords
         
         # Comparative and superlative terms that indicate ranking or comparison
-        self.comparative_terms = ['best', 'better', 'worst', 'higher', 'highest', 'lower', 'lowest',
-                                 'most', 'least', 'more', 'less', 'top', 'greatest', 'optimal']
+        self.comparative_terms = self.lexicon.entity_terms['comparative_terms']
         
     def preprocess(self, text):
         """Preprocess the text by tokenizing, removing punctuation and stopwords, and lemmatizing.
@@ -64,17 +79,51 @@ class NLPProcessor:
         text = text.lower()
         
         # Remove punctuation
-        text = re.sub(f'[{re.escape(string.punctuation)}]', '', text)
+        text = _PUNCTUATION_RE.sub('', text)
         
-        # Tokenize
-        tokens = word_tokenize(text)
+        # Tokenize; word_tokenize is only needed for text with non-ASCII punctuation
+        if self.fast_tokenizer and _PLAIN_TEXT_RE.fullmatch(text):
+            tokens = fast_tokenize(text)
+        else:
+            tokens = nltk_resources.word_tokenize(text)
         
         # Remove stopwords and lemmatize
-        processed_tokens = [self.lemmatizer.lemmatize(token) for token in tokens 
+        processed_tokens = [self._lemmatize(token) for token in tokens 
                            if token not in self.stop_words]
         
         return processed_tokens
     
+    def preprocess_reference(self, text):
+        """Preprocess the text with NLTK's word_tokenize and uncached lemmatization.
+        
+        This is the slow reference path that preprocess must agree with.
+        
+        Args:
+            text (str): The input text to preprocess
+            
+        Returns:
+            list: A list of preprocessed tokens
+        """
+        text = _PUNCTUATION_RE.sub('', text.lower())
+        return [self.lemmatizer.lemmatize(token) for token in nltk_resources.word_tokenize(text)
+                if token not in self.stop_words]
+    
+    def check_preprocess_parity(self, texts):
+        """Compare preprocess against the NLTK reference path.
+        
+        Args:
+            texts (list): Sample user inputs
+            
+        Returns:
+            list: (text, fast tokens, reference tokens) for every input where they differ
+        """
+        mismatches = []
+        for text in texts:
+            fast, reference = self.preprocess(text), self.preprocess_reference(text)
+            if fast != reference:
+                mismatches.append((text, fast, reference))
+        return mismatches
+    
     def extract_intent(self, tokens):
         """Extract the primary intent from preprocessed tokens.
         
@@ -82,20 +131,17 @@ class NLPProcessor:
             tokens (list): Preprocessed tokens from user input
             
         Returns:
-            dict: Intent information with type and confidence score
+            dict: Intent information with type, confidence score and per-intent keyword counts
         """
-        intent_scores = {intent: 0 for intent in self.intent_keywords}
-        
-        # Count matches for each intent category
-        for token in tokens:
-            for intent, keywords in self.intent_keywords.items():
-                if token in keywords:
-                    intent_scores[intent] += 1
-        
+        intent_scores, _ = self.lexicon.analyze(tokens)
+        return self._intent_from_scores(intent_scores, tokens)
+    
+    def _intent_from_scores(self, intent_scores, tokens):
+        """Pick the primary intent from per-intent keyword counts."""
         # Find the intent with the highest score
         max_score = max(intent_scores.values()) if intent_scores else 0
         if max_score == 0:
-            return {'type': 'unknown', 'confidence': 0.0}
+            return {'type': 'unknown', 'confidence': 0.0, 'scores': intent_scores}
         
         # Get the intent with the highest score
         primary_intent = max(intent_scores, key=intent_scores.get)
@@ -103,7 +149,7 @@ class NLPProcessor:
         # Calculate confidence (simple ratio of matched keywords to total tokens)
         confidence = min(1.0, max_score / len(tokens)) if tokens else 0.0
         
-        return {'type': primary_intent, 'confidence': confidence}
+        return {'type': primary_intent, 'confidence': confidence, 'scores': intent_scores}
     
     def extract_entities(self, tokens):
         """Extract relevant entities from preprocessed tokens.
@@ -114,50 +160,11 @@ class NLPProcessor:
         Returns:
             dict: Extracted entities by category
         """
-        # Simple entity extraction based on keyword matching
-        # In a more advanced implementation, this could use named entity recognition
-        
-        entities = {
-            'food_items': [],
-            'activities': [],
-            'time_periods': [],
-            'health_conditions': [],
-            'comparative_terms': []
-        }
-        
-        # Common food items
-        food_items = ['protein', 'carb', 'fat', 'vegetable', 'fruit', 'meat', 'meats', 'dairy',
-                     'egg', 'nut', 'seed', 'grain', 'bread', 'pasta', 'rice', 'fish',
-                     'chicken', 'beef', 'pork', 'tofu', 'bean', 'legume', 'turkey', 'lamb',
-                     'venison', 'bison', 'duck', 'goose', 'quail', 'rabbit', 'seafood',
-                     'salmon', 'tuna', 'cod', 'halibut', 'shrimp', 'crab', 'lobster']
-        
-        # Common activities
-        activities = ['run', 'jog', 'walk', 'swim', 'bike', 'yoga', 'gym', 'exercise',
-                     'workout', 'lift', 'stretch', 'meditate', 'sleep', 'rest']
-        
-        # Time periods
-        time_periods = ['morning', 'afternoon', 'evening', 'night', 'day', 'week',
-                       'month', 'year', 'hour', 'minute', 'daily', 'weekly']
-        
-        # Common health conditions
-        health_conditions = ['stress', 'anxiety', 'depression', 'insomnia', 'fatigue',
-                           'pain', 'headache', 'migraine', 'allergy', 'diabetes',
-                           'hypertension', 'obesity', 'overweight']
-        
-        # Extract entities by category
-        for token in tokens:
-            if token in food_items:
-                entities['food_items'].append(token)
-            if token in activities:
-                entities['activities'].append(token)
-            if token in time_periods:
-                entities['time_periods'].append(token)
-            if token in health_conditions:
-                entities['health_conditions'].append(token)
-            if token in self.comparative_terms:
-                entities['comparative_terms'].append(token)
-        
+        _, entities = self.lexicon.analyze(tokens)
+        return self._complete_entities(tokens, entities)
+    
+    def _complete_entities(self, tokens, entities):
+        """Apply the protein/meat special cases to entities found by the lexicon."""
         # Special case for 'meat' and 'protein' related queries
         if ('meat' in tokens or 'meats' in tokens) and 'protein' in tokens:
             if 'meat' not in entities['food_items']:
@@ -166,7 +173,7 @@ class NLPProcessor:
                 entities['food_items'].append('protein')
         
         # Check for comparative queries about protein in meat
-        if any(term in tokens for term in self.comparative_terms) and ('protein' in tokens or 'proteins' in tokens):
+        if entities['comparative_terms'] and ('protein' in tokens or 'proteins' in tokens):
             if 'protein' not in entities['food_items']:
                 entities['food_items'].append('protein')
             
@@ -177,6 +184,7 @@ class NLPProcessor:
         
         return entities
     
+    @STAGE_SECONDS.timed(stage='nlp_process')
     def process(self, text):
         """Process the input text and extract structured information.
         
@@ -186,14 +194,34 @@ class NLPProcessor:
         Returns:
             dict: Structured information extracted from the text
         """
+        return self._process(text)
+    
+    @STAGE_SECONDS.timed(stage='nlp_process_many')
+    def process_many(self, texts):
+        """Process several input texts.
+        
+        Repeated tokens across the texts share the memoized lemmas.
+        
+        Args:
+            texts (list): The users' input texts
+            
+        Returns:
+            list: Structured information for each text, in order
+        """
+        return [self._process(text) for text in texts]
+    
+    def _process(self, text):
+        """Run preprocessing, intent and entity extraction for one text."""
         # Preprocess the text
         tokens = self.preprocess(text)
         
-        # Extract intent
-        intent = self.extract_intent(tokens)
+        # Extract intent scores and entities in a single pass over the tokens
+        intent_scores, entities = self.lexicon.analyze(tokens)
+        intent = self._intent_from_scores(intent_scores, tokens)
+        entities = self._complete_entities(tokens, entities)
         
-        # Extract entities
-        entities = self.extract_entities(tokens)
+        # Multi-word phrases such as "trouble sleeping" only exist in the raw text
+        self.lexicon.add_phrase_entities(text, entities)
         
         # Special case handling for protein/meat queries
         if 'best' in text.lower() and 'meat' in text.lower() and 'protein' in text.lower():
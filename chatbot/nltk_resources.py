@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NLTK Resources Module
+
+This module resolves the NLTK data the chatbot needs (stopwords, wordnet and the
+punkt tokenizer) from local directories only, and loads each resource on first use.
+Nothing is downloaded at import or request time: a missing resource raises
+NLTKResourceError naming the directories searched and the command that installs it.
+
+Resources are looked up in the directories listed in HEALTHCOACH_NLTK_DATA
+(separated by os.pathsep), then in the bundled data/nltk_data directory, then in
+NLTK's default locations. Populate the bundled directory at build time with:
+
+    python -m chatbot.nltk_resources
+"""
+
+import os
+import re
+import sys
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import nltk
+
+BUNDLED_NLTK_DATA = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'nltk_data')
+
+
+def _nltk_version() -> tuple:
+    """The installed NLTK version as a tuple of integers, e.g. (3, 8, 2)."""
+    return tuple(int(part) for part in re.findall(r'\d+', nltk.__version__)[:3])
+
+
+# word_tokenize loads the pickle-free punkt_tab from NLTK 3.8.2 on, and the pickled punkt before
+PUNKT_PACKAGE = 'punkt_tab' if _nltk_version() >= (3, 8, 2) else 'punkt'
+
+# Resource name -> NLTK data paths that satisfy it, most preferred first
+RESOURCES = {
+    'punkt': (f'tokenizers/{PUNKT_PACKAGE}',),
+    'stopwords': ('corpora/stopwords',),
+    'wordnet': ('corpora/wordnet',)
+}
+
+# NLTK packages to download for each resource
+PACKAGES = {
+    'punkt': (PUNKT_PACKAGE,),
+    'stopwords': ('stopwords',),
+    'wordnet': ('wordnet',)
+}
+
+
+class NLTKResourceError(LookupError):
+    """Raised when a required NLTK resource is not installed locally."""
+
+
+_resolved: Dict[str, str] = {}
+_lock = threading.Lock()
+
+
+def data_dirs() -> List[str]:
+    """Directories searched before NLTK's defaults, in order.
+
+    Returns:
+        list: Configured directories followed by the bundled one
+    """
+    configured = os.environ.get('HEALTHCOACH_NLTK_DATA', '')
+    return [path for path in configured.split(os.pathsep) if path] + [BUNDLED_NLTK_DATA]
+
+
+def _configure_paths() -> None:
+    """Put the local data directories at the front of NLTK's search path."""
+    for path in reversed(data_dirs()):
+        if path in nltk.data.path:
+            nltk.data.path.remove(path)
+        nltk.data.path.insert(0, path)
+
+
+def require(name: str) -> str:
+    """Resolve a resource locally without downloading it.
+
+    Args:
+        name (str): Resource name (punkt, stopwords, wordnet)
+
+    Returns:
+        str: Location of the resource on disk
+
+    Raises:
+        NLTKResourceError: If the resource is not installed in any searched directory
+    """
+    location = _resolved.get(name)
+    if location is not None:
+        return location
+    with _lock:
+        if name in _resolved:
+            return _resolved[name]
+        _configure_paths()
+        for resource_path in RESOURCES[name]:
+            try:
+                location = str(nltk.data.find(resource_path))
+            except LookupError:
+                continue
+            _resolved[name] = location
+            return location
+
+    searched = "\n  ".join(nltk.data.path)
+    raise NLTKResourceError(
+        f"NLTK resource '{name}' is not installed. Searched:\n  {searched}\n"
+        f"Download it at build time with: python -m chatbot.nltk_resources {name}\n"
+        f"or point HEALTHCOACH_NLTK_DATA at a directory that contains it."
+    )
+
+
+def require_all(names: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """Resolve several resources at once, e.g. to fail fast at startup.
+
+    Args:
+        names (iterable, optional): Resource names, defaults to all of them
+
+    Returns:
+        dict: Location of each resource keyed by name
+    """
+    return {name: require(name) for name in (names or RESOURCES)}
+
+
+@lru_cache(maxsize=None)
+def get_stopwords(language: str = 'english') -> frozenset:
+    """Load the stopword list on first use.
+
+    Args:
+        language (str): Stopword list to load
+
+    Returns:
+        frozenset: The stopwords
+    """
+    require('stopwords')
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words(language))
+
+
+@lru_cache(maxsize=None)
+def get_lemmatizer():
+    """Create the shared WordNet lemmatizer on first use.
+
+    Returns:
+        WordNetLemmatizer: The lemmatizer
+    """
+    require('wordnet')
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+def word_tokenize(text: str) -> List[str]:
+    """Tokenize text with NLTK's word_tokenize, resolving punkt on first use.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: Tokens
+    """
+    require('punkt')
+    return nltk.tokenize.word_tokenize(text)
+
+
+def download(names: Optional[Iterable[str]] = None, directory: str = BUNDLED_NLTK_DATA) -> None:
+    """Download resources into a local directory; meant for build time, not startup.
+
+    Args:
+        names (iterable, optional): Resource names, defaults to all of them
+        directory (str): Destination directory, defaults to the bundled data/nltk_data
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in names or RESOURCES:
+        for package in PACKAGES[name]:
+            nltk.download(package, download_dir=directory, quiet=True)
+
+
+if __name__ == '__main__':
+    download(sys.argv[1:] or None)
+    print(require_all(sys.argv[1:] or None))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ONNX Models Module
+
+This module serves the Health Coach models through ONNX Runtime on the CPU. Each
+model is exported to ONNX once, quantized to int8 with dynamic quantization and
+saved under <cache_dir>/onnx; later runs load the quantized file directly. ONNXModels
+keeps the HFModels method signatures, registry, micro-batching and embedding cache,
+so it can replace HFModels anywhere. Use check_parity to compare its answers with
+the PyTorch models before switching.
+
+The backend needs the optional optimum[onnxruntime] package.
+"""
+
+import os
+import platform
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from transformers import AutoTokenizer, pipeline
+
+from chatbot.hf_models import HFModels
+
+QUANTIZED_FILE = 'model_quantized.onnx'
+
+
+def _import_optimum():
+    """Import the optimum ONNX Runtime classes, explaining how to install them if missing."""
+    try:
+        import optimum.onnxruntime as ort
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    except ImportError as exc:
+        raise ImportError(
+            "The ONNX backend needs optimum with ONNX Runtime: pip install 'optimum[onnxruntime]'"
+        ) from exc
+    return ort, AutoQuantizationConfig
+
+
+def _quantization_config(AutoQuantizationConfig):
+    """Dynamic int8 quantization settings for this machine's CPU."""
+    if platform.machine().lower() in ('arm64', 'aarch64'):
+        return AutoQuantizationConfig.arm64(is_static=False, per_channel=False)
+    return AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+
+
+class ONNXSentenceEncoder:
+    """Sentence embeddings from an ONNX feature-extraction model.
+
+    Reproduces the all-MiniLM-L6-v2 SentenceTransformer pipeline: mean pooling
+    over the attention mask followed by L2 normalization.
+    """
+
+    def __init__(self, model, tokenizer, max_length: int = 256, batch_size: int = 32):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.batch_size = batch_size
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True) -> np.ndarray:
+        """Encode texts, matching SentenceTransformer.encode for the calls HFModels makes.
+
+        Args:
+            texts (list): Input texts
+            convert_to_numpy (bool): Accepted for compatibility; output is always NumPy
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per text
+        """
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors='np')
+            hidden = np.asarray(self.model(**inputs).last_hidden_state, dtype=np.float32)
+            mask = inputs['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+class ONNXModels(HFModels):
+    """HFModels served by int8-quantized ONNX Runtime sessions on the CPU."""
+
+    def __init__(self, cache_dir: Optional[str] = None, onnx_dir: Optional[str] = None, **kwargs):
+        """Initialize the ONNX models; they are exported and loaded on first use.
+
+        Args:
+            cache_dir (str, optional): Directory to cache downloaded models
+            onnx_dir (str, optional): Directory of the quantized exports, defaults to <cache_dir>/onnx
+            **kwargs: Other HFModels options (registry, embedding cache, micro-batching)
+        """
+        super().__init__(cache_dir=cache_dir, **kwargs)
+        # ONNX Runtime serves the quantized models on the CPU
+        self.device = "cpu"
+        self.dtype = "onnx-int8"
+        self.onnx_dir = onnx_dir or os.path.join(self.cache_dir, 'onnx')
+
+    @property
+    def embedding_fingerprint(self) -> str:
+        """Quantized vectors differ slightly from the PyTorch ones, so they are cached separately."""
+        return f"{self.embedding_model_name}+onnx-int8"
+
+    def quantized_model_dir(self, model_name: str) -> str:
+        """Directory holding the quantized export of a model."""
+        return os.path.join(self.onnx_dir, model_name.replace('/', '--') + '-int8')
+
+    def _load_quantized(self, model_class_name: str, model_name: str):
+        """Load a quantized model and its tokenizer, exporting them first if needed.
+
+        Args:
+            model_class_name (str): optimum.onnxruntime model class for the task
+            model_name (str): Hugging Face model to export
+
+        Returns:
+            tuple: (ORTModel, tokenizer)
+        """
+        ort, AutoQuantizationConfig = _import_optimum()
+        model_class = getattr(ort, model_class_name)
+        target = self.quantized_model_dir(model_name)
+        target_file = os.path.join(target, QUANTIZED_FILE)
+        if not os.path.exists(target_file):
+            # Exports are moved into place whole, so a directory without the model is left
+            # over from an interrupted or older export and would block the move below
+            if os.path.isdir(target):
+                print(f"Removing incomplete ONNX export in {target}")
+                shutil.rmtree(target, ignore_errors=True)
+            print(f"Exporting {model_name} to quantized ONNX in {target}")
+            # Export into a scratch directory and move it into place, so concurrent
+            # workers never load a partial export
+            os.makedirs(self.onnx_dir, exist_ok=True)
+            scratch = tempfile.mkdtemp(dir=self.onnx_dir)
+            try:
+                model = model_class.from_pretrained(model_name, export=True, cache_dir=self.cache_dir)
+                model.save_pretrained(scratch)
+                AutoTokenizer.from_pretrained(model_name, cache_dir=self.cache_dir).save_pretrained(scratch)
+                quantizer = ort.ORTQuantizer.from_pretrained(scratch)
+                quantizer.quantize(save_dir=scratch, quantization_config=_quantization_config(AutoQuantizationConfig))
+                try:
+                    os.replace(scratch, target)
+                except OSError:
+                    # Another worker finished its export first; anything else is a real failure
+                    if not os.path.exists(target_file):
+                        raise
+            finally:
+                shutil.rmtree(scratch, ignore_errors=True)
+
+        model = model_class.from_pretrained(target, file_name=QUANTIZED_FILE)
+        return model, AutoTokenizer.from_pretrained(target)
+
+    def _build_ort_pipeline(self, task: str, model_class_name: str, model_name: str):
+        """Build a transformers pipeline around a quantized ONNX model."""
+        model, tokenizer = self._load_quantized(model_class_name, model_name)
+        return pipeline(task, model=model, tokenizer=tokenizer)
+
+    def _build_qa_model(self):
+        """Build the quantized question-answering pipeline."""
+        print(f"Loading quantized ONNX QA model: {self.qa_model_name}")
+        return self._build_ort_pipeline("question-answering", "ORTModelForQuestionAnswering", self.qa_model_name)
+
+    def _build_intent_model(self):
+        """Build the quantized zero-shot intent classification pipeline."""
+        print(f"Loading quantized ONNX intent classification model: {self.intent_model_name}")
+        return self._build_ort_pipeline("zero-shot-classification", "ORTModelForSequenceClassification",
+                                        self.intent_model_name)
+
+    def _build_embedding_model(self):
+        """Build the quantized sentence embedding encoder."""
+        print(f"Loading quantized ONNX sentence embedding model: {self.embedding_model_name}")
+        model, tokenizer = self._load_quantized("ORTModelForFeatureExtraction", self.embedding_model_name)
+        return ONNXSentenceEncoder(model, tokenizer)
+
+
+def check_parity(reference: HFModels, candidate: HFModels, texts: Sequence[str],
+                 candidate_labels: List[str], qa_pairs: Sequence[Tuple[str, str]]) -> Dict:
+    """Compare two model managers on the same inputs.
+
+    Models are loaded before timing starts. Build both sides with
+    use_embedding_cache=False so their embedding models run on every text.
+
+    Args:
+        reference (HFModels): Models to compare against, normally the PyTorch ones
+        candidate (HFModels): Models under test, normally ONNXModels
+        texts (list): Texts to classify and embed
+        candidate_labels (list): Intent labels for classification
+        qa_pairs (list): (question, context) pairs to answer
+
+    Returns:
+        dict: Intent and QA agreement rates, embedding cosine similarities, per-text
+            disagreements and each side's total seconds per model
+    """
+    texts = list(texts)
+    questions = [question for question, _ in qa_pairs]
+    contexts = [context for _, context in qa_pairs]
+    outputs = {}
+    seconds = {}
+    for side, models in (('reference', reference), ('candidate', candidate)):
+        models.preload()
+        timings = {}
+        start = time.perf_counter()
+        intents = models.classify_intent_batch(texts, candidate_labels)
+        timings['intent'] = time.perf_counter() - start
+        start = time.perf_counter()
+        answers = models.answer_question_batch(questions, contexts) if qa_pairs else []
+        timings['qa'] = time.perf_counter() - start
+        start = time.perf_counter()
+        embeddings = models.get_normalized_embeddings(texts) if texts else np.empty((0, 0))
+        timings['embedding'] = time.perf_counter() - start
+        outputs[side] = (intents, answers, embeddings)
+        seconds[side] = timings
+
+    ref_intents, ref_answers, ref_embeddings = outputs['reference']
+    cand_intents, cand_answers, cand_embeddings = outputs['candidate']
+    intent_mismatches = [(text, ref['labels'][0], cand['labels'][0])
+                         for text, ref, cand in zip(texts, ref_intents, cand_intents)
+                         if ref['labels'][0] != cand['labels'][0]]
+    qa_mismatches = [(question, ref['answer'], cand['answer'])
+                     for question, ref, cand in zip(questions, ref_answers, cand_answers)
+                     if ref['answer'].strip() != cand['answer'].strip()]
+    # Both sides are unit length, so the row-wise dot product is the cosine similarity
+    cosines = np.sum(ref_embeddings * cand_embeddings, axis=1) if texts else np.ones(1)
+
+    return {
+        'intent_agreement': 1.0 - len(intent_mismatches) / max(1, len(texts)),
+        'qa_agreement': 1.0 - len(qa_mismatches) / max(1, len(qa_pairs)),
+        'embedding_cosine_min': float(cosines.min()),
+        'embedding_cosine_mean': float(cosines.mean()),
+        'intent_mismatches': intent_mismatches,
+        'qa_mismatches': qa_mismatches,
+        'seconds': seconds
+    }
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Phrase Matcher Module
+
+This module finds single- and multi-word vocabulary phrases in user text with an
+Aho-Corasick automaton. The text is scanned once, character by character, so the
+cost grows with the length of the text and the number of hits but not with the
+size of the vocabulary. Only matches that start and end on word boundaries count.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+_WHITESPACE = re.compile(r'\s+')
+_APOSTROPHES = str.maketrans({'‘': "'", '’': "'", 'ʼ': "'"})
+
+
+class PhraseMatch(NamedTuple):
+    """A vocabulary hit; offsets index into the normalized text."""
+    start: int
+    end: int
+    phrase: str
+    labels: Tuple[Hashable, ...]
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over a phrase vocabulary."""
+
+    def __init__(self, phrases: Optional[Dict[str, Iterable[Hashable]]] = None):
+        """Initialize the matcher.
+
+        Args:
+            phrases (dict, optional): Labels to attach to each phrase, keyed by phrase
+        """
+        self._labels: Dict[str, List[Hashable]] = {}
+        self._goto: List[Dict[str, int]] = []
+        self._fail: List[int] = []
+        self._output: List[Tuple[int, ...]] = []
+        self._phrases: List[str] = []
+        self._compiled = False
+        for phrase, labels in (phrases or {}).items():
+            for label in labels:
+                self.add(phrase, label)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase text, unify apostrophes and collapse runs of whitespace."""
+        return _WHITESPACE.sub(' ', text.lower().translate(_APOSTROPHES)).strip()
+
+    def add(self, phrase: str, label: Hashable) -> None:
+        """Add a phrase with a label; the automaton is rebuilt on the next search.
+
+        Args:
+            phrase (str): Word or multi-word phrase
+            label: Value reported with every hit of the phrase
+        """
+        phrase = self.normalize(phrase)
+        if not phrase:
+            return
+        labels = self._labels.setdefault(phrase, [])
+        if label not in labels:
+            labels.append(label)
+        self._compiled = False
+
+    def compile(self) -> None:
+        """Build the trie, failure links and merged outputs."""
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[int]] = [[]]
+        self._phrases = list(self._labels)
+        for phrase_id, phrase in enumerate(self._phrases):
+            state = 0
+            for char in phrase:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(phrase_id)
+
+        # Breadth-first pass: each state's failure link is the longest proper suffix in the trie
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                output[next_state].extend(output[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(ids) for ids in output]
+        self._compiled = True
+
+    def find_all(self, text: str, normalized: bool = False) -> List[PhraseMatch]:
+        """Find every vocabulary phrase in a text in a single pass.
+
+        Args:
+            text (str): The text to scan
+            normalized (bool): Whether the text was already passed through normalize()
+
+        Returns:
+            list: PhraseMatch hits ordered by end offset, overlapping hits included
+        """
+        if not self._compiled:
+            self.compile()
+        if not normalized:
+            text = self.normalize(text)
+
+        goto, fail, output, phrases = self._goto, self._fail, self._output, self._phrases
+        matches = []
+        state = 0
+        length = len(text)
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            if i + 1 < length and text[i + 1].isalnum():
+                continue
+            for phrase_id in output[state]:
+                phrase = phrases[phrase_id]
+                start = i + 1 - len(phrase)
+                if start == 0 or not text[start - 1].isalnum():
+                    matches.append(PhraseMatch(start, i + 1, phrase, tuple(self._labels[phrase])))
+        return matches
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profile Store Module
+
+This module persists user profiles to local storage so that sessions evicted
+from memory can be rehydrated when the user returns, and so that several worker
+processes can share the same profiles.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from chatbot.user_profile import UserProfile
+
+
+class JSONProfileStore:
+    """Stores each user profile as a JSON file in a local directory."""
+
+    def __init__(self, directory: str):
+        """Initialize the store.
+
+        Args:
+            directory (str): Directory holding the profile files
+        """
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, user_id: str) -> str:
+        """Get the file path for a user, safe for any user ID."""
+        digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def save(self, profile: UserProfile) -> None:
+        """Write a profile to disk, replacing any previous copy.
+
+        Args:
+            profile (UserProfile): The profile to save
+        """
+        path = self._path(profile.user_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(profile.to_json())
+        os.replace(tmp_path, path)
+
+    def load(self, user_id: str) -> Optional[UserProfile]:
+        """Read a profile from disk.
+
+        Args:
+            user_id (str): Unique identifier for the user
+
+        Returns:
+            UserProfile: The stored profile, or None if the user is unknown
+        """
+        try:
+            with open(self._path(user_id), encoding='utf-8') as f:
+                return UserProfile.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+
+class SQLiteProfileStore:
+    """Stores user profiles in a local SQLite database with write-behind batching.
+
+    save() only records a snapshot of the profile as dirty. A background thread
+    writes all dirty profiles in a single transaction every flush interval, so
+    repeated updates to the same profile are coalesced and requests never wait on
+    disk writes. The database runs in WAL mode so several worker processes can
+    share it.
+
+    Rows are versioned. A write only succeeds if the row still holds the version the
+    profile was loaded from, so a worker with a stale copy cannot overwrite another
+    worker's newer profile. Instead the newer row is merged into the profile (see
+    UserProfile.rebase) and the result is written, so updates made on two workers
+    within one flush interval are both kept. refresh() merges newer rows into cached
+    profiles the same way.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 2.0):
+        """Initialize the store and start the background writer.
+
+        Args:
+            path (str): Path of the SQLite database file
+            flush_interval (float): Seconds between batched writes
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._local = threading.local()
+        # User ID -> (JSON snapshot, version it was taken at, profile) waiting to be written
+        self._pending: Dict[str, Tuple[str, int, UserProfile]] = {}
+        self._flushing: Dict[str, Tuple[str, int, UserProfile]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        # Write statistics
+        self.flushes = 0
+        self.rows_written = 0
+        self.merged_writes = 0
+        self.stale_writes = 0
+
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS profiles ("
+                "user_id TEXT PRIMARY KEY, "
+                "data TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS profiles_updated_at ON profiles (updated_at)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(profiles)")}
+            if 'version' not in columns:
+                conn.execute("ALTER TABLE profiles ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+        self._stop = threading.Event()
+        self._writer = threading.Thread(target=self._run_writer, name="profile-writer", daemon=True)
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def save(self, profile: UserProfile) -> None:
+        """Mark a profile as dirty; a snapshot taken now is written by the next batched flush.
+
+        Args:
+            profile (UserProfile): The profile to save
+        """
+        # Serialized here, under the profile's lock, so the writer never reads a profile mid-update
+        with profile.lock:
+            snapshot, version = profile.to_json(), profile.version
+        with self._pending_lock:
+            self._pending[profile.user_id] = (snapshot, version, profile)
+
+    def load(self, user_id: str) -> Optional[UserProfile]:
+        """Load a profile, preferring a pending unwritten copy.
+
+        Args:
+            user_id (str): Unique identifier for the user
+
+        Returns:
+            UserProfile: The stored profile, or None if the user is unknown
+        """
+        with self._pending_lock:
+            pending = self._pending.get(user_id) or self._flushing.get(user_id)
+        if pending is not None:
+            return pending[2]
+
+        row = self._connection().execute(
+            "SELECT data, version FROM profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return self._from_row(*row) if row else None
+
+    def refresh(self, profile: UserProfile) -> Optional[UserProfile]:
+        """Merge the stored copy of a profile into it if another worker has written a newer one.
+
+        Unwritten changes to the given profile are kept and written by the next flush.
+
+        Args:
+            profile (UserProfile): A cached profile
+
+        Returns:
+            UserProfile: The given profile, now merged, or None if it was current
+        """
+        query = "SELECT data, version FROM profiles WHERE user_id = ?"
+        row = self._connection().execute(query, (profile.user_id,)).fetchone()
+        if row is None or row[1] <= profile.version:
+            return None
+
+        # Merging changes the version a pending snapshot would be written as, so no flush may run meanwhile
+        with self._flush_lock:
+            row = self._connection().execute(query, (profile.user_id,)).fetchone()
+            if row[1] <= profile.version:
+                return None
+            profile.rebase(*row)
+            snapshot = profile.to_json()
+            with self._pending_lock:
+                pending = self._pending.get(profile.user_id)
+                if pending is not None and pending[2] is profile:
+                    self._pending[profile.user_id] = (snapshot, profile.version, profile)
+        return profile
+
+    @staticmethod
+    def _from_row(data: str, version: int) -> UserProfile:
+        profile = UserProfile.from_dict(json.loads(data))
+        profile.version = version
+        profile.stored_snapshot = data
+        return profile
+
+    def load_many(self, user_ids: Optional[Iterable[str]] = None,
+                  limit: Optional[int] = None) -> Dict[str, UserProfile]:
+        """Bulk-load profiles, e.g. to warm a worker's session cache at startup.
+
+        Args:
+            user_ids (iterable, optional): Users to load; defaults to the most recently updated
+            limit (int, optional): Maximum number of profiles to load when user_ids is omitted
+
+        Returns:
+            dict: Profiles keyed by user ID
+        """
+        conn = self._connection()
+        wanted = None
+        if user_ids is None:
+            query = "SELECT user_id, data, version FROM profiles ORDER BY updated_at DESC"
+            rows = conn.execute(query + " LIMIT ?", (limit,)) if limit else conn.execute(query)
+            rows = rows.fetchall()
+        else:
+            user_ids = list(user_ids)
+            wanted = set(user_ids)
+            rows = []
+            # Stay below SQLite's bound parameter limit
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(conn.execute(
+                    f"SELECT user_id, data, version FROM profiles WHERE user_id IN ({placeholders})", chunk
+                ).fetchall())
+
+        profiles = {user_id: self._from_row(data, version) for user_id, data, version in rows}
+        # Unwritten copies are newer than what is in the database
+        with self._pending_lock:
+            unwritten = {**self._flushing, **self._pending}
+        for user_id, (_, _, profile) in unwritten.items():
+            if user_id in (profiles if wanted is None else wanted):
+                profiles[user_id] = profile
+        return profiles
+
+    def flush(self) -> int:
+        """Write every dirty profile in one transaction.
+
+        Profiles whose row was updated by another worker since they were loaded have
+        that row merged in first; they are counted in merged_writes. A write that still
+        conflicts is dropped, counted in stale_writes and logged.
+
+        Returns:
+            int: Number of profiles written
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            if not batch:
+                return 0
+
+            now = time.time()
+            conn = self._connection()
+            written = []
+            merged = []
+            stale = 0
+            try:
+                with conn:
+                    for user_id, (snapshot, version, profile) in batch.items():
+                        # Only written if the row still holds the version the snapshot was taken at
+                        version += 1
+                        cursor = conn.execute(
+                            "INSERT INTO profiles (user_id, data, updated_at, version) VALUES (?, ?, ?, ?) "
+                            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, "
+                            "updated_at = excluded.updated_at, version = excluded.version "
+                            "WHERE profiles.version = excluded.version - 1",
+                            (user_id, snapshot, now, version)
+                        )
+                        if not cursor.rowcount:
+                            row = conn.execute(
+                                "SELECT data, version FROM profiles WHERE user_id = ?", (user_id,)
+                            ).fetchone()
+                            with profile.lock:
+                                if row[0] != profile.stored_snapshot:
+                                    # Another worker wrote this profile since it was loaded; merge its copy in
+                                    profile.rebase(*row)
+                                    merged.append(profile)
+                                # Either way the snapshot is outdated, so write the profile as it is now
+                                snapshot, version = profile.to_json(), row[1] + 1
+                            cursor = conn.execute(
+                                "UPDATE profiles SET data = ?, updated_at = ?, version = ? "
+                                "WHERE user_id = ? AND version = ?",
+                                (snapshot, now, version, user_id, row[1])
+                            )
+                        if cursor.rowcount:
+                            written.append((profile, snapshot, version))
+                        else:
+                            stale += 1
+                            print(f"Dropped conflicting update to the profile of user {user_id}")
+            except Exception:
+                # Put the batch back so the next flush retries it, keeping newer updates. Merged
+                # profiles now hold the other worker's version, so their old snapshots are retaken.
+                retaken = {}
+                for profile in merged:
+                    with profile.lock:
+                        retaken[profile.user_id] = (profile.to_json(), profile.version, profile)
+                with self._pending_lock:
+                    for user_id, entry in batch.items():
+                        self._pending.setdefault(user_id, retaken.get(user_id, entry))
+                raise
+            finally:
+                with self._pending_lock:
+                    self._flushing = {}
+
+            # Only bump versions once the transaction has committed
+            for profile, snapshot, version in written:
+                with profile.lock:
+                    profile.version = version
+                    profile.stored_snapshot = snapshot
+            self.flushes += 1
+            self.rows_written += len(written)
+            self.merged_writes += len(merged)
+            self.stale_writes += stale
+            return len(written)
+
+    def close(self) -> None:
+        """Stop the background writer and write any remaining dirty profiles."""
+        self._stop.set()
+        self._writer.join()
+        self.flush()
+
+    def stats(self) -> Dict:
+        """Get write-behind statistics.
+
+        Returns:
+            dict: Pending profile count, number of flushes, rows written, writes merged with
+                another worker's update and conflicting writes dropped
+        """
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'flushes': self.flushes, 'rows_written': self.rows_written,
+                'merged_writes': self.merged_writes, 'stale_writes': self.stale_writes}
+
+    def _run_writer(self) -> None:
+        """Flush dirty profiles periodically until the store is closed."""
+        while not self._stop.wait(self.flush_interval):
+            # Any failure is retried on the next flush; the writer must keep running
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing user profiles: {type(e).__name__}: {e}")
@@ -10,6 +10,8 @@ It matches user intents and entities to predefined rules to generate appropriate
 
 import random
 
+from chatbot.metrics import STAGE_SECONDS
+
 class RuleEngine:
     """Handles rule-based response generation for the chatbot."""
     
@@ -105,6 +107,22 @@ class RuleEngine:
             'confidence': 0.0
         }
     
+    def format_advice(self, intent_type, advice):
+        """Wrap a piece of advice in a response template for the intent.
+        
+        Args:
+            intent_type (str): The type of intent (nutrition, fitness, etc.)
+            advice (str): Advice text from the knowledge base
+            
+        Returns:
+            str: Response text
+        """
+        # The 'unknown' templates have no advice slot
+        if intent_type not in self.response_templates or intent_type == 'unknown':
+            intent_type = 'general'
+        return random.choice(self.response_templates[intent_type]).format(advice=advice)
+    
+    @STAGE_SECONDS.timed(stage='rule_get_response')
     def get_response(self, processed_input):
         """Generate a response based on processed input.
         
@@ -114,6 +132,10 @@ class RuleEngine:
         Returns:
             dict: Response information with text and confidence
         """
+        return self._respond(processed_input)
+    
+    def _respond(self, processed_input):
+        """Match a rule for one processed input and fill in its template."""
         # Match to a rule
         rule_match = self.match_rule(processed_input)
         
@@ -127,4 +149,16 @@ class RuleEngine:
             'response': response_text,
             'intent_type': rule_match['intent_type'],
             'confidence': rule_match['confidence']
-        }
\ No newline at end of file
+        }
+    
+    @STAGE_SECONDS.timed(stage='rule_get_responses')
+    def get_responses(self, processed_inputs):
+        """Generate responses for several processed inputs.
+        
+        Args:
+            processed_inputs (list): Processed user inputs with intent and entities
+            
+        Returns:
+            list: Response information with text and confidence for each input
+        """
+        return [self._respond(processed_input) for processed_input in processed_inputs]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Services Module
+
+This module builds the read-only components of the Health Coach chatbot once per
+process. Individual user sessions only carry their own profile and conversation
+context and reuse the knowledge base, NLP processor, rule engine and models from here.
+"""
+
+import threading
+from typing import Optional
+
+from chatbot.knowledge_base import KnowledgeBase
+from chatbot.lexicon import get_lexicon
+from chatbot.nlp_processor import NLPProcessor
+from chatbot.rule_engine import RuleEngine
+from chatbot.ml_enhancer import MLEnhancer
+
+
+class SharedServices:
+    """Read-only chatbot components shared by every user session in a process."""
+
+    def __init__(self, hf_models=None):
+        """Build the shared components.
+
+        Args:
+            hf_models (HFModels, optional): Model manager to use for ML enhancements, defaults to
+                the backend named by HEALTHCOACH_MODEL_BACKEND ('torch', 'onnx' or 'stub')
+        """
+        self.lexicon = get_lexicon()
+        self.knowledge_base = KnowledgeBase(lexicon=self.lexicon)
+        self.nlp_processor = NLPProcessor(lexicon=self.lexicon)
+        self.rule_engine = RuleEngine(self.knowledge_base)
+        self.ml_enhancer = MLEnhancer(hf_models=hf_models, knowledge_base=self.knowledge_base,
+                                      rule_engine=self.rule_engine, lexicon=self.lexicon)
+
+
+# Process-wide instance, created on first use
+_shared_services: Optional[SharedServices] = None
+_shared_services_lock = threading.Lock()
+
+
+def get_shared_services() -> SharedServices:
+    """Return the process-wide shared services, building them on first call.
+
+    Returns:
+        SharedServices: The shared chatbot components
+    """
+    global _shared_services
+    if _shared_services is None:
+        with _shared_services_lock:
+            if _shared_services is None:
+                _shared_services = SharedServices()
+    return _shared_services
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Session Cache Module
+
+This module keeps per-user chatbot sessions in a bounded LRU cache with an idle
+timeout. Evicted sessions have their user profile written to a profile store so
+a returning user can be rehydrated instead of starting from scratch. With a store
+that supports refresh(), a cached profile is checked against the store at most once
+per refresh interval and updated with any newer copy another worker process has
+written, so workers do not need sticky sessions to see each other's changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+
+class _CacheEntry:
+    """A cached session, the time it was last accessed and the time it was last refreshed."""
+
+    __slots__ = ('session', 'last_access', 'last_refresh')
+
+    def __init__(self, session, last_access: float):
+        self.session = session
+        self.last_access = last_access
+        self.last_refresh = last_access
+
+
+class SessionCache:
+    """Bounded LRU/TTL cache of user sessions with spill-to-disk on eviction.
+
+    Sessions are any objects exposing a ``user_profile`` attribute, such as
+    HealthCoachChatbot instances.
+    """
+
+    def __init__(self, factory: Callable[[str], object], max_entries: int = 1000,
+                 ttl_seconds: float = 1800.0, store=None, refresh_seconds: float = 5.0):
+        """Initialize the session cache.
+
+        Args:
+            factory (callable): Creates a new session for a user ID
+            max_entries (int): Maximum number of sessions kept in memory
+            ttl_seconds (float): Idle time after which a session is evicted
+            store (optional): Profile store with save(profile) and load(user_id), and
+                optionally refresh(profile) returning a newer stored copy
+            refresh_seconds (float): Minimum time between refresh checks of a cached session
+        """
+        self.factory = factory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.refresh_seconds = refresh_seconds
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Cache statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rehydrations = 0
+        self.refreshes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._entries
+
+    def get(self, user_id: str):
+        """Get the session for a user, creating or rehydrating it if needed.
+
+        Args:
+            user_id (str): Unique identifier for the user
+
+        Returns:
+            object: The user's session
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry.last_access <= self.ttl_seconds:
+                entry.last_access = now
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                session = entry.session
+                # Only one request per interval checks the store for a newer profile
+                refresh_due = now - entry.last_refresh >= self.refresh_seconds
+                if refresh_due:
+                    entry.last_refresh = now
+            else:
+                session = None
+                self.misses += 1
+                expired = self._pop_expired(now)
+
+        # Disk I/O happens outside the lock
+        if session is not None:
+            if refresh_due:
+                self._refresh(session)
+            return session
+        self._spill(expired)
+        session = self._create(user_id)
+
+        with self._lock:
+            existing = self._entries.get(user_id)
+            if existing is not None:
+                # Another request created this session while we were loading
+                existing.last_access = now
+                return existing.session
+            self._entries[user_id] = _CacheEntry(session, now)
+            overflow = []
+            while len(self._entries) > self.max_entries:
+                overflow.append(self._entries.popitem(last=False))
+            self.evictions += len(overflow)
+
+        self._spill(overflow)
+        return session
+
+    def warm(self, profiles: Dict) -> int:
+        """Create sessions for already-loaded profiles, e.g. at worker startup.
+
+        Args:
+            profiles (dict): User profiles keyed by user ID
+
+        Returns:
+            int: Number of sessions added
+        """
+        now = time.monotonic()
+        added = 0
+        for user_id, profile in list(profiles.items())[:self.max_entries]:
+            session = self.factory(user_id)
+            session.user_profile = profile
+            with self._lock:
+                if user_id not in self._entries and len(self._entries) < self.max_entries:
+                    self._entries[user_id] = _CacheEntry(session, now)
+                    added += 1
+        return added
+
+    def evict_expired(self) -> int:
+        """Evict every session that has been idle longer than the TTL.
+
+        Returns:
+            int: Number of evicted sessions
+        """
+        with self._lock:
+            expired = self._pop_expired(time.monotonic())
+        self._spill(expired)
+        return len(expired)
+
+    def spill_all(self) -> None:
+        """Write every cached profile to the store, e.g. before shutdown."""
+        with self._lock:
+            entries = list(self._entries.items())
+        self._spill(entries)
+
+    def stats(self) -> Dict:
+        """Get cache statistics.
+
+        Returns:
+            dict: Size, capacity, hit/miss counts and eviction counts
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'rehydrations': self.rehydrations,
+            'refreshes': self.refreshes
+        }
+
+    def _pop_expired(self, now: float) -> List[Tuple[str, _CacheEntry]]:
+        """Remove idle entries; must be called with the lock held."""
+        expired = []
+        # Entries are kept in access order, so the idle ones are at the front
+        while self._entries:
+            user_id, entry = next(iter(self._entries.items()))
+            if now - entry.last_access <= self.ttl_seconds:
+                break
+            expired.append(self._entries.popitem(last=False))
+        self.expirations += len(expired)
+        self.evictions += len(expired)
+        return expired
+
+    def _create(self, user_id: str):
+        """Create a session, restoring the user's profile from the store if present."""
+        session = self.factory(user_id)
+        if self.store is not None:
+            profile = self.store.load(user_id)
+            if profile is not None:
+                session.user_profile = profile
+                with self._lock:
+                    self.rehydrations += 1
+        return session
+
+    def _refresh(self, session) -> None:
+        """Update the session's profile if another worker has stored a newer one."""
+        refresh = getattr(self.store, 'refresh', None)
+        if refresh is None:
+            return
+        profile = refresh(session.user_profile)
+        if profile is not None:
+            session.user_profile = profile
+            with self._lock:
+                self.refreshes += 1
+
+    def _spill(self, entries: List[Tuple[str, _CacheEntry]]) -> None:
+        """Save the profiles of evicted sessions to the store."""
+        if self.store is None:
+            return
+        for _, entry in entries:
+            self.store.save(entry.session.user_profile)
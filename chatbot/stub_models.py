@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Stub Models Module
+
+This module provides a deterministic model backend that needs no downloads, no
+torch and no network. Embeddings are signed feature hashes of words, word pairs
+and character trigrams; intent classification counts lexicon keywords; question
+answering returns the context sentence sharing the most words with the question.
+Results are identical across runs and processes, so the full pipeline can be
+benchmarked and load-tested on CI machines, or served as a cheap degraded tier.
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from chatbot.lexicon import get_lexicon
+from chatbot.metrics import STAGE_SECONDS
+from chatbot.model_backend import ModelBackendBase, default_cache_dir
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Words ignored when matching questions against context sentences
+_QUESTION_STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i in is it me my of on or should
+so that the this to what when where which who why will with you your
+""".split())
+
+
+class StubModels(ModelBackendBase):
+    """Deterministic hashing and keyword backend with the HFModels interface."""
+
+    def __init__(self, cache_dir: Optional[str] = None, dim: int = 384, lexicon=None, **kwargs):
+        """Initialize the stub backend.
+
+        Args:
+            cache_dir (str, optional): Directory for the knowledge base index, defaults to
+                HEALTHCOACH_CACHE_DIR or models/
+            dim (int): Embedding dimension
+            lexicon (Lexicon, optional): Intent keywords used for classification, defaults to the shared one
+            **kwargs: HFModels options, accepted and ignored so backends are interchangeable
+        """
+        super().__init__()
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.dim = dim
+        self.lexicon = lexicon or get_lexicon()
+        self.device = "cpu"
+        self.embedding_model_name = f"stub-hashing-{dim}"
+
+    @property
+    def embedding_fingerprint(self) -> str:
+        """Identifies the vectors this backend produces."""
+        return self.embedding_model_name
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        return _WORD_RE.findall(text.lower())
+
+    def _features(self, text: str):
+        """Yield (feature, weight) pairs for a text: words, word pairs and character trigrams."""
+        words = self._words(text)
+        for word in words:
+            yield 'w:' + word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield 't:' + padded[i:i + 3], 0.5
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", 0.5
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts as signed feature-hash vectors.
+
+        Args:
+            texts (list): Input texts
+
+        Returns:
+            np.ndarray: float32 embeddings, one row per text
+        """
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                embeddings[row, digest % self.dim] += weight if digest >> 63 else -weight
+        return embeddings
+
+    def get_embeddings(self, texts: Union[str, List[str]]) -> np.ndarray:
+        """Generate embeddings for the input text(s).
+
+        Args:
+            texts (str or list): Input text or list of texts
+
+        Returns:
+            np.ndarray: Embeddings for the input text(s)
+        """
+        embeddings = self._encode([texts] if isinstance(texts, str) else list(texts))
+        return embeddings[0] if isinstance(texts, str) else embeddings
+
+    # Stage names match HFModels so latency budgets and dashboards work with any backend
+    @STAGE_SECONDS.timed(stage='hf_classify_intent')
+    def classify_intent(self, text: str, candidate_labels: List[str]) -> Dict:
+        """Rank intent labels by lexicon keyword counts.
+
+        Args:
+            text (str): The input text to classify
+            candidate_labels (list): List of possible intent labels
+
+        Returns:
+            dict: Classification results with labels and scores, like the zero-shot pipeline
+        """
+        return self._classify(text, candidate_labels)
+
+    @STAGE_SECONDS.timed(stage='hf_classify_intent_batch')
+    def classify_intent_batch(self, texts: List[str], candidate_labels: List[str]) -> List[Dict]:
+        """Rank intent labels for several texts.
+
+        Args:
+            texts (list): The input texts to classify
+            candidate_labels (list): List of possible intent labels
+
+        Returns:
+            list: Classification results with labels and scores for each text
+        """
+        return [self._classify(text, candidate_labels) for text in texts]
+
+    def _classify(self, text: str, candidate_labels: List[str]) -> Dict:
+        keyword_counts, _ = self.lexicon.analyze(self._words(text))
+        # Smoothed counts, so a text without keywords scores every label equally
+        weights = [keyword_counts.get(label, 0) + 0.1 for label in candidate_labels]
+        total = sum(weights) or 1.0
+        ranked = sorted(zip(candidate_labels, weights), key=lambda item: -item[1])
+        return {'sequence': text, 'labels': [label for label, _ in ranked],
+                'scores': [weight / total for _, weight in ranked]}
+
+    @STAGE_SECONDS.timed(stage='hf_answer_question')
+    def answer_question(self, question: str, context: str) -> Dict:
+        """Answer with the context sentence that shares the most words with the question.
+
+        Args:
+            question (str): The question to answer
+            context (str): The context to extract the answer from
+
+        Returns:
+            dict: Answer with score and span information
+        """
+        return self._answer(question, context)
+
+    @STAGE_SECONDS.timed(stage='hf_answer_question_batch')
+    def answer_question_batch(self, questions: List[str], contexts: List[str]) -> List[Dict]:
+        """Answer several questions.
+
+        Args:
+            questions (list): The questions to answer
+            contexts (list): The context for each question
+
+        Returns:
+            list: Answer with score and span information for each question
+        """
+        return [self._answer(question, context) for question, context in zip(questions, contexts)]
+
+    def _answer(self, question: str, context: str) -> Dict:
+        question_words = set(self._words(question)) - _QUESTION_STOPWORDS
+        best, best_score = '', 0.0
+        for sentence in _SENTENCE_RE.split(context.strip()):
+            if not question_words:
+                break
+            score = len(question_words & set(self._words(sentence))) / len(question_words)
+            if score > best_score:
+                best, best_score = sentence, score
+        start = context.find(best) if best else 0
+        return {'answer': best, 'score': best_score, 'start': start, 'end': start + len(best)}
@@ -8,9 +8,77 @@ This module manages user profiles and session data for the Health Coach chatbot.
 It enables personalization of responses and tracks user progress over time.
 """
 
+import json
+import threading
 from datetime import datetime
+from functools import wraps
 from typing import Dict, List, Optional
 
+from chatbot.metrics import STAGE_SECONDS
+
+
+def _locked(method):
+    """Run a UserProfile method while holding the profile's lock."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def _merge_list(base: List, ours: List, theirs: List) -> List:
+    """Apply the items ours added to and removed from base to theirs."""
+    merged = [item for item in theirs if item in ours or item not in base]
+    merged.extend(item for item in ours if item not in base and item not in merged)
+    return merged
+
+def merge_profile_data(base: Dict, ours: Dict, theirs: Dict) -> Dict:
+    """Three-way merge of serialized profiles that were updated concurrently.
+    
+    Counts add up both sides' increments, lists keep the entries either side added,
+    and a preference changed by ours overrides theirs.
+    
+    Args:
+        base (dict): The stored profile both sides started from, as produced by to_dict
+        ours (dict): This side's updated profile
+        theirs (dict): The other side's updated profile
+        
+    Returns:
+        dict: Profile data containing both sides' updates
+    """
+    merged = json.loads(json.dumps(theirs))
+    merged['created_at'] = min(ours['created_at'], theirs['created_at'], key=datetime.fromisoformat)
+    merged['last_interaction'] = max(ours['last_interaction'], theirs['last_interaction'],
+                                     key=datetime.fromisoformat)
+    
+    for key, value in ours['preferences'].items():
+        base_value = base['preferences'].get(key)
+        if value == base_value:
+            continue
+        if isinstance(value, list) and isinstance(base_value, list):
+            merged['preferences'][key] = _merge_list(base_value, value, merged['preferences'].get(key, []))
+        else:
+            merged['preferences'][key] = value
+    
+    ours_history, base_history = ours['interaction_history'], base['interaction_history']
+    history = merged['interaction_history']
+    new_interactions = ours_history['total_interactions'] - base_history['total_interactions']
+    history['total_interactions'] += new_interactions
+    for topic, count in ours_history['topic_frequency'].items():
+        history['topic_frequency'][topic] = (history['topic_frequency'].get(topic, 0) + count
+                                             - base_history['topic_frequency'].get(topic, 0))
+    if new_interactions > 0:
+        history['last_topics'] = (history['last_topics']
+                                  + ours_history['last_topics'][-new_interactions:])[-5:]
+    # Feedback is only ever appended
+    history['feedback_history'] += ours_history['feedback_history'][len(base_history['feedback_history']):]
+    
+    progress = merged['progress_metrics']
+    progress['goals_achieved'] = _merge_list(base['progress_metrics']['goals_achieved'],
+                                             ours['progress_metrics']['goals_achieved'],
+                                             progress['goals_achieved'])
+    progress['streak_days'] = max(progress['streak_days'], ours['progress_metrics']['streak_days'])
+    return merged
+
 class UserProfile:
     """Manages individual user profile data and preferences."""
     
@@ -22,6 +90,14 @@ class UserProfile:
         """
         self.user_id = user_id
         self.created_at = datetime.now()
+        
+        # Serializes updates with snapshots taken by the profile store's writer
+        self.lock = threading.RLock()
+        
+        # Store row version this profile was loaded from or last written as, and that
+        # row's JSON data, the base for merging updates made by another worker
+        self.version = 0
+        self.stored_snapshot: Optional[str] = None
         self.last_interaction = datetime.now()
         
         # User preferences and settings
@@ -86,6 +162,8 @@ class UserProfile:
         else:
             self.progress_metrics['streak_days'] = 0
 
+    @STAGE_SECONDS.timed(stage='profile_update')
+    @_locked
     def update_interaction(self, topic: str, feedback: Optional[str] = None) -> None:
         """Update user interaction history and progress metrics.
         
@@ -120,6 +198,7 @@ class UserProfile:
         self.update_engagement_metrics()
         self.update_consistency_score()
     
+    @_locked
     def update_preferences(self, preferences: Dict) -> None:
         """Update user preferences.
         
@@ -128,6 +207,7 @@ class UserProfile:
         """
         self.preferences.update(preferences)
     
+    @_locked
     def add_health_goal(self, goal: str) -> None:
         """Add a new health goal for the user.
         
@@ -137,6 +217,7 @@ class UserProfile:
         if goal not in self.preferences['health_goals']:
             self.preferences['health_goals'].append(goal)
     
+    @_locked
     def mark_goal_achieved(self, goal: str) -> None:
         """Mark a health goal as achieved.
         
@@ -166,4 +247,88 @@ class UserProfile:
                 key=lambda x: x[1],
                 reverse=True
             )[:3]
-        }
\ No newline at end of file
+        }
+    
+    @_locked
+    def rebase(self, snapshot: str, version: int) -> None:
+        """Merge a newer stored copy of this profile into it, keeping this profile's own updates.
+        
+        Args:
+            snapshot (str): JSON data of the newer stored row
+            version (int): Version of that row
+        """
+        base = json.loads(self.stored_snapshot) if self.stored_snapshot else UserProfile(self.user_id).to_dict()
+        merged = UserProfile.from_dict(merge_profile_data(base, self.to_dict(), json.loads(snapshot)))
+        merged.update_engagement_metrics()
+        merged.update_consistency_score()
+        
+        self.created_at = merged.created_at
+        self.last_interaction = merged.last_interaction
+        self.preferences = merged.preferences
+        self.interaction_history = merged.interaction_history
+        self.progress_metrics = merged.progress_metrics
+        self.version = version
+        self.stored_snapshot = snapshot
+    
+    @_locked
+    def to_json(self) -> str:
+        """Serialize the profile to a JSON string, consistent even while other threads update it.
+        
+        Returns:
+            str: JSON encoding of to_dict()
+        """
+        return json.dumps(self.to_dict())
+    
+    def to_dict(self) -> Dict:
+        """Serialize the profile to JSON-compatible data.
+        
+        Returns:
+            dict: Profile data with datetimes as ISO 8601 strings
+        """
+        return {
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat(),
+            'last_interaction': self.last_interaction.isoformat(),
+            'preferences': self.preferences,
+            'interaction_history': {
+                **self.interaction_history,
+                'feedback_history': [
+                    {**entry, 'timestamp': entry['timestamp'].isoformat()}
+                    for entry in self.interaction_history['feedback_history']
+                ]
+            },
+            'progress_metrics': {
+                **self.progress_metrics,
+                'goals_achieved': [
+                    {**entry, 'achieved_at': entry['achieved_at'].isoformat()}
+                    for entry in self.progress_metrics['goals_achieved']
+                ]
+            }
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'UserProfile':
+        """Rebuild a profile from data produced by to_dict.
+        
+        Args:
+            data (dict): Serialized profile data
+            
+        Returns:
+            UserProfile: The restored profile
+        """
+        profile = cls(data['user_id'])
+        profile.created_at = datetime.fromisoformat(data['created_at'])
+        profile.last_interaction = datetime.fromisoformat(data['last_interaction'])
+        profile.preferences.update(data.get('preferences', {}))
+        profile.interaction_history.update(data.get('interaction_history', {}))
+        profile.progress_metrics.update(data.get('progress_metrics', {}))
+        
+        profile.interaction_history['feedback_history'] = [
+            {**entry, 'timestamp': datetime.fromisoformat(entry['timestamp'])}
+            for entry in profile.interaction_history['feedback_history']
+        ]
+        profile.progress_metrics['goals_achieved'] = [
+            {**entry, 'achieved_at': datetime.fromisoformat(entry['achieved_at'])}
+            for entry in profile.progress_metrics['goals_achieved']
+        ]
+        return profile
\ No newline at end of file
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Warmup Module
+
+This module gets a worker ready for traffic before it is asked to serve any. A
+Warmup preloads the configured models, then runs representative queries through
+HealthCoachChatbot.process_input so the first real request does not pay for model
+loading, first-inference compilation, allocator growth, knowledge index loading or
+intent prototype encoding. The queries run without a latency budget, so every step is
+exercised, and their timings are kept out of the step cost estimates that budgeted
+requests use. Its status backs the /readyz endpoint, letting a load balancer hold
+traffic back from a worker until it can meet latency targets.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from chatbot.deadline import unbudgeted
+from chatbot.metrics import metrics
+
+WARMUP_READY = metrics.gauge(
+    'healthcoach_warmup_ready', 'Whether the models are loaded and warm (1) or not yet (0)')
+WARMUP_SECONDS = metrics.gauge(
+    'healthcoach_warmup_seconds', 'Time spent in each warmup phase in seconds', ['phase'])
+
+# Questions that rules answer with low confidence, so they exercise the ML path
+WARMUP_QUERIES = (
+    "How can I improve my sleep?",
+    "What are good sources of protein?",
+    "How do I reduce stress before a big deadline?",
+    "What exercises help build muscle at home?",
+    "I feel tired every afternoon, what should I eat?",
+    "Is it okay to run every day?",
+    "How much water should I drink?",
+    "Any tips for staying motivated to work out?"
+)
+
+
+class Warmup:
+    """Preloads the models and runs warmup queries, tracking whether the worker is ready."""
+
+    def __init__(self, chatbot_factory: Callable, queries: Iterable[str] = WARMUP_QUERIES, rounds: int = 2):
+        """Initialize the warmup; nothing runs until run() or start() is called.
+
+        Args:
+            chatbot_factory (callable): Returns a throwaway HealthCoachChatbot to send the queries to
+            queries (iterable): Warmup messages, ideally ones that take the ML path
+            rounds (int): Times to send the queries; later rounds warm caches and allocators
+        """
+        self.chatbot_factory = chatbot_factory
+        self.queries = list(queries)
+        self.rounds = rounds
+        self.state = 'pending'
+        self.error: Optional[str] = None
+        self.seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        WARMUP_READY.set(0)
+
+    @property
+    def ready(self) -> bool:
+        """True once the warmup has finished successfully."""
+        return self.state == 'ready'
+
+    def run(self) -> bool:
+        """Preload the models and send the warmup queries in the calling thread.
+
+        Returns:
+            bool: True if the worker is ready
+        """
+        self._set_state('warming')
+        try:
+            chatbot = self.chatbot_factory()
+            self._timed('preload', chatbot.ml_enhancer.hf_models.preload)
+            self._timed('queries', self._send_queries, chatbot)
+        except Exception as exc:
+            self.error = f"{type(exc).__name__}: {exc}"
+            self._set_state('failed')
+            print(f"Warmup failed: {self.error}")
+            return False
+        self._set_state('ready')
+        return True
+
+    def start(self) -> 'Warmup':
+        """Run the warmup in a background thread, so liveness checks are answered meanwhile.
+
+        Returns:
+            Warmup: This warmup
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+                self._thread.start()
+        return self
+
+    def skip(self) -> None:
+        """Report the worker as ready without warming it; models then load on first use."""
+        self._set_state('ready')
+
+    def status(self) -> Dict:
+        """Get the warmup state for the readiness endpoint.
+
+        Returns:
+            dict: State ('pending', 'warming', 'ready' or 'failed'), readiness, the error
+                if the warmup failed and the seconds spent in each phase
+        """
+        with self._lock:
+            return {
+                'state': self.state,
+                'ready': self.state == 'ready',
+                'error': self.error,
+                'seconds': dict(self.seconds)
+            }
+
+    def _send_queries(self, chatbot) -> None:
+        # Without a latency budget every step runs, and first-inference timings stay out of step costs
+        with unbudgeted():
+            for _ in range(self.rounds):
+                for query in self.queries:
+                    chatbot.process_input(query)
+
+    def _timed(self, phase: str, func: Callable, *args) -> None:
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.seconds[phase] = elapsed
+        WARMUP_SECONDS.set(elapsed, phase=phase)
+
+    def _set_state(self, state: str) -> None:
+        with self._lock:
+            self.state = state
+        WARMUP_READY.set(1 if state == 'ready' else 0)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Import Time Check
+
+Imports the chatbot in a fresh interpreter under python -X importtime, builds a
+HealthCoachChatbot and runs the rule-only part of answering (prepare) for a few
+messages. Reports the total import time and the slowest top-level imports, and
+exits with status 1 if the time exceeds the budget or if the model stack (torch,
+transformers, sentence_transformers, ONNX Runtime) was imported, since the rule
+fast path must never load it.
+
+Usage:
+    python scripts/check_import_time.py [--budget-ms 3000] [--imports-only] [--top 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages the rule fast path must not import
+FORBIDDEN = ('torch', 'transformers', 'sentence_transformers', 'optimum', 'onnxruntime')
+
+MESSAGES = (
+    "How can I improve my sleep?",
+    "What are good sources of protein?",
+    "How do I reduce stress?"
+)
+
+CHILD = """
+import json, sys
+import app
+if {exercise}:
+    bot = app.HealthCoachChatbot('import-time-check')
+    for message in {messages!r}:
+        bot.prepare(message)
+print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}})))
+"""
+
+
+def parse_importtime(stderr):
+    """Parse -X importtime output.
+
+    Args:
+        stderr (str): The interpreter's standard error
+
+    Returns:
+        list: (module, cumulative_us, nested) for each import, where nested is True
+            for imports triggered by another module
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that triggered them
+        imports.append((name.strip(), int(cumulative), name[1:].startswith(' ')))
+    return imports
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=3000.0, help='maximum total import time')
+    parser.add_argument('--imports-only', action='store_true',
+                        help='only import app, without building a chatbot (needs no NLTK data)')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest imports to list')
+    args = parser.parse_args(argv)
+
+    code = CHILD.format(exercise=not args.imports_only, messages=MESSAGES)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        print("\n".join(line for line in result.stderr.splitlines() if not line.startswith('import time:')),
+              file=sys.stderr)
+        return result.returncode
+
+    imports = parse_importtime(result.stderr)
+    total_ms = sum(cumulative for _, cumulative, nested in imports if not nested) / 1000.0
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    forbidden = [name for name in FORBIDDEN if name in loaded]
+
+    # Cumulative times include nested imports, so a package and its parents both appear
+    for name, cumulative, _ in sorted(imports, key=lambda item: -item[1])[:args.top]:
+        print(f"{cumulative / 1000.0:9.1f} ms  {name}")
+    print(f"total import time:    {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print(f"model stack imported: {', '.join(forbidden) or 'none'}")
+
+    return 0 if total_ms <= args.budget_ms and not forbidden else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ONNX Parity Check
+
+Runs the PyTorch models (HFModels) and the quantized ONNX Runtime models
+(ONNXModels) over the intent examples and knowledge base questions, then reports
+how often they agree and how long each took. Exits with status 1 if agreement is
+below the thresholds, so it can gate switching HEALTHCOACH_MODEL_BACKEND to onnx.
+
+Usage:
+    python scripts/check_onnx_parity.py [--min-intent 0.95] [--min-qa 0.9] [--min-cosine 0.98]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.hf_models import HFModels
+from chatbot.intent_cascade import INTENT_EXAMPLES
+from chatbot.knowledge_base import KnowledgeBase
+from chatbot.onnx_models import ONNXModels, check_parity
+
+
+def qa_pairs(knowledge_base, per_topic=3):
+    """Build (question, context) pairs from the intent examples and each topic's advice."""
+    contexts = {}
+    for topic, _, advice in knowledge_base.iter_advice():
+        contexts.setdefault(topic, []).append(advice[0].upper() + advice[1:] + ".")
+    return [(question, " ".join(contexts[topic]))
+            for topic, questions in INTENT_EXAMPLES.items() if topic in contexts
+            for question in questions[:per_topic]]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--min-intent', type=float, default=0.95, help='minimum top-intent agreement')
+    parser.add_argument('--min-qa', type=float, default=0.9, help='minimum exact QA answer agreement')
+    parser.add_argument('--min-cosine', type=float, default=0.98, help='minimum embedding cosine similarity')
+    args = parser.parse_args(argv)
+
+    texts = [text for examples in INTENT_EXAMPLES.values() for text in examples]
+    labels = list(INTENT_EXAMPLES.keys())
+    report = check_parity(HFModels(use_embedding_cache=False), ONNXModels(use_embedding_cache=False),
+                          texts, labels, qa_pairs(KnowledgeBase()))
+
+    for text, reference, candidate in report['intent_mismatches']:
+        print(f"INTENT {text!r}: pytorch={reference} onnx={candidate}")
+    for question, reference, candidate in report['qa_mismatches']:
+        print(f"QA {question!r}: pytorch={reference!r} onnx={candidate!r}")
+    print(f"intent agreement:     {report['intent_agreement']:.3f}")
+    print(f"qa agreement:         {report['qa_agreement']:.3f}")
+    print(f"embedding cosine:     min {report['embedding_cosine_min']:.4f}, "
+          f"mean {report['embedding_cosine_mean']:.4f}")
+    for model, seconds in report['seconds']['reference'].items():
+        candidate = report['seconds']['candidate'][model]
+        print(f"{model + ' seconds:':<22}pytorch {seconds:.3f}, onnx {candidate:.3f} "
+              f"({seconds / max(candidate, 1e-9):.1f}x)")
+
+    passed = (report['intent_agreement'] >= args.min_intent and report['qa_agreement'] >= args.min_qa
+              and report['embedding_cosine_min'] >= args.min_cosine)
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Preprocess Parity Check
+
+Runs NLPProcessor.preprocess (regex tokenizer and memoized lemmas) and the NLTK
+reference path over sample queries and reports any difference. Exits with status 1
+if the two paths disagree.
+
+Usage:
+    python scripts/check_preprocess_parity.py [more queries ...]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chatbot.intent_cascade import INTENT_EXAMPLES
+from chatbot.nlp_processor import NLPProcessor
+
+SAMPLE_QUERIES = [
+    "What should I eat for more energy?",
+    "What are the best meats for protein?",
+    "I cannot sleep, I'm gonna try anything!",
+    "I wanna lose weight... lemme know how",
+    "Can't sleep at night - any tips?",
+    "How do I handle stress at work & at home?",
+    "Is a 30-minute workout 3x/week enough?",
+    "I’m “always” tired — why?",
+    "  Multiple   spaces\tand\nnewlines  ",
+    "Café au lait or naïve smoothies?",
+    ""
+]
+
+
+def main(argv):
+    processor = NLPProcessor()
+    queries = SAMPLE_QUERIES + [text for texts in INTENT_EXAMPLES.values() for text in texts] + argv
+    mismatches = processor.check_preprocess_parity(queries)
+    for text, fast, reference in mismatches:
+        print(f"MISMATCH {text!r}\n  fast:      {fast}\n  reference: {reference}")
+    print(f"{len(queries) - len(mismatches)}/{len(queries)} queries match")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
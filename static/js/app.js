@@ -222,6 +222,7 @@ function addMessage(text, isUser, timestamp = Date.now(), save = true) {
     
     messageContent += `<div class="timestamp">${timeStr}</div>`;
     messageDiv.innerHTML = messageContent;
+    messageDiv.dataset.text = text;
     
     chatContainer.appendChild(messageDiv);
     chatContainer.scrollTop = chatContainer.scrollHeight;
@@ -232,7 +233,7 @@ function addMessage(text, isUser, timestamp = Date.now(), save = true) {
         feedbackBtns.forEach(btn => {
             btn.addEventListener('click', function() {
                 const feedback = this.dataset.value;
-                provideFeedback(feedback, text);
+                provideFeedback(feedback, messageDiv.dataset.text);
                 
                 // Disable all feedback buttons in this message
                 feedbackBtns.forEach(b => b.disabled = true);
@@ -247,16 +248,32 @@ function addMessage(text, isUser, timestamp = Date.now(), save = true) {
     }
     
     // Save message to current chat
-    if (save && currentChatId) {
-        chats[currentChatId].messages.push({
-            text,
-            isUser,
-            timestamp
-        });
-        chats[currentChatId].lastUpdated = timestamp;
-        saveChats();
-        updateChatTitle(currentChatId);
+    if (save) {
+        saveMessage(text, isUser, timestamp);
     }
+    
+    return messageDiv;
+}
+
+// Save a message to the current chat
+function saveMessage(text, isUser, timestamp = Date.now()) {
+    if (!currentChatId) return;
+    
+    chats[currentChatId].messages.push({
+        text,
+        isUser,
+        timestamp
+    });
+    chats[currentChatId].lastUpdated = timestamp;
+    saveChats();
+    updateChatTitle(currentChatId);
+}
+
+// Replace the text of a bot message that is still streaming
+function setMessageText(messageDiv, text) {
+    messageDiv.dataset.text = text;
+    messageDiv.querySelector('.message-content').innerHTML = text;
+    chatContainer.scrollTop = chatContainer.scrollHeight;
 }
 
 // Send a message to the chatbot
@@ -279,8 +296,89 @@ function sendMessage() {
     addMessage(message, true);
     userInput.value = '';
     
-    // Send to backend
+    // Send to backend, falling back to a single JSON response if streaming fails
     console.log('Sending message to backend');
+    streamResponse(message).catch(error => {
+        console.warn('Streaming failed, retrying without streaming:', error);
+        fetchResponse(message);
+    });
+}
+
+// Request a response as Server-Sent Events and render each piece as it arrives
+async function streamResponse(message) {
+    const response = await fetch('/ask/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+        },
+        body: `user_input=${encodeURIComponent(message)}`
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming request failed with status ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let messageDiv = null;
+    let text = '';
+    
+    try {
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                
+                if (event.name === 'done') {
+                    break;
+                }
+                text = event.name === 'append' ? text + event.data.text : event.data.text;
+                if (messageDiv) {
+                    setMessageText(messageDiv, text);
+                } else {
+                    // The first piece is the rule-based response
+                    messageDiv = addMessage(text, false, Date.now(), false);
+                }
+            }
+        }
+    } catch (error) {
+        // Once a piece is shown, keep what arrived rather than asking again
+        if (!messageDiv) throw error;
+        console.error('Stream interrupted:', error);
+    }
+    
+    if (!messageDiv) {
+        throw new Error('Stream ended without a response');
+    }
+    saveMessage(text, false);
+    loadSavedChats(); // Refresh sidebar
+}
+
+// Parse the event name and JSON data of one Server-Sent Event
+function parseEvent(block) {
+    const event = { name: 'message', data: {} };
+    const dataLines = [];
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event.name = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trim());
+        }
+    });
+    if (dataLines.length > 0) {
+        event.data = JSON.parse(dataLines.join('\n'));
+    }
+    return event;
+}
+
+// Request a complete response as JSON
+function fetchResponse(message) {
     fetch('/ask', {
         method: 'POST',
         headers: {
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Shared pytest fixtures."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep model caches, indexes and embedding caches out of the checkout's models/."""
+    directory = tmp_path / 'cache'
+    monkeypatch.setenv('HEALTHCOACH_CACHE_DIR', str(directory))
+    return directory
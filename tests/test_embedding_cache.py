@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for the embedding cache shared by worker processes."""
+
+import numpy as np
+
+from chatbot.embedding_cache import EmbeddingCache
+from chatbot.stub_models import StubModels
+
+
+def test_cache_is_created_under_the_cache_dir_on_first_write(cache_dir):
+    directory = str(cache_dir / 'embedding_cache')
+    cache = EmbeddingCache(directory, 'model')
+    assert not cache_dir.exists()
+
+    cache.put_many(["How do I sleep better?"], np.ones((1, 4), dtype=np.float32))
+    assert cache.data_path.startswith(directory)
+
+    # Another worker reads the vector from disk, matching normalized text
+    other = EmbeddingCache(directory, 'model')
+    [vector] = other.get_many(["how do i  sleep better?"])
+    np.testing.assert_array_equal(vector, np.ones(4, dtype=np.float32))
+    assert other.disk_hits == 1
+
+
+def test_backends_default_to_the_configured_cache_dir(cache_dir):
+    assert StubModels().cache_dir == str(cache_dir)
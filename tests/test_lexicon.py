@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for entity phrase extraction and how extracted entities read in responses."""
+
+import random
+
+import pytest
+
+from chatbot.lexicon import get_lexicon
+from chatbot.ml_enhancer import MLEnhancer
+from chatbot.stub_models import StubModels
+
+
+@pytest.fixture
+def enhancer(tmp_path):
+    return MLEnhancer(hf_models=StubModels(cache_dir=str(tmp_path)), latency_budget_ms=0)
+
+
+def extract(text):
+    lexicon = get_lexicon()
+    entities = {entity_type: [] for entity_type in lexicon.entity_types}
+    return lexicon.add_phrase_entities(text, entities)
+
+
+@pytest.mark.parametrize('text', [
+    "I can't sleep",
+    "I have trouble sleeping lately",
+    "difficulty falling asleep every night"
+])
+def test_symptom_phrases_are_recorded_as_their_condition(text):
+    assert extract(text)['health_conditions'] == ['insomnia']
+
+
+@pytest.mark.parametrize('text', ["I can't sleep", "I have trouble sleeping lately"])
+def test_condition_sentence_names_the_condition(enhancer, monkeypatch, text):
+    # Apply every optional enhancement and pick the first template of each kind
+    monkeypatch.setattr(random, 'random', lambda: 0.0)
+    monkeypatch.setattr(random, 'choice', lambda options: options[0])
+    processed_input = {'entities': extract(text)}
+
+    response = "".join(enhancer._personalization_segments(
+        'sleep', processed_input, None, MLEnhancer.new_user_context()))
+
+    assert "particularly helpful for managing insomnia." in response
+    assert "can't sleep" not in response and "trouble sleeping" not in response
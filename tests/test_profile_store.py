@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Tests for sharing profiles between workers through the SQLite profile store."""
+
+import pytest
+
+from chatbot.profile_store import SQLiteProfileStore
+from chatbot.session_cache import SessionCache
+from chatbot.user_profile import UserProfile
+
+
+class Session:
+    def __init__(self, user_id):
+        self.user_profile = UserProfile(user_id)
+
+
+@pytest.fixture
+def stores(tmp_path):
+    # Two workers sharing one database; flushes are only run by the tests
+    path = str(tmp_path / 'profiles.db')
+    stores = [SQLiteProfileStore(path, flush_interval=3600), SQLiteProfileStore(path, flush_interval=3600)]
+    yield stores
+    for store in stores:
+        store.close()
+
+
+def test_concurrent_updates_are_merged(stores):
+    first, second = stores
+    profile = UserProfile('user')
+    profile.update_interaction('sleep')
+    first.save(profile)
+    first.flush()
+
+    # Both workers update their copy within one flush interval
+    mine, theirs = first.load('user'), second.load('user')
+    mine.update_interaction('nutrition', 'helpful')
+    mine.add_health_goal('run a 5k')
+    first.save(mine)
+    theirs.update_interaction('stress')
+    theirs.add_health_goal('sleep 8 hours')
+    second.save(theirs)
+    first.flush()
+    second.flush()
+
+    stored = first.load('user')
+    history = stored.interaction_history
+    assert history['total_interactions'] == 3
+    assert history['topic_frequency'] == {'sleep': 1, 'nutrition': 1, 'stress': 1}
+    assert [entry['feedback'] for entry in history['feedback_history']] == ['helpful']
+    assert sorted(stored.preferences['health_goals']) == ['run a 5k', 'sleep 8 hours']
+    assert second.stats()['merged_writes'] == 1
+    assert second.stats()['stale_writes'] == 0
+
+
+def test_refresh_keeps_unwritten_changes(stores):
+    first, second = stores
+    first.save(UserProfile('user'))
+    first.flush()
+    cached = second.load('user')
+
+    newer = first.load('user')
+    newer.update_interaction('fitness')
+    first.save(newer)
+    first.flush()
+    cached.update_interaction('sleep')
+    second.save(cached)
+
+    assert second.refresh(cached) is cached
+    assert cached.interaction_history['total_interactions'] == 2
+    second.flush()
+    assert first.load('user').interaction_history['total_interactions'] == 2
+
+
+def test_cached_sessions_are_refreshed_once_per_interval(stores):
+    store = stores[0]
+    cache = SessionCache(Session, store=store, refresh_seconds=60)
+    checks = []
+    refresh = store.refresh
+    store.refresh = lambda profile: checks.append(profile) or refresh(profile)
+
+    for _ in range(10):
+        cache.get('user')
+    assert checks == []
+
+    cache.refresh_seconds = 0
+    cache.get('user')
+    assert len(checks) == 1
@@ -8,17 +8,24 @@ This module provides a Flask web interface for the Health Coach chatbot.
 It allows users to interact with the chatbot through a browser.
 """
 
+import atexit
 import os
 import uuid
-from flask import Flask, render_template, request, jsonify, session
-from app import HealthCoachChatbot
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
+from chatbot.metrics import metrics
+from web_setup import create_web_state, sse_event
 
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24).hex())
 
-# Dictionary to store chatbot instances for each user
-user_chatbots = {}
+# Profile store, session cache and warmup, configured from HEALTHCOACH_* variables
+state = create_web_state()
+user_chatbots = state.user_chatbots
+warmup = state.warmup
+
+# Save cached sessions and flush the profile store on exit
+atexit.register(state.close)
 
 @app.route('/')
 def home():
@@ -40,20 +47,70 @@ def ask():
     
     user_id = session['user_id']
     
-    # Get or create chatbot instance for this user
-    if user_id not in user_chatbots:
-        user_chatbots[user_id] = HealthCoachChatbot(user_id=user_id)
+    # Get, rehydrate or create the chatbot instance for this user
+    chatbot = user_chatbots.get(user_id)
     
     # Get response from chatbot
-    response = user_chatbots[user_id].process_input(user_input, feedback)
+    response = chatbot.process_input(user_input, feedback)
     
     return jsonify({'response': response})
 
+def sse_response(events):
+    """Wrap an iterable of SSE strings in an unbuffered text/event-stream response."""
+    return Response(events, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """Stream the chatbot response as Server-Sent Events.
+    
+    The rule-based response is sent immediately as a 'replace' event; ML
+    enhancements follow as 'replace' or 'append' events, and a 'done' event
+    ends the stream.
+    """
+    user_input = request.form['user_input']
+    feedback = request.form.get('feedback', None)
+    
+    if not user_input.strip():
+        return sse_response([
+            sse_event('replace', 'Please enter a question about health, nutrition, or fitness.'),
+            sse_event('done', '')
+        ])
+    
+    # The session cookie is set before streaming starts
+    if 'user_id' not in session:
+        session['user_id'] = str(uuid.uuid4())
+    
+    chatbot = user_chatbots.get(session['user_id'])
+    
+    def generate():
+        for kind, text in chatbot.stream_input(user_input, feedback):
+            yield sse_event(kind, text)
+        yield sse_event('done', '')
+    
+    return sse_response(stream_with_context(generate()))
+
 @app.route('/about')
 def about():
     """Render the about page."""
     return render_template('about.html')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose pipeline latency and cache metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness check: the process is up and answering requests."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness check: 200 once the models are warm, 503 while warming or after a failed warmup."""
+    status = warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
     if not os.path.exists('templates'):
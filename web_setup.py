@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Health Coach Chatbot - Web Setup
+
+This module builds the per-process state behind both web interfaces: the shared
+profile store, the session cache, the idle model reaper and the warmup that backs
+/readyz. Nothing happens on import; web_app.py calls create_web_state() when it is
+loaded and asgi_app.py calls it before serving, so each app only pays for its own
+setup.
+"""
+
+import json
+import os
+
+from app import HealthCoachChatbot
+from chatbot import nltk_resources
+from chatbot.metrics import metrics
+from chatbot.model_registry import get_model_registry
+from chatbot.profile_store import SQLiteProfileStore
+from chatbot.session_cache import SessionCache
+from chatbot.warmup import Warmup
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Session cache and profile store statistics exported on /metrics
+SESSION_CACHE_GAUGE = metrics.gauge(
+    'healthcoach_session_cache', 'Session cache size and hit/miss/eviction counts', ['stat'])
+PROFILE_STORE_GAUGE = metrics.gauge(
+    'healthcoach_profile_store', 'Profile store write-behind statistics', ['stat'])
+
+
+class WebState:
+    """Profile store, session cache and warmup shared by the request handlers of one process."""
+
+    def __init__(self, profile_store, user_chatbots, warmup):
+        """Initialize the state from components built by create_web_state().
+
+        Args:
+            profile_store (SQLiteProfileStore): Store the sessions' profiles are saved to
+            user_chatbots (SessionCache): Cache of per-user chatbot sessions
+            warmup (Warmup): Warmup whose status backs the readiness check
+        """
+        self.profile_store = profile_store
+        self.user_chatbots = user_chatbots
+        self.warmup = warmup
+
+    def collect_metrics(self):
+        """Refresh the session and profile store gauges before /metrics is rendered."""
+        for stat, value in self.user_chatbots.stats().items():
+            SESSION_CACHE_GAUGE.set(value, stat=stat)
+        for stat, value in self.profile_store.stats().items():
+            PROFILE_STORE_GAUGE.set(value, stat=stat)
+
+    def close(self):
+        """Save every cached session, then flush and close the profile store."""
+        self.user_chatbots.spill_all()
+        self.profile_store.close()
+
+
+def create_web_state():
+    """Build the web state from the HEALTHCOACH_* environment variables.
+
+    Fails at once if NLTK data is missing, starts the profile writer thread, optionally
+    warms the session cache and starts the idle model reaper, and starts the warmup in
+    the background when HEALTHCOACH_WARMUP_ROUNDS is set.
+
+    Returns:
+        WebState: The state, with its gauges registered on /metrics
+    """
+    # Fail at startup rather than on the first request if NLTK data is missing
+    nltk_resources.require_all()
+
+    # Profiles are shared by all workers through SQLite and written in batches
+    profile_store = SQLiteProfileStore(
+        os.environ.get('HEALTHCOACH_PROFILE_DB', os.path.join(ROOT, 'data', 'profiles.db')),
+        flush_interval=float(os.environ.get('HEALTHCOACH_PROFILE_FLUSH_SECONDS', 2.0))
+    )
+
+    # Bounded cache of chatbot sessions; evicted profiles are saved for returning users
+    user_chatbots = SessionCache(
+        factory=lambda user_id: HealthCoachChatbot(user_id=user_id, profile_store=profile_store),
+        max_entries=int(os.environ.get('HEALTHCOACH_SESSION_MAX_ENTRIES', 1000)),
+        ttl_seconds=float(os.environ.get('HEALTHCOACH_SESSION_TTL_SECONDS', 1800)),
+        store=profile_store,
+        refresh_seconds=float(os.environ.get('HEALTHCOACH_SESSION_REFRESH_SECONDS', 5))
+    )
+
+    # Optionally warm the cache with the most recently active users
+    warm_sessions = int(os.environ.get('HEALTHCOACH_WARM_SESSIONS', 0))
+    if warm_sessions > 0:
+        user_chatbots.warm(profile_store.load_many(limit=warm_sessions))
+
+    # Unload models that have been idle for this many seconds (0 keeps them loaded)
+    model_idle_seconds = float(os.environ.get('HEALTHCOACH_MODEL_IDLE_SECONDS', 0))
+    if model_idle_seconds > 0:
+        get_model_registry().start_idle_reaper(model_idle_seconds)
+
+    # Preload the models and send this many rounds of warmup queries in the background
+    # before /readyz reports ready (0 reports ready at once and loads models on first use)
+    warmup_rounds = int(os.environ.get('HEALTHCOACH_WARMUP_ROUNDS', 0))
+    warmup = Warmup(lambda: HealthCoachChatbot(user_id='warmup'), rounds=warmup_rounds)
+    if warmup_rounds > 0:
+        warmup.start()
+    else:
+        warmup.skip()
+
+    state = WebState(profile_store, user_chatbots, warmup)
+    metrics.register_collector(state.collect_metrics)
+    return state
+
+
+def sse_event(event, text):
+    """Format one Server-Sent Event carrying a piece of a response.
+
+    Args:
+        event (str): Event name ('replace', 'append' or 'done')
+        text (str): Response text for the event
+
+    Returns:
+        str: The event in the text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps({'text': text})}\n\n"